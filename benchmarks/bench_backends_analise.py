@@ -0,0 +1,149 @@
+"""Compara os backends de análise do Teste 3: Parquet (DuckDB e pandas) x MySQL.
+
+Os mesmos trimestres sintéticos são gravados em cada backend e os
+relatórios "top 10" (trimestre e ano) são cronometrados. O Parquet roda sem
+nenhum serviço; com --mysql, o benchmark também carrega um banco novo
+(`<prefixo>_analise`) no MySQL do Teste 3, o que exige um usuário que possa
+criar bancos:
+
+    python benchmarks/bench_backends_analise.py --operadoras 2000 --contas 200
+    MYSQL_USER=root MYSQL_PASSWORD=rootpassword \\
+        python benchmarks/bench_backends_analise.py --mysql
+
+No fim, os rankings impressos por cada backend são comparados linha a linha.
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTE3 = os.path.join(RAIZ, 'teste3')
+sys.path.insert(0, TESTE3)
+
+import analise_colunar  # noqa: E402
+import teste3_bancoDeDados as banco  # noqa: E402
+from bench_layout_demonstracoes import preparar_banco  # noqa: E402
+from geradores import DIRETORIO, registro, trimestres  # noqa: E402
+
+
+def operadoras_sinteticas(quantidade):
+    return pd.DataFrame({
+        'registro_ans': [registro(op) for op in range(quantidade)],
+        'razao_social': [f'OPERADORA {op:05d}' for op in range(quantidade)],
+    })
+
+
+def rankings(saida):
+    """Só as linhas dos rankings ("1. NOME: R$ ...") de um relatório impresso"""
+    return [linha for linha in saida.splitlines() if linha.split('.', 1)[0].isdigit()]
+
+
+def cronometrar(funcao, repeticoes):
+    """Mediana do tempo e a saída impressa pela última execução"""
+    tempos = []
+    for _ in range(repeticoes):
+        saida = io.StringIO()
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(saida):
+            funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), saida.getvalue()
+
+
+def carregar_parquet(args, arquivos, diretorio):
+    shutil.rmtree(diretorio, ignore_errors=True)
+    analise_colunar.gravar_operadoras(banco.clean_operadoras(operadoras_sinteticas(args.operadoras)), diretorio)
+    operadoras = analise_colunar.ler_registros_operadoras(diretorio)
+    linhas = 0
+    for periodo, caminho in arquivos:
+        renomear, _ = banco.map_demonstracoes_columns(caminho)
+        blocos = banco.iter_demonstracoes(caminho, renomear, periodo, operadoras)
+        linhas += analise_colunar.gravar_trimestre(blocos, int(periodo[2:]), int(periodo[0]), diretorio)
+    return linhas
+
+
+def carregar_mysql(args, arquivos):
+    preparar_banco(f'{args.prefixo}_analise')
+    conn = banco.create_db_connection()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not banco.setup_database_tables(conn, layout='classico'):
+            raise RuntimeError('não foi possível criar as tabelas no MySQL')
+    cursor = conn.cursor()
+    operadoras = operadoras_sinteticas(args.operadoras)
+    cursor.executemany('INSERT INTO operadoras (registro_ans, razao_social) VALUES (%s, %s)',
+                       operadoras.itertuples(index=False, name=None))
+    conn.commit()
+    cursor.close()
+    linhas = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for periodo, caminho in arquivos:
+            renomear, _ = banco.map_demonstracoes_columns(caminho)
+            gravadas, _ = banco.load_quarter_file(conn, caminho, renomear, periodo,
+                                                  set(operadoras['registro_ans']))
+            banco.refresh_rollups(conn, periodo)
+            linhas += gravadas
+    return conn, linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operadoras', type=int, default=2000)
+    parser.add_argument('--contas', type=int, default=200, help='contas por operadora em cada trimestre')
+    parser.add_argument('--trimestres', type=int, default=8)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--mysql', action='store_true', help='inclui o MySQL do Teste 3 na comparação')
+    parser.add_argument('--prefixo', default='ans_bench')
+    parser.add_argument('--dir', default=DIRETORIO)
+    args = parser.parse_args()
+
+    arquivos = trimestres(args.trimestres, args.operadoras, args.contas, args.dir)
+
+    resultados = []
+    diretorio = os.path.join(args.dir, 'parquet')
+    inicio = time.perf_counter()
+    linhas = carregar_parquet(args, arquivos, diretorio)
+    carga = time.perf_counter() - inicio
+    tamanho = sum(os.path.getsize(os.path.join(pasta, nome))
+                  for pasta, _, nomes in os.walk(diretorio) for nome in nomes)
+    motores = [motor for motor in analise_colunar.MOTORES
+               if motor != 'duckdb' or analise_colunar.duckdb is not None]
+    for motor in motores:
+        latencia, saida = cronometrar(
+            lambda: banco.run_analytical_queries_parquet(motor, diretorio), args.repeticoes
+        )
+        resultados.append((f'parquet/{motor}', linhas, carga, tamanho, latencia, rankings(saida)))
+
+    if args.mysql:
+        inicio = time.perf_counter()
+        conn, linhas = carregar_mysql(args, arquivos)
+        carga = time.perf_counter() - inicio
+        try:
+            cursor = conn.cursor()
+            tamanho = sum(dados + indices for dados, indices in banco.layout_particionado.tamanho_tabelas(
+                cursor, ['demonstracoes_contabeis', 'despesas_periodo', 'despesas_ano']
+            ).values())
+            cursor.close()
+            latencia, saida = cronometrar(lambda: banco.run_analytical_queries(conn), args.repeticoes)
+            resultados.append(('mysql', linhas, carga, tamanho, latencia, rankings(saida)))
+        finally:
+            conn.close()
+
+    print(f"{'backend':<16}{'linhas':>10}{'carga (s)':>11}{'disco (MB)':>12}{'relatórios (ms)':>17}")
+    for nome, linhas, carga, tamanho, latencia, _ in resultados:
+        print(f'{nome:<16}{linhas:>10}{carga:>11.1f}{tamanho / 2**20:>12.1f}{latencia * 1000:>17.1f}')
+
+    referencia = resultados[0][5]
+    for nome, *_, linhas_ranking in resultados[1:]:
+        estado = 'iguais' if linhas_ranking == referencia else 'DIFERENTES'
+        print(f'Rankings de {nome} x {resultados[0][0]}: {estado}')
+
+
+if __name__ == '__main__':
+    main()
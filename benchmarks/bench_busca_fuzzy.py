@@ -0,0 +1,100 @@
+"""Mede a busca aproximada (`modo=fuzzy`) da API contra a comparação com todas as linhas.
+
+Carrega um operadoras.csv, monta o índice de apagamentos e, para cada termo
+(com acentos trocados, letras invertidas, faltando ou sobrando), mede a
+latência do índice e da força bruta, que calcula o mesmo custo para cada
+palavra de cada linha. Os dois precisam devolver os mesmos ids na mesma
+ordem.
+
+Uso:
+    python benchmarks/bench_busca_fuzzy.py --linhas 20000
+    python benchmarks/bench_busca_fuzzy.py --csv caminho/para/operadoras.csv
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from geradores import em_cache, gerar_operadoras
+from bench_carga_api import BACKEND
+
+sys.path.insert(0, BACKEND)
+
+from indice_fuzzy import (CUSTO_COMPLETAR, CUSTO_EDICAO, MINIMO_COMPLETAR,  # noqa: E402
+                          IndiceFuzzy, distancia_edicao, distancia_maxima, palavras)
+
+TERMOS = ['unimde', 'saude', 'saúde', 'asistencia', 'assist', 'odnoto 12', 'operadroa unimed',
+          'hapvdia s.a.', 'cooperativa medica', 'bradesco saúde', 'amil saude', '3001']
+
+
+def custo_palavra(termo, palavra):
+    """Mesma regra do índice, aplicada a um par termo/palavra"""
+    if termo == palavra:
+        return 0
+    melhor = None
+    if len(termo) >= MINIMO_COMPLETAR and palavra.startswith(termo):
+        melhor = CUSTO_COMPLETAR
+    if not termo.isdigit() and not palavra.isdigit():
+        limite = min(distancia_maxima(termo), distancia_maxima(palavra))
+        distancia = distancia_edicao(termo, palavra, limite)
+        if distancia <= limite and (melhor is None or CUSTO_EDICAO * distancia < melhor):
+            melhor = CUSTO_EDICAO * distancia
+    return melhor
+
+
+def forca_bruta(tabela, campos, termo):
+    termos = list(dict.fromkeys(palavras(termo)))
+    colunas = [tabela.dados[campo] for campo in campos]
+    total = {}
+    for id_registro in range(len(tabela)):
+        palavras_linha = set()
+        for coluna in colunas:
+            palavras_linha.update(palavras(coluna[id_registro] or ''))
+        soma = 0
+        for t in termos:
+            custos = [c for c in (custo_palavra(t, p) for p in palavras_linha) if c is not None]
+            if not custos:
+                break
+            soma += min(custos)
+        else:
+            total[id_registro] = soma
+    return sorted(total, key=lambda i: (total[i], i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--csv', help='operadoras.csv a usar (padrão: um sintético com --linhas linhas)')
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    caminho = args.csv or em_cache(f'operadoras_{args.linhas}.csv', gerar_operadoras, args.linhas)
+    # O server.py carrega OPERADORAS_CSV ao ser importado: aponta para o mesmo arquivo
+    os.environ.update(OPERADORAS_CSV=caminho, RECARGA_INTERVALO='0')
+    from server import ler_csv
+
+    tabela = ler_csv(caminho)
+    inicio = time.perf_counter()
+    indice = IndiceFuzzy(tabela)
+    print(f'{len(tabela)} linhas, {len(indice)} palavras, {len(indice.apagamentos)} apagamentos; '
+          f'índice montado em {time.perf_counter() - inicio:.2f} s')
+
+    print(f"{'termo':<20}{'resultados':>11}{'índice (ms)':>13}{'p99 (ms)':>10}{'força bruta (ms)':>18}{'idêntico':>10}")
+    for termo in TERMOS:
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            ids = indice.buscar_ranqueado(termo)
+            tempos.append(time.perf_counter() - inicio)
+        tempos.sort()
+        inicio = time.perf_counter()
+        esperado = forca_bruta(tabela, indice.campos, termo)
+        bruta = time.perf_counter() - inicio
+        identico = 'sim' if ids == esperado else 'NÃO'
+        print(f'{termo:<20}{len(ids):>11}{statistics.median(tempos) * 1000:>13.2f}'
+              f'{tempos[int(len(tempos) * 0.99)] * 1000:>10.2f}{bruta * 1000:>18.1f}{identico:>10}')
+
+
+if __name__ == '__main__':
+    main()
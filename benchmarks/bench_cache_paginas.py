@@ -0,0 +1,62 @@
+"""Mede o cache de páginas da extração do Teste 2 em três execuções seguidas.
+
+1. cache vazio: todas as páginas são extraídas e guardadas;
+2. o mesmo PDF de novo: todas as páginas vêm do cache;
+3. uma revisão do PDF com `--alteradas` páginas diferentes: só elas são
+   extraídas.
+
+Cada execução é conferida com a extração sem cache do mesmo PDF.
+
+Uso:
+    python benchmarks/bench_cache_paginas.py --paginas 200 --alteradas 5 --workers 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from geradores import DIRETORIO, RAIZ, em_cache, gerar_pdf
+
+sys.path.insert(0, RAIZ)
+
+from teste2Csv import CachePaginas, iterar_tabelas  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paginas', type=int, default=200)
+    parser.add_argument('--alteradas', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    original = em_cache(f'anexo_{args.paginas}p.pdf', gerar_pdf, args.paginas)
+    # Páginas alteradas espalhadas pelo documento
+    passo = max(1, args.paginas // max(1, args.alteradas))
+    alteradas = set(range(0, args.paginas, passo)[:args.alteradas])
+    revisao = em_cache(f'anexo_{args.paginas}p_rev{args.alteradas}.pdf', gerar_pdf, args.paginas,
+                       alteradas=alteradas)
+
+    referencias = {}
+    for caminho in (original, revisao):
+        inicio = time.perf_counter()
+        referencias[caminho] = list(iterar_tabelas(caminho, args.workers))
+        print(f'Sem cache, {os.path.basename(caminho)}: {time.perf_counter() - inicio:.2f} s')
+
+    with tempfile.TemporaryDirectory(dir=DIRETORIO) as diretorio:
+        caminho_cache = os.path.join(diretorio, 'paginas.sqlite')
+        print(f"{'execução':<12}{'tempo (s)':>11}{'do cache':>10}{'extraídas':>11}{'cache (MB)':>12}{'idêntico':>10}")
+        for nome, caminho in [('vazio', original), ('repetida', original), ('revisão', revisao)]:
+            cache = CachePaginas(caminho_cache)
+            inicio = time.perf_counter()
+            tabelas = list(iterar_tabelas(caminho, args.workers, cache))
+            duracao = time.perf_counter() - inicio
+            tamanho = cache.podar()
+            cache.fechar()
+            identico = 'sim' if tabelas == referencias[caminho] else 'NÃO'
+            print(f'{nome:<12}{duracao:>11.2f}{cache.acertos:>10}{cache.faltas:>11}'
+                  f'{tamanho / 2**20:>12.2f}{identico:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compara memória (RSS) e tempo de carga da API: lista de dicts x tabela colunar.
+
+Uso:
+    python benchmarks/bench_carga_api.py --linhas 200000
+"""
+import argparse
+import csv
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from geradores import RAIZ, em_cache, gerar_operadoras
+
+BACKEND = os.path.join(RAIZ, 'teste4', 'backend')
+
+def ler_lista_dicts(caminho):
+    """Leitura original da API: um dict por linha"""
+    dados = []
+    with open(caminho, 'r', encoding='utf-8-sig') as arquivo_csv:
+        for linha in csv.DictReader(arquivo_csv, delimiter=';'):
+            linha_limpa = {
+                k.strip(): v.strip() if v and isinstance(v, str) else v
+                for k, v in linha.items()
+                if k and k.strip()
+            }
+            if linha_limpa:
+                dados.append(linha_limpa)
+    return dados
+
+
+def rss_kb():
+    with open('/proc/self/status') as status:
+        for linha in status:
+            if linha.startswith('VmRSS:'):
+                return int(linha.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def medir(modo, caminho):
+    """Executado em subprocesso para cada modo ter um RSS limpo"""
+    sys.path.insert(0, BACKEND)
+    if modo == 'colunar':
+        from server import ler_csv
+    base = rss_kb()
+    inicio = time.perf_counter()
+    dados = ler_lista_dicts(caminho) if modo == 'lista' else ler_csv(caminho)
+    duracao = time.perf_counter() - inicio
+    print(f'{modo};{len(dados)};{duracao:.3f};{(rss_kb() - base) / 1024:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=200000)
+    parser.add_argument('--csv', help='operadoras.csv a usar (padrão: um sintético com --linhas linhas)')
+    parser.add_argument('--medir', choices=['lista', 'colunar'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir, args.csv)
+        return
+
+    args.csv = args.csv or em_cache(f'operadoras_{args.linhas}.csv', gerar_operadoras, args.linhas)
+
+    print(f"{'modo':<10}{'linhas':>10}{'carga (s)':>12}{'RSS (MB)':>12}")
+    for modo in ('lista', 'colunar'):
+        saida = subprocess.run(
+            [sys.executable, __file__, '--csv', args.csv, '--medir', modo],
+            capture_output=True, text=True, check=True, env=dict(os.environ, OPERADORAS_CSV=args.csv, RECARGA_INTERVALO='0')
+        ).stdout.strip().splitlines()[-1]
+        nome, linhas, duracao, rss = saida.split(';')
+        print(f'{nome:<10}{linhas:>10}{duracao:>12}{rss:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Compara o empacotamento dos anexos do Teste 1: PDFs em disco x direto no ZIP.
+
+Gera anexos sintéticos grandes, serve-os pelo `comum.servidor_local` com uma
+página no formato da página do Rol e roda o `teste1WebScraping.py` inteiro
+no modo disco e no modo direto com cada nível de compressão, sempre num
+diretório de trabalho novo (sem cache de execuções anteriores). Mede o tempo, o tamanho do ZIP, os bytes gravados em disco
+pelo processo e o pico de memória.
+
+Uso:
+    python benchmarks/bench_empacotamento_anexos.py --anexos 4 --megabytes 100 --niveis 0 1 6
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from geradores import DIRETORIO, RAIZ, em_cache, gerar_anexo
+
+sys.path.insert(0, RAIZ)
+
+from comum.servidor_local import iniciar  # noqa: E402
+
+SCRIPT = os.path.join(RAIZ, 'teste1WebScraping.py')
+
+
+def preparar_site(diretorio, anexos, url):
+    """Diretório servido: a página com os links e os anexos (hardlinks do cache)"""
+    links = []
+    for i, caminho in enumerate(anexos):
+        nome = f'anexo_{i}.pdf'
+        os.link(caminho, os.path.join(diretorio, nome))
+        # Links absolutos, como os do gov.br
+        links.append(f'<a href="{url}/{nome}">Anexo I{"I" * (i % 2)} parte {i}</a>')
+    with open(os.path.join(diretorio, 'pagina.html'), 'w', encoding='utf-8') as arquivo:
+        arquivo.write('<html><body>' + '\n'.join(links) + '</body></html>')
+
+
+def medir(argumentos, url):
+    trabalho = tempfile.mkdtemp(dir=DIRETORIO)
+    try:
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(
+            [sys.executable, SCRIPT, *argumentos], cwd=trabalho,
+            env={**os.environ, 'ANS_ROL_URL': f'{url}/pagina.html',
+                 'METRICAS_RELATORIOS': os.path.join(trabalho, 'relatorios')},
+            stdout=subprocess.DEVNULL
+        )
+        _, codigo, uso = os.wait4(processo.pid, 0)
+        duracao = time.perf_counter() - inicio
+        if os.waitstatus_to_exitcode(codigo):
+            raise RuntimeError(f'teste1WebScraping.py {" ".join(argumentos)} falhou')
+        zip_path = os.path.join(trabalho, 'anexos.zip')
+        return duracao, os.path.getsize(zip_path), uso.ru_oublock * 512, uso.ru_maxrss * 1024
+    finally:
+        shutil.rmtree(trabalho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anexos', type=int, default=4)
+    parser.add_argument('--megabytes', type=int, default=100, help='tamanho de cada anexo')
+    parser.add_argument('--niveis', type=int, nargs='+', default=[0, 1, 6],
+                        help='níveis de compressão do modo direto')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    anexos = [em_cache(f'anexo_{args.megabytes}mb_{i}.pdf', gerar_anexo, args.megabytes, semente=i)
+              for i in range(args.anexos)]
+    total = sum(os.path.getsize(caminho) for caminho in anexos)
+    print(f'{args.anexos} anexos, {total / 2**20:.0f} MB no total')
+
+    site = tempfile.mkdtemp(dir=DIRETORIO)
+    try:
+        servidor, url = iniciar(site)
+        preparar_site(site, anexos, url)
+
+        modos = [('disco', ['--empacotamento', 'disco'])] + [
+            (f'direto-{nivel}', ['--empacotamento', 'direto', '--nivel-compressao', str(nivel)])
+            for nivel in args.niveis
+        ]
+        print(f"{'modo':<10}{'tempo (s)':>11}{'MB/s':>8}{'ZIP (MB)':>10}{'gravado (MB)':>14}{'pico (MB)':>11}")
+        for nome, argumentos in modos:
+            # Melhor de N: o servidor e o cache de páginas são compartilhados
+            duracao, tamanho_zip, gravado, pico = min(medir(argumentos, url) for _ in range(args.repeticoes))
+            print(f'{nome:<10}{duracao:>11.2f}{total / 2**20 / duracao:>8.1f}{tamanho_zip / 2**20:>10.1f}'
+                  f'{gravado / 2**20:>14.1f}{pico / 2**20:>11.1f}')
+        servidor.shutdown()
+    finally:
+        shutil.rmtree(site)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Mede páginas/s da extração de tabelas do PDF por quantidade de workers.
+
+Também confere se a saída de cada modo é idêntica à do primeiro da lista
+(o padrão começa em 1 worker, o modo serial).
+
+Uso:
+    python benchmarks/bench_extracao_pdf.py "downloads/Anexo I..pdf" --workers 1 2 4 8
+    python benchmarks/bench_extracao_pdf.py --paginas 200   # PDF sintético
+"""
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pdfplumber  # noqa: E402
+
+from geradores import em_cache, gerar_pdf  # noqa: E402
+from teste2Csv import iterar_tabelas  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdf', nargs='?', default=os.path.join(RAIZ, 'downloads', 'Anexo I..pdf'))
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--paginas', type=int,
+                        help='usa um PDF sintético no formato do Anexo I com esta quantidade de páginas')
+    args = parser.parse_args()
+    if args.paginas:
+        args.pdf = em_cache(f'anexo_{args.paginas}p.pdf', gerar_pdf, args.paginas)
+
+    with pdfplumber.open(args.pdf) as pdf:
+        total_paginas = len(pdf.pages)
+    print(f'{args.pdf}: {total_paginas} páginas')
+
+    referencia = None
+    print(f"{'workers':>8}{'tempo (s)':>12}{'páginas/s':>12}{'idêntico':>10}")
+    for workers in args.workers:
+        inicio = time.perf_counter()
+        tabelas = list(iterar_tabelas(args.pdf, workers))
+        duracao = time.perf_counter() - inicio
+        if referencia is None:
+            referencia = tabelas
+        identico = 'sim' if tabelas == referencia else 'NÃO'
+        print(f'{workers:>8}{duracao:>12.2f}{total_paginas / duracao:>12.1f}{identico:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compara, por página, a detecção completa da tabela do Teste 2 com a grade aprendida.
+
+Extrai o mesmo PDF sintético com `--extracao completa` (pdfplumber acha a
+tabela do zero em cada página) e com `--extracao grade` (as colunas
+aprendidas nas primeiras páginas são reaproveitadas nas seguintes). Um
+segundo PDF tem `--outro-layout` páginas com colunas diferentes, que
+precisam cair na detecção completa. Cada extração é conferida com
+`page.extract_table`, linha a linha.
+
+Uso:
+    python benchmarks/bench_geometria_pdf.py --paginas 50 --outro-layout 3 --workers 1
+"""
+import argparse
+import sys
+import time
+
+import pdfplumber
+
+from geradores import RAIZ, em_cache, gerar_pdf
+
+sys.path.insert(0, RAIZ)
+
+from teste2Csv import CONFIG_TABELA, PAGINAS_EXTRAIDAS, iterar_tabelas  # noqa: E402
+
+
+def referencia(caminho):
+    with pdfplumber.open(caminho) as pdf:
+        return [pagina.extract_table(CONFIG_TABELA) for pagina in pdf.pages]
+
+
+def medir(caminho, grade, workers):
+    antes = dict(PAGINAS_EXTRAIDAS._series)
+    inicio = time.perf_counter()
+    tabelas = list(iterar_tabelas(caminho, workers, grade=grade))
+    duracao = time.perf_counter() - inicio
+    pela_grade = PAGINAS_EXTRAIDAS._series.get(('grade',), 0) - antes.get(('grade',), 0)
+    return tabelas, duracao, pela_grade
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paginas', type=int, default=50)
+    parser.add_argument('--outro-layout', type=int, default=3, help='páginas com colunas diferentes')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    uniforme = em_cache(f'anexo_{args.paginas}p.pdf', gerar_pdf, args.paginas)
+    passo = max(1, args.paginas // max(1, args.outro_layout))
+    diferentes = set(range(passo // 2, args.paginas, passo)[:args.outro_layout])
+    misto = em_cache(f'anexo_{args.paginas}p_layout{args.outro_layout}.pdf', gerar_pdf, args.paginas,
+                     outro_layout=diferentes)
+
+    print(f"{'PDF':<10}{'extração':<10}{'tempo (s)':>11}{'ms/página':>11}{'pela grade':>12}{'idêntico':>10}")
+    for nome, caminho in [('uniforme', uniforme), ('misto', misto)]:
+        esperado = referencia(caminho)
+        for modo in ('completa', 'grade'):
+            tabelas, duracao, pela_grade = medir(caminho, modo == 'grade', args.workers)
+            identico = 'sim' if tabelas == esperado else 'NÃO'
+            print(f'{nome:<10}{modo:<10}{duracao:>11.2f}{duracao / args.paginas * 1000:>11.1f}'
+                  f'{pela_grade:>12}{identico:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compara o tempo de importação das operadoras: linha a linha x em lote.
+
+Precisa do MySQL do Teste 3 rodando (docker-compose up -d em teste3). Cada
+modo roda sobre a mesma tabela; como os dois fazem upsert, o conteúdo final
+deve ser igual, o que é conferido pelo CHECKSUM TABLE.
+
+Uso:
+    python benchmarks/bench_import_operadoras.py --modos linha bulk --repeticoes 2
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTE3 = os.path.join(RAIZ, 'teste3')
+sys.path.insert(0, TESTE3)
+
+import teste3_bancoDeDados as banco  # noqa: E402
+
+MODOS = {
+    'linha': banco.import_operadoras,
+    'bulk': banco.import_operadoras_bulk,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modos', nargs='+', choices=sorted(MODOS), default=['linha', 'bulk'])
+    parser.add_argument('--repeticoes', type=int, default=1)
+    args = parser.parse_args()
+
+    # Os caminhos de dados do script são relativos ao diretório do Teste 3
+    os.chdir(TESTE3)
+    os.makedirs('dados_ans', exist_ok=True)
+    # Com as opções da carga em lote, para o modo bulk medir o LOAD DATA
+    conn = banco.create_db_connection(**banco.staging_options())
+    if not conn:
+        return 1
+
+    try:
+        if not banco.setup_database_tables(conn):
+            return 1
+        # Garante o CSV baixado antes de medir, para não cronometrar o download
+        if banco.read_operadoras_csv() is None:
+            return 1
+
+        print(f"{'modo':>8}{'rodada':>8}{'tempo (s)':>12}{'linhas':>10}  checksum")
+        for modo in args.modos:
+            for rodada in range(1, args.repeticoes + 1):
+                inicio = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ok = MODOS[modo](conn)
+                duracao = time.perf_counter() - inicio
+                cursor = conn.cursor()
+                cursor.execute('SELECT COUNT(*) FROM operadoras')
+                linhas = cursor.fetchone()[0]
+                cursor.execute('CHECKSUM TABLE operadoras')
+                checksum = cursor.fetchone()[1]
+                cursor.close()
+                estado = checksum if ok else 'falhou'
+                print(f'{modo:>8}{rodada:>8}{duracao:>12.2f}{linhas:>10}  {estado}')
+    finally:
+        if conn.is_connected():
+            conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Compara pico de memória e tempo da leitura de um CSV trimestral: inteiro x em blocos.
+
+Mede só a leitura e os filtros (sem banco). O CSV sintético segue o formato
+das demonstrações contábeis da ANS, com a mesma proporção pequena de linhas
+de sinistros.
+
+Uso:
+    python benchmarks/bench_ingest_demonstracoes.py --linhas 2000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from geradores import RAIZ, em_cache, gerar_demonstracoes, registro
+
+TESTE3 = os.path.join(RAIZ, 'teste3')
+
+OPERADORAS = 1200
+
+
+def ler_completo(caminho, operadoras):
+    """Leitura original: o arquivo inteiro como texto, filtrado depois"""
+    import pandas as pd
+    df = pd.read_csv(caminho, sep=';', encoding='latin1', dtype=str)
+    df.columns = [col.strip().upper() for col in df.columns]
+    df = df.rename(columns={'DATA': 'data', 'REG_ANS': 'registro_ans', 'CD_CONTA_CONTABIL': 'conta',
+                            'DESCRICAO': 'descricao', 'VL_SALDO_FINAL': 'valor'})
+    df['data'] = pd.to_datetime(df['data'], format='%Y-%m-%d', errors='coerce')
+    df['valor'] = pd.to_numeric(df['valor'].str.replace('.', '').str.replace(',', '.'), errors='coerce')
+    df = df[
+        df['registro_ans'].isin(operadoras) &
+        df['descricao'].str.contains('EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS', case=False, na=False) &
+        df['data'].notna() &
+        df['valor'].notna()
+    ]
+    return len(df), round(float(df['valor'].sum()), 2)
+
+
+def ler_em_blocos(caminho, operadoras):
+    from teste3_bancoDeDados import iter_demonstracoes, map_demonstracoes_columns
+    renomear, _ = map_demonstracoes_columns(caminho)
+    linhas, soma = 0, 0.0
+    for df in iter_demonstracoes(caminho, renomear, '1T2024', operadoras):
+        linhas += len(df)
+        soma += float(df['valor'].sum())
+    return linhas, round(soma, 2)
+
+
+def medir(modo, caminho):
+    """Executado em subprocesso para cada modo ter um pico de memória limpo"""
+    sys.path.insert(0, TESTE3)
+    import pandas  # noqa: F401  (fora da medição)
+    if modo == 'blocos':
+        import teste3_bancoDeDados  # noqa: F401
+    operadoras = {registro(i) for i in range(OPERADORAS)}
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    linhas, soma = (ler_completo if modo == 'completo' else ler_em_blocos)(caminho, operadoras)
+    duracao = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    print(f'{modo};{linhas};{soma};{duracao:.3f};{pico / 1024:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=2000000)
+    parser.add_argument('--csv', help='CSV trimestral a usar (padrão: um sintético com --linhas linhas)')
+    parser.add_argument('--medir', choices=['completo', 'blocos'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir, args.csv)
+        return
+
+    args.csv = args.csv or em_cache(f'demonstracoes_{args.linhas}.csv', gerar_demonstracoes,
+                                    args.linhas, OPERADORAS)
+    print(f'{args.csv}: {os.path.getsize(args.csv) / 2**20:.0f} MB')
+
+    print(f"{'modo':<10}{'linhas':>10}{'soma':>18}{'tempo (s)':>12}{'pico (MB)':>12}")
+    for modo in ('completo', 'blocos'):
+        saida = subprocess.run(
+            [sys.executable, __file__, '--csv', args.csv, '--medir', modo],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        nome, linhas, soma, duracao, pico = saida.split(';')
+        print(f'{nome:<10}{linhas:>10}{soma:>18}{duracao:>12}{pico:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Compara os layouts de demonstracoes_contabeis: clássico x particionado (x compactado).
+
+Precisa do MySQL do Teste 3 rodando (docker-compose up -d em teste3) e de
+um usuário que possa criar bancos, pois cada layout é medido num banco novo
+(`<prefixo>_<layout>`), sem tocar no ans_dados:
+
+    MYSQL_USER=root MYSQL_PASSWORD=rootpassword \\
+        python benchmarks/bench_layout_demonstracoes.py --operadoras 1000 --contas 200
+
+Para cada layout, mede a carga dos trimestres sintéticos (linhas/s), o
+tamanho em disco (dados + índices) e a latência mediana das consultas
+usadas pelo script: recálculo dos totais de um período, top 10 de um
+período direto na tabela bruta e recarga de um período.
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+import mysql.connector
+
+from geradores import DIRETORIO, RAIZ, registro, trimestres
+
+TESTE3 = os.path.join(RAIZ, 'teste3')
+sys.path.insert(0, TESTE3)
+
+import layout_particionado  # noqa: E402
+import teste3_bancoDeDados as banco  # noqa: E402
+
+CENARIOS = {
+    'classico': ('classico', False),
+    'particionado': ('particionado', False),
+    'compactado': ('particionado', True),
+}
+
+TABELAS = {
+    'classico': ['demonstracoes_contabeis'],
+    'particionado': ['demonstracoes_fato', 'contas'],
+}
+
+
+def preparar_banco(nome):
+    """Recria o banco do cenário e aponta o script para ele"""
+    config = {chave: valor for chave, valor in banco.DB_CONFIG.items() if chave != 'database'}
+    conn = mysql.connector.connect(**config)
+    cursor = conn.cursor()
+    cursor.execute(f'DROP DATABASE IF EXISTS {nome}')
+    cursor.execute(f'CREATE DATABASE {nome}')
+    cursor.close()
+    conn.close()
+    banco.DB_CONFIG['database'] = nome
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def top10_bruto(conn, periodo):
+    """Top 10 de despesas do período direto nas linhas, sem os totais pré-agregados"""
+    despesas = ', '.join(str(codigo) for codigo in banco.CATEGORIAS_DESPESA) or 'NULL'
+    if banco.layout_demonstracoes == 'particionado':
+        filtro, parametro = 'FROM demonstracoes_fato WHERE periodo_id = %s', layout_particionado.periodo_id(periodo)
+    else:
+        filtro, parametro = 'FROM demonstracoes_contabeis WHERE periodo = %s', periodo
+    cursor = conn.cursor()
+    cursor.execute(f"""
+    SELECT registro_ans, SUM(valor) AS total {filtro} AND categoria IN ({despesas})
+    GROUP BY registro_ans ORDER BY total DESC LIMIT 10
+    """, (parametro,))
+    cursor.fetchall()
+    cursor.close()
+
+
+def medir(cenario, args, arquivos):
+    layout, compactar = CENARIOS[cenario]
+    preparar_banco(f'{args.prefixo}_{cenario}')
+    layout_particionado.contas_cache.limpar()
+    conn = banco.create_db_connection()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not banco.setup_database_tables(conn, layout=layout, compactar=compactar):
+                raise RuntimeError(f'não foi possível criar as tabelas de {cenario}')
+        cursor = conn.cursor()
+        cursor.executemany('INSERT INTO operadoras (registro_ans, razao_social) VALUES (%s, %s)',
+                           [(registro(op), f'OPERADORA {op}') for op in range(args.operadoras)])
+        conn.commit()
+        operadoras = {registro(op) for op in range(args.operadoras)}
+
+        linhas = 0
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for periodo, caminho in arquivos:
+                renomear, _ = banco.map_demonstracoes_columns(caminho)
+                banco.replace_period(conn, periodo)
+                gravadas, falhas = banco.load_quarter_file(conn, caminho, renomear, periodo, operadoras)
+                if falhas:
+                    raise RuntimeError(f'{falhas} lotes falharam em {caminho}')
+                banco.refresh_rollups(conn, periodo)
+                linhas += gravadas
+        carga = time.perf_counter() - inicio
+
+        tamanhos = layout_particionado.tamanho_tabelas(cursor, TABELAS[layout])
+        dados = sum(d for d, _ in tamanhos.values())
+        indices = sum(i for _, i in tamanhos.values())
+
+        periodo, caminho = arquivos[-1]
+        consultas = {
+            'totais': cronometrar(lambda: banco.refresh_rollups(conn, periodo), args.repeticoes),
+            'top10': cronometrar(lambda: top10_bruto(conn, periodo), args.repeticoes),
+        }
+
+        # Recarga de um período: esvaziar e gravar de novo
+        renomear, _ = banco.map_demonstracoes_columns(caminho)
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            banco.replace_period(conn, periodo)
+            banco.load_quarter_file(conn, caminho, renomear, periodo, operadoras)
+        consultas['recarga'] = time.perf_counter() - inicio
+        cursor.close()
+        return linhas, carga, dados, indices, consultas
+    finally:
+        if conn.is_connected():
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cenarios', nargs='+', choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument('--operadoras', type=int, default=1000)
+    parser.add_argument('--contas', type=int, default=200, help='contas por operadora em cada trimestre')
+    parser.add_argument('--trimestres', type=int, default=4)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--prefixo', default='ans_bench')
+    parser.add_argument('--dir', default=DIRETORIO)
+    args = parser.parse_args()
+
+    arquivos = trimestres(args.trimestres, args.operadoras, args.contas, args.dir)
+
+    print(f"{'layout':<14}{'linhas':>10}{'carga (s)':>11}{'linhas/s':>11}{'dados (MB)':>12}"
+          f"{'índices (MB)':>14}{'totais (ms)':>13}{'top10 (ms)':>12}{'recarga (s)':>13}")
+    for cenario in args.cenarios:
+        linhas, carga, dados, indices, consultas = medir(cenario, args, arquivos)
+        print(f'{cenario:<14}{linhas:>10}{carga:>11.1f}{linhas / carga:>11,.0f}'
+              f'{dados / 2**20:>12.1f}{indices / 2**20:>14.1f}'
+              f"{consultas['totais'] * 1000:>13.1f}{consultas['top10'] * 1000:>12.1f}"
+              f"{consultas['recarga']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
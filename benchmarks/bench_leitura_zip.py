@@ -0,0 +1,87 @@
+"""Compara a leitura de um trimestre: CSV extraído do ZIP x CSV lido de dentro do ZIP.
+
+Cada modo parte do ZIP baixado em dados_ans e faz o que a importação faz
+antes de gravar: obtém a fonte (`extract_quarter_csv`), calcula o hash do
+manifesto, lê o cabeçalho e percorre os blocos filtrados. Mede o tempo, o
+espaço em disco que sobra no fim (ZIP + CSV extraído) e o pico de memória.
+
+Uso:
+    python benchmarks/bench_leitura_zip.py --linhas 5000000
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from geradores import DIRETORIO, RAIZ, em_cache, gerar_demonstracoes, registro
+
+TESTE3 = os.path.join(RAIZ, 'teste3')
+sys.path[:0] = [RAIZ, TESTE3]
+
+OPERADORAS = 1200
+MODOS = ['extrair', 'direta']
+
+
+def compactar(caminho, csv_path):
+    with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.write(csv_path, '1T2024.csv')
+
+
+def medir(modo, zip_path):
+    """Executado em subprocesso, num diretório de trabalho novo, para cada modo"""
+    import teste3_bancoDeDados as banco
+    from comum.download import ResultadoDownload
+
+    os.makedirs('dados_ans')
+    os.link(zip_path, 'dados_ans/1T2024.zip')
+    banco.leitura_trimestres = modo
+    operadoras = {registro(i) for i in range(OPERADORAS)}
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    fonte = banco.extract_quarter_csv(2024, '1T', ResultadoDownload('', 'dados_ans/1T2024.zip', 'baixado'))
+    banco.file_sha256(fonte)
+    renomear, _ = banco.map_demonstracoes_columns(fonte)
+    linhas = sum(len(df) for df in banco.iter_demonstracoes(fonte, renomear, '1T2024', operadoras))
+    duracao = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    disco = sum(os.path.getsize(os.path.join('dados_ans', nome)) for nome in os.listdir('dados_ans'))
+    print(f'{modo};{linhas};{duracao:.3f};{disco / 2**20:.1f};{pico / 1024:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=2000000)
+    parser.add_argument('--medir', choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument('--zip', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir, args.zip)
+        return
+
+    csv_path = em_cache(f'demonstracoes_{args.linhas}.csv', gerar_demonstracoes, args.linhas, OPERADORAS)
+    zip_path = em_cache(f'demonstracoes_{args.linhas}.zip', compactar, csv_path)
+    print(f'{zip_path}: {os.path.getsize(zip_path) / 2**20:.0f} MB '
+          f'(CSV de {os.path.getsize(csv_path) / 2**20:.0f} MB)')
+
+    print(f"{'modo':<10}{'linhas':>10}{'tempo (s)':>12}{'disco (MB)':>12}{'pico (MB)':>12}")
+    for modo in MODOS:
+        trabalho = tempfile.mkdtemp(dir=DIRETORIO)
+        try:
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--medir', modo, '--zip', zip_path],
+                capture_output=True, text=True, check=True, cwd=trabalho
+            ).stdout.strip().splitlines()[-1]
+        finally:
+            shutil.rmtree(trabalho)
+        nome, linhas, duracao, disco, pico = saida.split(';')
+        print(f'{nome:<10}{linhas:>10}{duracao:>12}{disco:>12}{pico:>12}')
+
+
+if __name__ == '__main__':
+    main()
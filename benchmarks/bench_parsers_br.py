@@ -0,0 +1,104 @@
+"""Micro-benchmark do comum/parsers_br contra as conversões antigas do Teste 3.
+
+- valores: `.str.replace('.', '')` + `.str.replace(',', '.')` + `pd.to_numeric`
+  x `parsers_br.centavos`;
+- datas dd/mm/aaaa: `pd.to_datetime` valor a valor (importação linha a linha)
+  e na coluna inteira x `parsers_br.datas`.
+
+Também confere se as duas formas concordam nos valores bem formados.
+
+Uso:
+    python benchmarks/bench_parsers_br.py --linhas 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from comum import parsers_br  # noqa: E402
+
+
+def gerar_valores(linhas, semente=42):
+    rnd = random.Random(semente)
+    valores = []
+    for _ in range(linhas):
+        reais = rnd.randrange(10 ** rnd.randrange(1, 11))
+        inteiro = f'{reais:,}'.replace(',', '.') if rnd.random() < 0.3 else str(reais)
+        sinal = '-' if rnd.random() < 0.1 else ''
+        valores.append(f'{sinal}{inteiro},{rnd.randrange(100):02d}')
+    return pd.Series(valores, dtype=object)
+
+
+def gerar_datas(linhas, semente=42):
+    rnd = random.Random(semente)
+    return pd.Series([f'{rnd.randrange(1, 29):02d}/{rnd.randrange(1, 13):02d}/{rnd.randrange(1990, 2025)}'
+                      for _ in range(linhas)], dtype=object)
+
+
+def valores_encadeado(serie):
+    return pd.to_numeric(serie.str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+                         errors='coerce')
+
+
+def datas_escalar(serie):
+    return [pd.to_datetime(valor, format='%d/%m/%Y', errors='coerce') for valor in serie]
+
+
+def datas_coluna(serie):
+    return pd.to_datetime(serie, format='%d/%m/%Y', errors='coerce')
+
+
+def medir(funcao, serie, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(serie)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=1000000)
+    parser.add_argument('--linhas-escalar', type=int, default=20000,
+                        help='linhas do teste valor a valor (lento), extrapolado para --linhas')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    valores = gerar_valores(args.linhas)
+    datas = gerar_datas(args.linhas)
+
+    print(f"{'conversão':<34}{'tempo (s)':>11}{'Mlinhas/s':>11}")
+    resultados = {}
+    for nome, funcao, serie in [
+        ('valores: replace + to_numeric', valores_encadeado, valores),
+        ('valores: parsers_br.centavos', parsers_br.centavos, valores),
+        ('datas: to_datetime na coluna', datas_coluna, datas),
+        ('datas: parsers_br.datas', lambda s: parsers_br.datas(s, formatos=('%d/%m/%Y',)), datas),
+    ]:
+        duracao, resultados[nome] = medir(funcao, serie, args.repeticoes)
+        print(f'{nome:<34}{duracao:>11.3f}{args.linhas / duracao / 1e6:>11.2f}')
+
+    amostra = datas.iloc[:args.linhas_escalar]
+    duracao, _ = medir(datas_escalar, amostra, 1)
+    estimado = duracao * args.linhas / len(amostra)
+    print(f"{'datas: to_datetime valor a valor':<34}{estimado:>11.3f}{args.linhas / estimado / 1e6:>11.2f}"
+          f"  (estimado a partir de {len(amostra)} linhas)")
+
+    centavos = resultados['valores: parsers_br.centavos']
+    antigos = np.round(resultados['valores: replace + to_numeric'].to_numpy() * 100).astype(np.int64)
+    divergentes = int((centavos.to_numpy(dtype=np.int64) != antigos).sum())
+    datas_iguais = resultados['datas: parsers_br.datas'].equals(resultados['datas: to_datetime na coluna'])
+    print(f'\nValores divergentes: {divergentes}; datas iguais: {datas_iguais}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Teste de carga da API servida pelo Gunicorn com 1, 2, 4 e N workers.
+
+Gera um operadoras.csv sintético, sobe o Gunicorn com cada quantidade de
+workers e dispara requisições concorrentes em /api/buscar, reportando
+requisições/s e percentis de latência.
+
+Uso:
+    python benchmarks/bench_servidor.py --linhas 100000 --clientes 16 --duracao 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from bench_carga_api import BACKEND
+from geradores import em_cache, gerar_operadoras
+
+TERMOS = ['unimed', 'saude', 'sa', 'odonto', 'assist', 'operadora 12', '3001', 'ltda', 'cidade 7', 'medicina']
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def aguardar_servidor(porta, limite=120):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=2)
+            conexao.request('GET', '/api/health')
+            if conexao.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('Servidor não respondeu a tempo')
+
+
+def cliente(args):
+    """Faz requisições em sequência até o fim da janela e devolve as latências"""
+    porta, duracao, semente, limite = args
+    rnd = random.Random(semente)
+    latencias = []
+    fim = time.monotonic() + duracao
+    while time.monotonic() < fim:
+        termo = rnd.choice(TERMOS)
+        inicio = time.perf_counter()
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+        conexao.request('GET', f'/api/buscar?termo={quote(termo)}&limit={limite}')
+        resposta = conexao.getresponse()
+        resposta.read()
+        conexao.close()
+        if resposta.status == 200:
+            latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def rodar(workers, csv, clientes, duracao, limite):
+    porta = porta_livre()
+    ambiente = dict(os.environ, OPERADORAS_CSV=csv, RECARGA_INTERVALO='0',
+                    WEB_CONCURRENCY=str(workers), GUNICORN_BIND=f'127.0.0.1:{porta}')
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=BACKEND, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        aguardar_servidor(porta)
+        with multiprocessing.Pool(clientes) as pool:
+            resultados = pool.map(cliente, [(porta, duracao, i, limite) for i in range(clientes)])
+    finally:
+        processo.terminate()
+        processo.wait()
+
+    latencias = sorted(l for lista in resultados for l in lista)
+    return {
+        'workers': workers,
+        'requisicoes': len(latencias),
+        'req_s': len(latencias) / duracao,
+        'p50_ms': percentil(latencias, 50) * 1000,
+        'p95_ms': percentil(latencias, 95) * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=100000)
+    parser.add_argument('--csv', help='operadoras.csv a usar (padrão: um sintético com --linhas linhas)')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, multiprocessing.cpu_count()}))
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    args.csv = args.csv or em_cache(f'operadoras_{args.linhas}.csv', gerar_operadoras, args.linhas)
+
+    print(f"{'workers':>8}{'requisições':>13}{'req/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    for workers in args.workers:
+        r = rodar(workers, args.csv, args.clientes, args.duracao, args.limit)
+        print(f"{r['workers']:>8}{r['requisicoes']:>13}{r['req_s']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
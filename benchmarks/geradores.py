@@ -0,0 +1,252 @@
+"""Geradores determinísticos de dados sintéticos no formato das fontes da ANS.
+
+Com a mesma escala e a mesma semente, os arquivos saem idênticos byte a
+byte, então medições de máquinas ou commits diferentes usam os mesmos
+dados. As linhas são escritas em fluxo, sem montar o arquivo na memória,
+de 1 mil a 10 milhões de linhas.
+
+- `gerar_cadop`: Relatorio_cadop.csv do Teste 3 (latin1, ';');
+- `gerar_operadoras`: operadoras.csv da API do Teste 4 (UTF-8 com BOM);
+- `gerar_demonstracoes`: CSV trimestral das demonstrações contábeis, com
+  poucas linhas de sinistros entre muitas outras contas;
+- `gerar_trimestre`: CSV trimestral só com contas de sinistros, `contas`
+  por operadora;
+- `gerar_pdf`: PDF com uma tabela por página no formato do Anexo I;
+- `gerar_anexo`: arquivo grande com a compressibilidade de um PDF real,
+  para medir download e empacotamento.
+
+`em_cache` só gera o arquivo se ele ainda não existe em DIRETORIO.
+"""
+import csv
+import os
+import random
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO = os.path.join(RAIZ, 'benchmarks', 'dados_sinteticos')
+
+COLUNAS_OPERADORAS = [
+    'Registro_ANS', 'CNPJ', 'Razao_Social', 'Nome_Fantasia', 'Modalidade',
+    'Logradouro', 'Numero', 'Complemento', 'Bairro', 'Cidade', 'UF', 'CEP',
+    'DDD', 'Telefone', 'Fax', 'Endereco_eletronico', 'Representante',
+    'Cargo_Representante', 'Regiao_de_Comercializacao', 'Data_Registro_ANS'
+]
+
+COLUNAS_DEMONSTRACOES = ['DATA', 'REG_ANS', 'CD_CONTA_CONTABIL', 'DESCRICAO', 'VL_SALDO_INICIAL', 'VL_SALDO_FINAL']
+
+# Contas de um trimestre real, com a mesma proporção pequena de sinistros
+CONTAS = [
+    ('41', 'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS  DE ASSISTÊNCIA A SAÚDE MEDICO HOSPITALAR'),
+    ('31', 'CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE'),
+    ('12', 'APLICAÇÕES FINANCEIRAS'),
+    ('21', 'PROVISÕES TÉCNICAS DE OPERAÇÕES DE ASSISTÊNCIA À SAÚDE'),
+    ('46', 'DESPESAS ADMINISTRATIVAS'),
+] + [(f'9{i}', f'OUTRAS CONTAS {i}') for i in range(40)]
+
+DESCRICOES_SINISTROS = [
+    'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS  DE ASSISTÊNCIA A SAÚDE MEDICO HOSPITALAR',
+    'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE ODONTOLÓGICA',
+    'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS - REDE CONTRATADA',
+    'EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS - REDE PRÓPRIA',
+]
+
+COLUNAS_ANEXO = ['PROCEDIMENTO', 'RN (alteração)', 'VIGÊNCIA', 'OD', 'AMB', 'HCO', 'HSO',
+                 'REF', 'PAC', 'DUT', 'SUBGRUPO', 'GRUPO', 'CAPÍTULO']
+LARGURAS_ANEXO = [150, 50, 45, 20, 25, 25, 25, 20, 20, 20, 90, 90, 80]
+
+
+def registro(indice):
+    """Registro ANS da operadora de número `indice` (o mesmo em todos os geradores)"""
+    return str(300000 + indice)
+
+
+def em_cache(nome, gerador, *args, diretorio=DIRETORIO, **opcoes):
+    """Caminho de <diretorio>/<nome>, gerado com `gerador(caminho, *args)` se ainda não existe"""
+    caminho = os.path.join(diretorio, nome)
+    if not os.path.exists(caminho):
+        os.makedirs(diretorio, exist_ok=True)
+        print(f'Gerando {caminho}...')
+        # Gera ao lado e renomeia: uma geração interrompida não fica no cache
+        gerador(caminho + '.parcial', *args, **opcoes)
+        os.replace(caminho + '.parcial', caminho)
+    return caminho
+
+
+def _linhas_operadoras(linhas, semente):
+    rnd = random.Random(semente)
+    ufs = ['SP', 'RJ', 'MG', 'RS', 'PR', 'BA', 'SC', 'GO', 'PE', 'CE']
+    modalidades = ['Medicina de Grupo', 'Cooperativa Médica', 'Autogestão',
+                   'Odontologia de Grupo', 'Seguradora Especializada em Saúde']
+    cidades = [f'Cidade {i}' for i in range(3000)]
+    for i in range(linhas):
+        nome = f'OPERADORA {rnd.choice(["SAÚDE", "UNIMED", "ASSISTÊNCIA", "ODONTO"])} {i}'
+        yield [
+            registro(i), f'{rnd.randrange(10**13, 10**14)}', nome + ' LTDA', nome.title(),
+            rnd.choice(modalidades), f'Rua {rnd.randrange(5000)}', str(rnd.randrange(1, 3000)),
+            rnd.choice(['', '', 'Sala 1', 'Andar 2']), f'Bairro {rnd.randrange(800)}',
+            rnd.choice(cidades), rnd.choice(ufs), f'{rnd.randrange(10**7, 10**8)}',
+            str(rnd.randrange(11, 99)), f'{rnd.randrange(10**7, 10**8)}', '',
+            f'contato{i}@operadora.com.br', f'Representante {i}', 'Diretor',
+            str(rnd.randrange(1, 7)), f'{rnd.randrange(1, 28):02d}/{rnd.randrange(1, 13):02d}/20{rnd.randrange(0, 24):02d}'
+        ]
+
+
+def _escrever(caminho, encoding, cabecalho, linhas):
+    with open(caminho, 'w', encoding=encoding, newline='') as arquivo:
+        escritor = csv.writer(arquivo, delimiter=';', quoting=csv.QUOTE_ALL)
+        escritor.writerow(cabecalho)
+        escritor.writerows(linhas)
+
+
+def gerar_operadoras(caminho, linhas, semente=42):
+    """operadoras.csv da API: as colunas do cadastro da ANS, em UTF-8 com BOM"""
+    _escrever(caminho, 'utf-8-sig', COLUNAS_OPERADORAS, _linhas_operadoras(linhas, semente))
+
+
+def gerar_cadop(caminho, linhas, semente=42):
+    """Relatorio_cadop.csv como publicado pela ANS (latin1), com as mesmas operadoras"""
+    _escrever(caminho, 'latin1', COLUNAS_OPERADORAS, _linhas_operadoras(linhas, semente))
+
+
+def gerar_demonstracoes(caminho, linhas, operadoras=1200, data='2024-01-01', semente=42):
+    """Um {trimestre}{ano}.csv com contas variadas; metade dos registros ANS não está no cadastro"""
+    rnd = random.Random(semente)
+
+    def gerar():
+        for _ in range(linhas):
+            conta, descricao = rnd.choice(CONTAS)
+            yield [
+                data, registro(rnd.randrange(operadoras * 2)),
+                conta + str(rnd.randrange(1000)), descricao,
+                f'{rnd.randrange(10**8)},{rnd.randrange(100):02d}',
+                f'{rnd.randrange(10**8)},{rnd.randrange(100):02d}'
+            ]
+
+    _escrever(caminho, 'latin1', COLUNAS_DEMONSTRACOES, gerar())
+
+
+def gerar_trimestre(caminho, ano, trimestre, operadoras, contas):
+    """Um CSV trimestral sintético: cada operadora com `contas` contas de sinistros"""
+    data = f'{ano}-{3 * trimestre - 2:02d}-01'
+
+    def gerar():
+        for op in range(operadoras):
+            for conta in range(contas):
+                valor = (op * 7919 + conta * 104729 + trimestre * 31) % 10**9
+                yield [
+                    data, registro(op), f'41{conta:06d}', DESCRICOES_SINISTROS[conta % len(DESCRICOES_SINISTROS)],
+                    '0,00', f'{valor // 100},{valor % 100:02d}'
+                ]
+
+    _escrever(caminho, 'latin1', COLUNAS_DEMONSTRACOES, gerar())
+
+
+def trimestres(quantidade, operadoras, contas, diretorio=DIRETORIO):
+    """[(periodo, caminho)] de `quantidade` trimestres seguidos a partir de 1T2023, gerados se preciso"""
+    arquivos = []
+    for indice in range(quantidade):
+        ano, trimestre = 2023 + indice // 4, indice % 4 + 1
+        periodo = f'{trimestre}T{ano}'
+        caminho = em_cache(f'{periodo}_{operadoras}x{contas}.csv', gerar_trimestre,
+                           ano, trimestre, operadoras, contas, diretorio=diretorio)
+        arquivos.append((periodo, caminho))
+    return arquivos
+
+
+def _texto_pdf(texto):
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _linhas_anexo(pagina, linhas, rnd):
+    yield COLUNAS_ANEXO
+    for i in range(linhas):
+        yield [
+            f"PROCEDIMENTO {pagina}-{i} {rnd.choice(['CONSULTA', 'EXAME', 'CIRURGIA DE SAÚDE'])}",
+            f'RN {rnd.randint(1, 500)}/2021', '01/04/2021', rnd.choice(['OD', '']), rnd.choice(['AMB', '']),
+            rnd.choice(['HCO', '']), '', '', '', '', f'SUB {rnd.randint(1, 9)}', f'GRUPO {rnd.randint(1, 5)}', 'CAP'
+        ]
+
+
+def gerar_pdf(caminho, paginas, linhas_por_pagina=40, semente=1, alteradas=(), outro_layout=(),
+              coluna_nova=()):
+    """PDF em paisagem com uma tabela de grade por página, no layout do Anexo I.
+
+    O PDF é montado à mão (Helvetica, WinAnsi), com cada célula desenhada
+    como retângulo, para o pdfplumber encontrar a tabela pelas linhas. As
+    páginas em `alteradas` ganham um sufixo no procedimento, como numa nova
+    revisão do anexo; as demais saem idênticas às do PDF sem alterações.
+    As páginas em `outro_layout` têm a primeira coluna mais larga e a
+    segunda mais estreita, com o mesmo texto. As páginas em `coluna_nova`
+    ganham no fim uma coluna OBSERVAÇÃO, que as outras não têm.
+    """
+    rnd = random.Random(semente)
+    objetos = []
+
+    def adicionar(corpo):
+        objetos.append(corpo)
+        return len(objetos)
+
+    fonte = adicionar(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    conteudos = []
+    for pagina in range(paginas):
+        comandos = []
+        y, altura = 560, 12
+        for i, linha in enumerate(_linhas_anexo(pagina, linhas_por_pagina, rnd)):
+            if i and pagina in alteradas:
+                linha = [f'{linha[0]} REV', *linha[1:]]
+            x = 20
+            larguras = LARGURAS_ANEXO
+            if pagina in outro_layout:
+                larguras = [LARGURAS_ANEXO[0] + 15, LARGURAS_ANEXO[1] - 15, *LARGURAS_ANEXO[2:]]
+            if pagina in coluna_nova:
+                larguras = [*larguras, 60]
+                linha = [*linha, 'OBSERVAÇÃO' if i == 0 else ('' if i % 3 else f'OBS {i}')]
+            for largura, texto in zip(larguras, linha):
+                comandos.append(f'{x} {y} {largura} {altura} re S')
+                if texto:
+                    comandos.append(f'BT /F1 6 Tf {x + 1} {y + 3} Td ({_texto_pdf(texto)}) Tj ET')
+                x += largura
+            y -= altura
+        fluxo = '\n'.join(comandos).encode('latin-1')
+        conteudos.append(adicionar(b'<< /Length %d >>\nstream\n' % len(fluxo) + fluxo + b'\nendstream'))
+
+    # As páginas vêm logo depois dos conteúdos; o nó /Pages, depois delas
+    id_paginas = len(objetos) + paginas + 1
+    folhas = [
+        adicionar(b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 842 595] /CropBox [0 0 842 595] '
+                  b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>' % (id_paginas, fonte, conteudo))
+        for conteudo in conteudos
+    ]
+    adicionar(b'<< /Type /Pages /Kids [%s] /Count %d >>'
+              % (b' '.join(b'%d 0 R' % folha for folha in folhas), len(folhas)))
+    catalogo = adicionar(b'<< /Type /Catalog /Pages %d 0 R >>' % id_paginas)
+
+    saida = bytearray(b'%PDF-1.4\n')
+    posicoes = []
+    for numero, corpo in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b'%d 0 obj\n' % numero + corpo + b'\nendobj\n'
+    inicio_xref = len(saida)
+    saida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b'%010d 00000 n \n' % posicao
+    saida += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, catalogo, inicio_xref)
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(saida)
+
+
+def gerar_anexo(caminho, megabytes, semente=1):
+    """Arquivo de `megabytes` MB com cara de PDF: fluxos já comprimidos entre texto.
+
+    Cada bloco de 64 KB tem 48 KB de bytes aleatórios (como os fluxos Flate
+    de imagens e fontes) e 16 KB de operadores de texto repetitivos, o que
+    dá uma taxa de compressão parecida com a dos anexos da ANS. Não é um
+    PDF válido para o pdfplumber.
+    """
+    rnd = random.Random(semente)
+    texto = b''.join(b'BT /F1 6 Tf %d %d Td (PROCEDIMENTO %d) Tj ET\n' % (20 + i % 700, i % 560, i)
+                     for i in range(420))[:16 << 10]
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(b'%PDF-1.4\n')
+        for _ in range(megabytes * 16):
+            arquivo.write(b'stream\n' + rnd.randbytes(48 << 10) + b'\nendstream\n' + texto)
+        arquivo.write(b'%%EOF\n')
@@ -0,0 +1,340 @@
+"""Suíte de benchmarks de ponta a ponta com dados sintéticos, sem acessar o gov.br.
+
+Etapas (todas por padrão):
+
+- pdf: `extract_table_from_pdf` do Teste 2 num PDF no formato do Anexo I;
+- operadoras: leitura e limpeza do Relatorio_cadop (`read_operadoras_csv` +
+  `clean_operadoras`); com --mysql, `import_operadoras_bulk` completo;
+- demonstracoes: leitura filtrada dos CSVs trimestrais (`iter_demonstracoes`);
+  com --mysql, `load_quarter_file` + `refresh_rollups`;
+- relatorios: top 10 no backend Parquet; com --mysql, `run_analytical_queries`
+  no banco carregado pela etapa demonstracoes;
+- busca: carga do operadoras.csv e `buscar_operadoras` da API.
+
+Os dados vêm de benchmarks/geradores.py e ficam em cache em
+benchmarks/dados_sinteticos. Cada etapa roda num subprocesso próprio, então
+o pico de memória (RSS máximo) é só dela. O resultado, com vazão e pico de
+cada etapa, é gravado em benchmarks/resultados/<data-hora>.json; com
+--comparar, é comparado com uma execução anterior.
+
+Uso:
+    python benchmarks/suite.py --linhas 100000
+    python benchmarks/suite.py --linhas 1000000 --etapas demonstracoes busca --comparar
+    MYSQL_USER=root MYSQL_PASSWORD=rootpassword python benchmarks/suite.py --mysql
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from geradores import (DIRETORIO, RAIZ, em_cache, gerar_cadop, gerar_demonstracoes,
+                       gerar_operadoras, gerar_pdf, registro)
+
+TESTE3 = os.path.join(RAIZ, 'teste3')
+BACKEND = os.path.join(RAIZ, 'teste4', 'backend')
+RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+ETAPAS = ['pdf', 'operadoras', 'demonstracoes', 'relatorios', 'busca']
+
+TERMOS = ['unimed', 'saude', 'odonto', 'assist', 'ltda', 'cidade', 'medicina', 'sa', 'rua 1']
+
+
+def dados(args):
+    """Arquivos de entrada de cada etapa, gerados na primeira vez"""
+    trimestres = []
+    for indice in range(args.trimestres):
+        ano, trimestre = 2023 + indice // 4, indice % 4 + 1
+        periodo = f'{trimestre}T{ano}'
+        caminho = em_cache(f'demonstracoes_{periodo}_{args.linhas}x{args.operadoras}.csv', gerar_demonstracoes,
+                           args.linhas, args.operadoras, f'{ano}-{3 * trimestre - 2:02d}-01', semente=indice)
+        trimestres.append((periodo, caminho))
+    return {
+        'pdf': em_cache(f'anexo_{args.paginas}p.pdf', gerar_pdf, args.paginas),
+        'cadop': em_cache(f'cadop_{args.operadoras}.csv', gerar_cadop, args.operadoras),
+        'trimestres': trimestres,
+        'api': em_cache(f'operadoras_{args.linhas}.csv', gerar_operadoras, args.linhas),
+    }
+
+
+@contextlib.contextmanager
+def silencio():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def banco_suite(args, recriar, **opcoes):
+    """Conexão com o banco da suíte (`<prefixo>_suite`), recriado se `recriar`"""
+    import teste3_bancoDeDados as banco
+    from bench_layout_demonstracoes import preparar_banco
+    nome = f'{args.prefixo}_suite'
+    if recriar:
+        preparar_banco(nome)
+    banco.DB_CONFIG['database'] = nome
+    conn = banco.create_db_connection(**opcoes)
+    if not conn:
+        raise RuntimeError(f'sem conexão com o MySQL ({nome})')
+    return conn
+
+
+def etapa_pdf(args, arquivos):
+    from teste2Csv import extract_table_from_pdf
+    inicio = time.perf_counter()
+    df = extract_table_from_pdf(arquivos['pdf'], workers=args.workers)
+    return {'duracao_s': time.perf_counter() - inicio, 'itens': args.paginas,
+            'linhas': len(df), 'bytes': os.path.getsize(arquivos['pdf'])}
+
+
+def etapa_operadoras(args, arquivos):
+    import teste3_bancoDeDados as banco
+    banco.OPERADORAS_CSV = arquivos['cadop']
+    resultado = {'itens': 1, 'bytes': os.path.getsize(arquivos['cadop'])}
+    if not args.mysql:
+        inicio = time.perf_counter()
+        with silencio():
+            linhas = len(banco.clean_operadoras(banco.read_operadoras_csv()))
+        return dict(resultado, duracao_s=time.perf_counter() - inicio, linhas=linhas)
+
+    conn = banco_suite(args, recriar=True, **banco.staging_options())
+    try:
+        with silencio():
+            if not banco.setup_database_tables(conn, layout='classico'):
+                raise RuntimeError('não foi possível criar as tabelas')
+            inicio = time.perf_counter()
+            if not banco.import_operadoras_bulk(conn):
+                raise RuntimeError('a importação das operadoras falhou')
+            duracao = time.perf_counter() - inicio
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM operadoras')
+        linhas = cursor.fetchone()[0]
+        cursor.close()
+        return dict(resultado, duracao_s=duracao, linhas=linhas)
+    finally:
+        conn.close()
+
+
+def etapa_demonstracoes(args, arquivos):
+    import teste3_bancoDeDados as banco
+    operadoras = {registro(i) for i in range(args.operadoras)}
+    # A vazão conta as linhas lidas; as que passam pelos filtros vão em `importadas`
+    resultado = {'itens': len(arquivos['trimestres']), 'linhas': args.linhas * len(arquivos['trimestres']),
+                 'bytes': sum(os.path.getsize(caminho) for _, caminho in arquivos['trimestres'])}
+    importadas = 0
+    if not args.mysql:
+        inicio = time.perf_counter()
+        for periodo, caminho in arquivos['trimestres']:
+            renomear, _ = banco.map_demonstracoes_columns(caminho)
+            for df in banco.iter_demonstracoes(caminho, renomear, periodo, operadoras):
+                importadas += len(df)
+        return dict(resultado, duracao_s=time.perf_counter() - inicio, importadas=importadas)
+
+    # Banco novo com as operadoras já gravadas; só a carga das demonstrações é medida
+    conn = banco_suite(args, recriar=True)
+    try:
+        with silencio():
+            if not banco.setup_database_tables(conn, layout='classico'):
+                raise RuntimeError('não foi possível criar as tabelas')
+        cursor = conn.cursor()
+        cursor.executemany('INSERT INTO operadoras (registro_ans, razao_social) VALUES (%s, %s)',
+                           [(op, f'OPERADORA {op}') for op in sorted(operadoras)])
+        conn.commit()
+        cursor.close()
+        inicio = time.perf_counter()
+        with silencio():
+            for periodo, caminho in arquivos['trimestres']:
+                renomear, _ = banco.map_demonstracoes_columns(caminho)
+                gravadas, falhas = banco.load_quarter_file(conn, caminho, renomear, periodo, operadoras)
+                if falhas:
+                    raise RuntimeError(f'{falhas} lotes falharam em {caminho}')
+                banco.refresh_rollups(conn, periodo)
+                importadas += gravadas
+        return dict(resultado, duracao_s=time.perf_counter() - inicio, importadas=importadas)
+    finally:
+        conn.close()
+
+
+def etapa_relatorios(args, arquivos):
+    import analise_colunar
+    import teste3_bancoDeDados as banco
+    tempos = []
+    if args.mysql:
+        conn = banco_suite(args, recriar=False)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM demonstracoes_contabeis')
+            linhas = cursor.fetchone()[0]
+            cursor.close()
+            for _ in range(args.repeticoes):
+                inicio = time.perf_counter()
+                with silencio():
+                    banco.run_analytical_queries(conn)
+                tempos.append(time.perf_counter() - inicio)
+        finally:
+            conn.close()
+        return {'duracao_s': statistics.median(tempos), 'itens': 1, 'linhas': linhas, 'bytes': 0}
+
+    # Partições Parquet dos mesmos trimestres, gravadas antes da medição
+    banco.OPERADORAS_CSV = arquivos['cadop']
+    diretorio = os.path.join(DIRETORIO, f'parquet_{args.linhas}x{args.operadoras}x{args.trimestres}')
+    shutil.rmtree(diretorio, ignore_errors=True)
+    with silencio():
+        analise_colunar.gravar_operadoras(banco.clean_operadoras(banco.read_operadoras_csv()), diretorio)
+    operadoras = analise_colunar.ler_registros_operadoras(diretorio)
+    for periodo, caminho in arquivos['trimestres']:
+        renomear, _ = banco.map_demonstracoes_columns(caminho)
+        blocos = banco.iter_demonstracoes(caminho, renomear, periodo, operadoras)
+        analise_colunar.gravar_trimestre(blocos, int(periodo[2:]), int(periodo[0]), diretorio)
+    motor = 'duckdb' if analise_colunar.duckdb is not None else 'pandas'
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter()
+        relatorios = analise_colunar.relatorios(banco.CATEGORIAS_DESPESA, motor, diretorio)
+        tempos.append(time.perf_counter() - inicio)
+    bytes_ = sum(os.path.getsize(os.path.join(pasta, nome))
+                 for pasta, _, nomes in os.walk(diretorio) for nome in nomes)
+    return {'duracao_s': statistics.median(tempos), 'itens': 1, 'motor': motor,
+            'linhas': relatorios['total_registros'], 'bytes': bytes_}
+
+
+def etapa_busca(args, arquivos):
+    os.environ.update(OPERADORAS_CSV=arquivos['api'], RECARGA_INTERVALO='0')
+    sys.path.insert(0, BACKEND)
+    inicio = time.perf_counter()
+    with silencio():
+        import server
+    carga = time.perf_counter() - inicio
+    rnd = random.Random(42)
+    termos = [rnd.choice(TERMOS) if rnd.random() < 0.5 else f'operadora {rnd.randrange(args.linhas)}'
+              for _ in range(args.consultas)]
+    inicio = time.perf_counter()
+    for termo in termos:
+        server.buscar_operadoras(termo)
+    return {'duracao_s': time.perf_counter() - inicio, 'itens': len(termos),
+            'linhas': len(server.snapshot.operadoras), 'bytes': os.path.getsize(arquivos['api']),
+            'carga_s': round(carga, 3)}
+
+
+def medir(etapa, args):
+    """Executado em subprocesso: mede uma etapa e imprime o resultado em JSON"""
+    sys.path[:0] = [RAIZ, TESTE3]
+    import pandas  # noqa: F401  (fora da medição)
+    # Os caminhos de trabalho do Teste 3 (dados_ans/...) são relativos
+    os.makedirs(os.path.join(DIRETORIO, 'dados_ans'), exist_ok=True)
+    os.chdir(DIRETORIO)
+    arquivos = dados(args)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultado = globals()[f'etapa_{etapa}'](args, arquivos)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultado.update(pico_mb=round(pico / 1024, 1), pico_etapa_mb=round((pico - base) / 1024, 1))
+    print(json.dumps(resultado))
+
+
+def vazao(resultado):
+    duracao = resultado['duracao_s']
+    return {
+        'itens_por_s': round(resultado['itens'] / duracao, 2) if duracao else None,
+        'linhas_por_s': round(resultado['linhas'] / duracao, 1) if duracao else None,
+        'mb_por_s': round(resultado['bytes'] / 2**20 / duracao, 2) if duracao else None,
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior):
+    print(f"\nComparação com {anterior['data']} (commit {anterior.get('commit')}):")
+    print(f"{'etapa':<15}{'tempo antes':>13}{'agora':>10}{'variação':>10}{'pico antes':>12}{'agora':>10}")
+    for etapa, resultado in atual['etapas'].items():
+        antes = anterior['etapas'].get(etapa)
+        if not antes or 'erro' in resultado or 'erro' in antes:
+            continue
+        variacao = (resultado['duracao_s'] / antes['duracao_s'] - 1) * 100 if antes['duracao_s'] else 0.0
+        print(f"{etapa:<15}{antes['duracao_s']:>13.3f}{resultado['duracao_s']:>10.3f}{variacao:>+9.1f}%"
+              f"{antes['pico_mb']:>12.1f}{resultado['pico_mb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+    parser.add_argument('--linhas', type=int, default=100000,
+                        help='linhas de cada CSV trimestral e do operadoras.csv da API (1000 a 10000000)')
+    parser.add_argument('--operadoras', type=int, default=1200, help='operadoras no Relatorio_cadop')
+    parser.add_argument('--trimestres', type=int, default=4)
+    parser.add_argument('--paginas', type=int, default=50, help='páginas do PDF do Anexo I')
+    parser.add_argument('--workers', type=int, default=1, help='processos na extração do PDF')
+    parser.add_argument('--consultas', type=int, default=2000, help='buscas na etapa busca')
+    parser.add_argument('--repeticoes', type=int, default=3, help='execuções dos relatórios (vale a mediana)')
+    parser.add_argument('--mysql', action='store_true', help='mede a carga e os relatórios no MySQL do Teste 3')
+    parser.add_argument('--prefixo', default='ans_bench')
+    parser.add_argument('--saida', default=RESULTADOS, help='diretório dos resultados JSON')
+    parser.add_argument('--comparar', nargs='?', const='ultimo', metavar='JSON',
+                        help='compara com um resultado anterior (padrão: o mais recente em --saida)')
+    parser.add_argument('--medir', choices=ETAPAS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir, args)
+        return
+
+    anteriores = sorted(glob.glob(os.path.join(args.saida, '*.json')))
+    dados(args)
+
+    resultados = {}
+    print(f"\n{'etapa':<15}{'itens':>8}{'linhas':>11}{'MB':>9}{'tempo (s)':>11}"
+          f"{'linhas/s':>12}{'MB/s':>8}{'pico (MB)':>11}")
+    for etapa in args.etapas:
+        argv = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--medir', etapa]
+        processo = subprocess.run(argv, capture_output=True, text=True)
+        if processo.returncode:
+            erro = processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else 'falhou'
+            resultados[etapa] = {'erro': erro}
+            print(f'{etapa:<15}ERRO: {erro}')
+            continue
+        resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+        resultado.update(vazao(resultado))
+        resultados[etapa] = resultado
+        print(f"{etapa:<15}{resultado['itens']:>8}{resultado['linhas']:>11}{resultado['bytes'] / 2**20:>9.1f}"
+              f"{resultado['duracao_s']:>11.3f}{resultado['linhas_por_s'] or 0:>12,.0f}"
+              f"{resultado['mb_por_s'] or 0:>8.1f}{resultado['pico_mb']:>11.1f}")
+
+    agora = datetime.now()
+    execucao = {
+        'data': agora.isoformat(timespec='seconds'),
+        'commit': commit_atual(),
+        'maquina': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'parametros': {chave: valor for chave, valor in vars(args).items()
+                       if chave not in ('saida', 'comparar', 'medir')},
+        'etapas': resultados,
+    }
+    os.makedirs(args.saida, exist_ok=True)
+    caminho = os.path.join(args.saida, f"{agora.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(execucao, arquivo, indent=2, ensure_ascii=False)
+    print(f'\nResultado gravado em {caminho}')
+
+    if args.comparar:
+        referencia = anteriores[-1] if args.comparar == 'ultimo' and anteriores else args.comparar
+        if referencia == 'ultimo':
+            print('Nenhum resultado anterior para comparar')
+            return
+        with open(referencia, encoding='utf-8') as arquivo:
+            comparar(execucao, json.load(arquivo))
+
+
+if __name__ == '__main__':
+    main()
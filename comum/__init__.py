@@ -0,0 +1 @@
+"""Código compartilhado entre os scripts dos testes (downloads, parsing, métricas)."""
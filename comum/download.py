@@ -0,0 +1,267 @@
+"""Motor de download assíncrono compartilhado pelos scripts da ANS.
+
+- concorrência limitada e conexões reaproveitadas (aiohttp.TCPConnector);
+- retomada de arquivos parciais com HTTP Range + If-Range;
+- novas tentativas com backoff exponencial e jitter;
+- GET condicional (ETag / Last-Modified) para pular arquivos inalterados.
+
+O arquivo é escrito em `<destino>.part` e só é renomeado para o destino
+quando termina. Os validadores do servidor ficam em `<destino>.meta.json`.
+
+O destino também pode ser um receptor em vez de um caminho (veja
+`comum.empacotamento.EntradaZip`): o corpo é entregue a ele em pedaços, e
+o receptor guarda o próprio estado para retomar e para o GET condicional.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import zlib
+from dataclasses import dataclass
+
+import aiohttp
+
+from comum import metricas
+
+TAMANHO_CHUNK = 1 << 16
+STATUS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+DOWNLOADS = metricas.registro.contador('downloads_total', 'Arquivos por resultado do download', ['status'])
+DOWNLOAD_BYTES = metricas.registro.contador('download_bytes_total', 'Bytes recebidos nos downloads')
+DOWNLOAD_DURACAO = metricas.registro.histograma(
+    'download_duracao_segundos', 'Duração de cada download, contando as novas tentativas')
+DOWNLOAD_NOVAS_TENTATIVAS = metricas.registro.contador(
+    'download_novas_tentativas_total', 'Novas tentativas após falhas transitórias')
+
+
+@dataclass
+class ResultadoDownload:
+    url: str
+    destino: str
+    status: str  # 'baixado', 'retomado', 'inalterado' ou 'erro'
+    bytes_recebidos: int = 0
+    erro: str = None
+
+    @property
+    def ok(self):
+        return self.status != 'erro'
+
+
+class ErroTransitorio(Exception):
+    """Falha que vale uma nova tentativa (rede, timeout, 5xx, 429)"""
+
+
+def _ler_meta(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _validadores(resposta):
+    validadores = {
+        'etag': resposta.headers.get('ETag'),
+        'last_modified': resposta.headers.get('Last-Modified'),
+    }
+    if _codificacao(resposta) != 'identity':
+        # O Range vale para os bytes codificados, não para os gravados
+        validadores['codificado'] = True
+    return validadores
+
+
+def cabecalhos_retomada(validadores, tamanho_parcial):
+    """Range + If-Range para continuar um parcial, ou {} se ele não pode ser retomado"""
+    validador = validadores.get('etag') or validadores.get('last_modified')
+    if not validador or validadores.get('codificado'):
+        # Sem validador não há como garantir que o parcial ainda vale
+        return {}
+    return {'Range': f'bytes={tamanho_parcial}-', 'If-Range': validador}
+
+
+def _codificacao(resposta):
+    return resposta.headers.get('Content-Encoding', 'identity').strip().lower() or 'identity'
+
+
+def _descompressor(resposta):
+    """Descompressor do corpo, ou None se ele vem sem Content-Encoding.
+
+    A sessão pede `identity` e não descomprime sozinha, para o Range e a
+    conferência do Content-Length contarem os bytes que vêm pela rede; um
+    servidor que comprime mesmo assim é tratado aqui.
+    """
+    codificacao = _codificacao(resposta)
+    if codificacao == 'identity':
+        return None
+    if codificacao in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if codificacao == 'deflate':
+        return zlib.decompressobj()
+    raise ValueError(f'Content-Encoding não suportado: {codificacao}')
+
+
+def _gravar_meta(caminho, resposta):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(_validadores(resposta), arquivo)
+
+
+class MotorDownload:
+    def __init__(self, concorrencia=4, tentativas=5, backoff_base=0.5, backoff_max=30.0,
+                 timeout=300, condicional=True, tamanho_chunk=TAMANHO_CHUNK):
+        self.concorrencia = concorrencia
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=timeout)
+        self.condicional = condicional
+        self.tamanho_chunk = tamanho_chunk
+
+    def _espera(self, tentativa):
+        atraso = min(self.backoff_max, self.backoff_base * 2 ** tentativa)
+        return atraso * random.uniform(0.5, 1.0)
+
+    def _cabecalhos(self, destino, parcial, tamanho_parcial):
+        if tamanho_parcial:
+            return cabecalhos_retomada(_ler_meta(parcial + '.meta.json'), tamanho_parcial)
+
+        if self.condicional and os.path.exists(destino):
+            meta = _ler_meta(destino + '.meta.json')
+            cabecalhos = {}
+            if meta.get('etag'):
+                cabecalhos['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                cabecalhos['If-Modified-Since'] = meta['last_modified']
+            return cabecalhos
+        return {}
+
+    def _retomando(self, resposta, tamanho_parcial, descartar):
+        """Valida o status da resposta; True se ela continua do byte `tamanho_parcial`.
+
+        `descartar` apaga o parcial quando ele não vale mais para o arquivo atual.
+        """
+        if resposta.status in STATUS_TRANSITORIOS:
+            raise ErroTransitorio(f'HTTP {resposta.status}')
+        if resposta.status == 416:
+            # Parcial inválido para o arquivo atual: recomeça do zero
+            descartar()
+            raise ErroTransitorio('HTTP 416')
+        resposta.raise_for_status()
+
+        if resposta.status != 206:
+            return False
+        inicio = resposta.headers.get('Content-Range', '').split(' ')[-1].split('-')[0]
+        if inicio != str(tamanho_parcial):
+            descartar()
+            raise ErroTransitorio('Content-Range inesperado')
+        return True
+
+    async def _tentar(self, sessao, url, destino):
+        parcial = destino + '.part'
+        tamanho_parcial = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        cabecalhos = self._cabecalhos(destino, parcial, tamanho_parcial)
+
+        async with sessao.get(url, headers=cabecalhos) as resposta:
+            if resposta.status == 304:
+                return 'inalterado', 0
+            retomando = self._retomando(resposta, tamanho_parcial, lambda: os.remove(parcial))
+            descompressor = _descompressor(resposta)
+            _gravar_meta(parcial + '.meta.json', resposta)
+
+            recebidos = 0
+            with open(parcial, 'ab' if retomando else 'wb') as arquivo:
+                async for pedaco in resposta.content.iter_chunked(self.tamanho_chunk):
+                    recebidos += len(pedaco)
+                    arquivo.write(descompressor.decompress(pedaco) if descompressor else pedaco)
+                if descompressor:
+                    arquivo.write(descompressor.flush())
+
+            esperado = resposta.content_length
+            if esperado is not None and recebidos != esperado:
+                raise ErroTransitorio(f'Corpo incompleto: {recebidos}/{esperado} bytes')
+
+        os.replace(parcial, destino)
+        os.replace(parcial + '.meta.json', destino + '.meta.json')
+        return ('retomado' if retomando else 'baixado'), recebidos
+
+    async def _tentar_receptor(self, sessao, url, receptor):
+        """Como `_tentar`, mas entrega o corpo a `receptor` em vez de gravar um arquivo"""
+        tamanho_parcial = receptor.tamanho
+        cabecalhos = receptor.cabecalhos(self.condicional)
+
+        async with sessao.get(url, headers=cabecalhos) as resposta:
+            if resposta.status == 304:
+                return 'inalterado', 0
+            retomando = self._retomando(resposta, tamanho_parcial, receptor.recomecar)
+            descompressor = _descompressor(resposta)
+            if not retomando:
+                # Com Content-Encoding o tamanho final não é o Content-Length
+                await receptor.iniciar(None if descompressor else resposta.content_length)
+            receptor.validadores = _validadores(resposta)
+
+            recebidos = 0
+            async for pedaco in resposta.content.iter_chunked(self.tamanho_chunk):
+                recebidos += len(pedaco)
+                await receptor.escrever(descompressor.decompress(pedaco) if descompressor else pedaco)
+            if descompressor:
+                await receptor.escrever(descompressor.flush())
+
+            esperado = resposta.content_length
+            if esperado is not None and recebidos != esperado:
+                raise ErroTransitorio(f'Corpo incompleto: {recebidos}/{esperado} bytes')
+
+        await receptor.concluir()
+        return ('retomado' if retomando else 'baixado'), recebidos
+
+    async def baixar(self, sessao, url, destino):
+        """Baixa um arquivo com novas tentativas; nunca levanta exceção"""
+        receptor = not isinstance(destino, str)
+        tentar = self._tentar_receptor if receptor else self._tentar
+        ultimo_erro = None
+        for tentativa in range(self.tentativas):
+            try:
+                status, recebidos = await tentar(sessao, url, destino)
+                return ResultadoDownload(url, str(destino), status, recebidos)
+            except (ErroTransitorio, aiohttp.ClientPayloadError, aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as e:
+                ultimo_erro = e
+                DOWNLOAD_NOVAS_TENTATIVAS.inc()
+                await asyncio.sleep(self._espera(tentativa))
+            except Exception as e:
+                ultimo_erro = e
+                break
+        else:
+            ultimo_erro = f'{ultimo_erro} (após {self.tentativas} tentativas)'
+        if receptor:
+            # Desistindo: o receptor libera o que segura (ex.: a entrada aberta no ZIP)
+            destino.recomecar()
+        return ResultadoDownload(url, str(destino), 'erro', erro=str(ultimo_erro))
+
+    async def baixar_todos(self, pares):
+        """Baixa uma lista de (url, destino) com concorrência limitada"""
+        conector = aiohttp.TCPConnector(limit=self.concorrencia, limit_per_host=self.concorrencia)
+        semaforo = asyncio.Semaphore(self.concorrencia)
+
+        # Sem descompressão automática: Range e Content-Length contam os bytes da rede
+        async with aiohttp.ClientSession(connector=conector, timeout=self.timeout, auto_decompress=False,
+                                         headers={'Accept-Encoding': 'identity'}) as sessao:
+            async def limitado(url, destino):
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    resultado = await self.baixar(sessao, url, destino)
+                    DOWNLOAD_DURACAO.observar(time.perf_counter() - inicio)
+                    DOWNLOADS.inc(status=resultado.status)
+                    DOWNLOAD_BYTES.inc(resultado.bytes_recebidos)
+                    return resultado
+
+            return await asyncio.gather(*(limitado(url, destino) for url, destino in pares))
+
+
+def baixar_arquivos(pares, **opcoes):
+    """Versão síncrona de MotorDownload.baixar_todos para os scripts"""
+    return asyncio.run(MotorDownload(**opcoes).baixar_todos(list(pares)))
+
+
+def baixar_arquivo(url, destino, **opcoes):
+    """Baixa um único arquivo; retorna o ResultadoDownload"""
+    return baixar_arquivos([(url, destino)], **opcoes)[0]
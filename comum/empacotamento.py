@@ -0,0 +1,258 @@
+"""Downloads gravados direto como entradas de um ZIP, sem os arquivos soltos.
+
+O ZIP é montado com `zipfile` em `<destino>.part`, e só uma entrada pode
+estar aberta para escrita de cada vez. O primeiro download a começar
+grava o corpo direto na sua entrada, à medida que ele chega. Os que
+começam enquanto o ZIP está ocupado guardam o corpo num
+`SpooledTemporaryFile` (memória até `LIMITE_MEMORIA`, disco depois) e o
+copiam para o ZIP quando ele fica livre. Nenhum anexo é gravado solto em
+`downloads/`.
+
+Os validadores do servidor (ETag/Last-Modified) ficam no comentário de
+cada entrada. Na execução seguinte eles viram um GET condicional, e uma
+entrada inalterada é copiada do ZIP anterior sem novo download.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+
+from comum.download import MotorDownload, cabecalhos_retomada
+
+TAMANHO_LOTE = 1 << 20  # bytes acumulados antes de cada gravação
+LIMITE_MEMORIA = 8 << 20  # corpo guardado em memória antes de ir para o disco
+LIMITE_SEM_ZIP64 = 1 << 31  # entradas maiores (ou de tamanho desconhecido) usam zip64
+
+
+async def _em_thread(funcao, *args):
+    """Roda uma gravação bloqueante fora do laço de eventos (o zlib libera o GIL)"""
+    return await asyncio.get_running_loop().run_in_executor(None, funcao, *args)
+
+
+class ZipEmConstrucao:
+    """O ZIP de destino enquanto é montado, em `<destino>.part`.
+
+    `trava` garante uma única entrada aberta por vez. Entradas descartadas
+    no meio (download recomeçado do zero depois de já gravar no ZIP) são
+    removidas em `fechar`, copiando as demais para um ZIP novo.
+    """
+
+    def __init__(self, destino, nivel):
+        self.destino = destino
+        self.parcial = destino + '.part'
+        compressao = zipfile.ZIP_DEFLATED if nivel else zipfile.ZIP_STORED
+        self.zipf = zipfile.ZipFile(self.parcial, 'w', compressao, compresslevel=nivel or None)
+        self.trava = asyncio.Lock()
+        self.descartadas = []
+
+    def abrir(self, nome, total=None):
+        """Abre a entrada `nome` para escrita; só com a `trava` em mãos"""
+        return self.zipf.open(nome, 'w', force_zip64=total is None or total >= LIMITE_SEM_ZIP64)
+
+    def fechar_entrada(self, escritor, comentario):
+        """Fecha a entrada aberta e guarda `comentario` nela; retorna o ZipInfo"""
+        escritor.close()
+        info = self.zipf.filelist[-1]
+        info.comment = comentario
+        return info
+
+    def descartar(self, escritor):
+        """Fecha a entrada aberta e a marca para remoção; o nome fica livre para a nova tentativa"""
+        info = self.fechar_entrada(escritor, b'')
+        self.zipf.NameToInfo.pop(info.filename, None)
+        self.descartadas.append(info)
+
+    def fechar(self):
+        """Termina o ZIP e o renomeia para o destino"""
+        self.zipf.close()
+        if self.descartadas:
+            self._remover_descartadas()
+        os.replace(self.parcial, self.destino)
+
+    def _remover_descartadas(self):
+        temporario = self.parcial + '.2'
+        with zipfile.ZipFile(self.parcial) as origem, \
+                zipfile.ZipFile(temporario, 'w', self.zipf.compression,
+                                compresslevel=self.zipf.compresslevel) as saida:
+            descartadas = {info.header_offset for info in self.descartadas}
+            for info in origem.infolist():
+                if info.header_offset in descartadas:
+                    continue
+                with origem.open(info) as dados, saida.open(info.filename, 'w',
+                                                            force_zip64=info.file_size >= LIMITE_SEM_ZIP64) as destino:
+                    shutil.copyfileobj(dados, destino, TAMANHO_LOTE)
+                saida.filelist[-1].comment = info.comment
+        os.replace(temporario, self.parcial)
+
+    def cancelar(self):
+        """Descarta o ZIP em construção (nada acontece se ele já foi fechado)"""
+        if self.zipf.fp is not None:
+            self.zipf.close()
+        for caminho in (self.parcial, self.parcial + '.2'):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+
+class EntradaZip:
+    """Receptor do `MotorDownload` que grava o corpo como uma entrada do ZIP.
+
+    O estado da entrada (onde o corpo está sendo gravado, bytes recebidos)
+    sobrevive às novas tentativas, então um download interrompido continua
+    com Range a partir de `tamanho`.
+    """
+
+    def __init__(self, nome, construcao, anterior=None):
+        self.nome = nome
+        self.construcao = construcao
+        self.anterior = anterior  # ZipInfo da mesma entrada no ZIP anterior
+        self.validadores = {}
+        self.info = None
+        self.escritor = None  # entrada aberta no ZIP, com a trava
+        self.espera = None  # corpo guardado enquanto o ZIP está ocupado
+        self.tamanho = 0
+        self.pendente = bytearray()
+
+    def __str__(self):
+        return self.nome
+
+    def recomecar(self):
+        """Descarta o que já foi recebido"""
+        if self.escritor is not None:
+            self.construcao.descartar(self.escritor)
+            self.escritor = None
+            self.construcao.trava.release()
+        if self.espera is not None:
+            self.espera.close()
+            self.espera = None
+        self.tamanho = 0
+        self.pendente = bytearray()
+
+    async def iniciar(self, total):
+        """Prepara o destino de um corpo novo com `total` bytes (None se desconhecido)"""
+        self.recomecar()
+        if not self.construcao.trava.locked():
+            await self.construcao.trava.acquire()
+            self.escritor = self.construcao.abrir(self.nome, total)
+        else:
+            self.espera = tempfile.SpooledTemporaryFile(
+                LIMITE_MEMORIA, dir=os.path.dirname(os.path.abspath(self.construcao.parcial)))
+
+    def cabecalhos(self, condicional):
+        if self.tamanho:
+            return cabecalhos_retomada(self.validadores, self.tamanho)
+
+        if condicional and self.anterior is not None:
+            meta = _ler_comentario(self.anterior)
+            cabecalhos = {}
+            if meta.get('etag'):
+                cabecalhos['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                cabecalhos['If-Modified-Since'] = meta['last_modified']
+            return cabecalhos
+        return {}
+
+    def _destino(self):
+        return self.escritor if self.escritor is not None else self.espera
+
+    async def escrever(self, pedaco):
+        self.pendente += pedaco
+        self.tamanho += len(pedaco)
+        if len(self.pendente) >= TAMANHO_LOTE:
+            dados, self.pendente = bytes(self.pendente), bytearray()
+            await _em_thread(self._destino().write, dados)
+
+    async def concluir(self):
+        dados, self.pendente = bytes(self.pendente), bytearray()
+        await _em_thread(self._destino().write, dados)
+        comentario = json.dumps(self.validadores).encode('utf-8')
+        if self.escritor is None:
+            # O ZIP estava ocupado quando o corpo chegou: copia agora
+            await self.construcao.trava.acquire()
+            try:
+                self.escritor = self.construcao.abrir(self.nome, self.tamanho)
+            except BaseException:
+                self.construcao.trava.release()
+                raise
+            self.espera.seek(0)
+            await _em_thread(shutil.copyfileobj, self.espera, self.escritor, TAMANHO_LOTE)
+            self.espera.close()
+            self.espera = None
+        try:
+            self.info = await _em_thread(self.construcao.fechar_entrada, self.escritor, comentario)
+        finally:
+            self.escritor = None
+            self.construcao.trava.release()
+
+    async def copiar_anterior(self, zip_anterior):
+        """Copia a entrada inalterada do ZIP anterior, com os mesmos validadores"""
+        async with self.construcao.trava:
+            def copiar():
+                with zip_anterior.open(self.anterior) as dados, \
+                        self.construcao.abrir(self.nome, self.anterior.file_size) as escritor:
+                    shutil.copyfileobj(dados, escritor, TAMANHO_LOTE)
+                self.construcao.zipf.filelist[-1].comment = self.anterior.comment
+            await _em_thread(copiar)
+
+
+def _ler_comentario(info):
+    try:
+        return json.loads(info.comment or b'{}')
+    except ValueError:
+        return {}
+
+
+def _zip_anterior(destino):
+    try:
+        with zipfile.ZipFile(destino) as zipf:
+            return {info.filename: info for info in zipf.infolist()}
+    except (FileNotFoundError, zipfile.BadZipFile):
+        return {}
+
+
+async def _baixar_para_zip(pares, destino, nivel, opcoes):
+    anteriores = _zip_anterior(destino)
+    construcao = ZipEmConstrucao(destino, nivel)
+    entradas = [EntradaZip(nome, construcao, anteriores.get(nome)) for _, nome in pares]
+    try:
+        resultados = await MotorDownload(**opcoes).baixar_todos(
+            [(url, entrada) for (url, _), entrada in zip(pares, entradas)])
+
+        validas = []
+        for entrada, resultado in zip(entradas, resultados):
+            if resultado.ok:
+                validas.append((entrada, resultado))
+            else:
+                entrada.recomecar()
+        nomes = sorted(entrada.nome for entrada, _ in validas)
+        if nomes == sorted(anteriores) and all(resultado.status == 'inalterado' for _, resultado in validas):
+            return resultados
+
+        inalteradas = [entrada for entrada, resultado in validas if resultado.status == 'inalterado']
+        if inalteradas:
+            # Fechado antes do os.replace, que não substitui arquivo aberto no Windows
+            with zipfile.ZipFile(destino) as zip_anterior:
+                for entrada in inalteradas:
+                    await entrada.copiar_anterior(zip_anterior)
+        construcao.fechar()
+        return resultados
+    finally:
+        for entrada in entradas:
+            if entrada.escritor is not None:
+                entrada.escritor.close()
+            if entrada.espera is not None:
+                entrada.espera.close()
+        construcao.cancelar()
+
+
+def baixar_para_zip(pares, destino, nivel=zlib.Z_DEFAULT_COMPRESSION, **opcoes):
+    """Baixa uma lista de (url, nome da entrada) direto para o ZIP `destino`.
+
+    Com `nivel=0` as entradas não são comprimidas (ZIP_STORED). As opções
+    vão para o `MotorDownload`. Retorna os ResultadoDownload na ordem de
+    `pares`; entradas com erro ficam fora do ZIP. Se nada mudou desde o
+    ZIP anterior, ele é mantido como está.
+    """
+    return asyncio.run(_baixar_para_zip(pares, destino, nivel, opcoes))
@@ -0,0 +1,408 @@
+"""Métricas compartilhadas pelos scripts e pela API: contadores, medidores e histogramas.
+
+Cada processo tem um registro (`metricas.registro`). O estado dele pode
+ser exposto de duas formas:
+
+- `formato_prometheus()`: texto no formato de exposição do Prometheus,
+  servido pela API em /metrics;
+- `salvar_relatorio()`: relatório JSON de uma execução dos scripts em lote,
+  com o resumo de cada etapa (duração, itens, linhas, bytes).
+
+`etapa()` mede uma etapa e soma o que ela processou. Com vários processos
+servindo a mesma API (workers do Gunicorn), cada um grava o próprio estado
+em METRICAS_DIR com `persistir()` e o /metrics soma os arquivos de todos.
+"""
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Limites (em segundos) dos histogramas de duração
+LIMITES_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+DIRETORIO_RELATORIOS = os.environ.get('METRICAS_RELATORIOS', 'relatorios')
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._series = {}
+        self._trava = threading.Lock()
+
+    def _chave(self, valores):
+        if set(valores) != set(self.rotulos):
+            raise ValueError(f"{self.nome} espera os rótulos {self.rotulos}, recebeu {tuple(valores)}")
+        return tuple(str(valores[rotulo]) for rotulo in self.rotulos)
+
+    def _estado_serie(self, serie):
+        return {'valor': serie}
+
+    def estado(self):
+        with self._trava:
+            series = [
+                dict(self._estado_serie(serie), rotulos=dict(zip(self.rotulos, chave)))
+                for chave, serie in self._series.items()
+            ]
+        return {'tipo': self.tipo, 'ajuda': self.ajuda, 'series': series}
+
+
+class Contador(_Metrica):
+    """Valor que só aumenta (linhas gravadas, bytes baixados, requisições)"""
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        if valor < 0:
+            raise ValueError("contadores só aumentam")
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+
+class Medidor(_Metrica):
+    """Valor que sobe e desce (tamanho de fila, registros carregados)"""
+    tipo = 'gauge'
+
+    def definir(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._series[chave] = valor
+
+
+class Histograma(_Metrica):
+    """Distribuição de valores em faixas acumuladas, mais soma e contagem"""
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._trava:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][bisect.bisect_left(self.limites, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def _estado_serie(self, serie):
+        faixas, soma, contagem = serie
+        return {'faixas': list(faixas), 'soma': soma, 'contagem': contagem}
+
+    def estado(self):
+        return dict(super().estado(), limites=list(self.limites))
+
+
+class Registro:
+    """Conjunto de métricas de um processo; pedir a mesma métrica duas vezes devolve a mesma"""
+
+    def __init__(self):
+        self._metricas = {}
+        self._coletores = []
+        self._trava = threading.Lock()
+
+    def _obter(self, classe, nome, ajuda, rotulos, **opcoes):
+        with self._trava:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, ajuda, rotulos, **opcoes)
+            elif not isinstance(metrica, classe) or metrica.rotulos != tuple(rotulos):
+                raise ValueError(f"Métrica {nome} já registrada com outro tipo ou outros rótulos")
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._obter(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome, ajuda, rotulos=()):
+        return self._obter(Medidor, nome, ajuda, rotulos)
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        return self._obter(Histograma, nome, ajuda, rotulos, limites=limites)
+
+    def coletor(self, funcao):
+        """Registra `funcao() -> {nome: estado}`, chamada a cada coleta.
+
+        Serve para valores que já existem em outro lugar (ex.: os contadores
+        do cache de buscas) e só precisam ser lidos na hora.
+        """
+        self._coletores.append(funcao)
+        return funcao
+
+    def estado_coletores(self):
+        estado = {}
+        for coletor in self._coletores:
+            estado.update(coletor())
+        return estado
+
+    def estado(self, com_coletores=True):
+        """Estado serializável em JSON: {nome: {tipo, ajuda, series[, limites]}}"""
+        with self._trava:
+            metricas = list(self._metricas.values())
+        estado = {metrica.nome: metrica.estado() for metrica in metricas}
+        if com_coletores:
+            estado.update(self.estado_coletores())
+        return estado
+
+
+registro = Registro()
+
+ETAPA_DURACAO = registro.histograma('etapa_duracao_segundos', 'Duração de cada execução de uma etapa', ['etapa'])
+ETAPA_ITENS = registro.contador('etapa_itens_total', 'Itens (arquivos, páginas, lotes) processados', ['etapa'])
+ETAPA_LINHAS = registro.contador('etapa_linhas_total', 'Linhas processadas', ['etapa'])
+ETAPA_BYTES = registro.contador('etapa_bytes_total', 'Bytes processados', ['etapa'])
+
+
+class Etapa:
+    """O que uma etapa processou; os campos são somados aos contadores no fim"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.itens = 0
+        self.linhas = 0
+        self.bytes = 0
+
+
+def registrar_etapa(nome, duracao, itens=0, linhas=0, bytes_=0):
+    """Registra uma execução já medida de uma etapa"""
+    ETAPA_DURACAO.observar(duracao, etapa=nome)
+    for contador, valor in ((ETAPA_ITENS, itens), (ETAPA_LINHAS, linhas), (ETAPA_BYTES, bytes_)):
+        if valor:
+            contador.inc(valor, etapa=nome)
+
+
+@contextmanager
+def etapa(nome):
+    """Mede a duração do bloco e soma itens/linhas/bytes informados nele:
+
+        with metricas.etapa('download') as medida:
+            ...
+            medida.bytes += recebidos
+    """
+    medida = Etapa(nome)
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        registrar_etapa(nome, time.perf_counter() - inicio, medida.itens, medida.linhas, medida.bytes)
+
+
+def _somar_series(destino, origem, tipo):
+    if tipo == 'counter':
+        destino['valor'] += origem['valor']
+    elif tipo == 'gauge':
+        destino['valor'] = origem['valor']
+    else:
+        destino['faixas'] = [a + b for a, b in zip(destino['faixas'], origem['faixas'])]
+        destino['soma'] += origem['soma']
+        destino['contagem'] += origem['contagem']
+
+
+def somar_estados(estados):
+    """Junta estados de vários processos: contadores e histogramas somam.
+
+    Medidores ficam com o valor do último estado da lista, então os estados
+    devem vir do mais antigo para o mais recente.
+    """
+    total = {}
+    for estado in estados:
+        for nome, metrica in estado.items():
+            atual = total.setdefault(nome, dict(metrica, series=[]))
+            por_rotulos = {tuple(sorted(serie['rotulos'].items())): serie for serie in atual['series']}
+            for serie in metrica['series']:
+                chave = tuple(sorted(serie['rotulos'].items()))
+                if chave in por_rotulos:
+                    _somar_series(por_rotulos[chave], serie, metrica['tipo'])
+                else:
+                    copia = json.loads(json.dumps(serie))
+                    atual['series'].append(copia)
+                    por_rotulos[chave] = copia
+    return total
+
+
+_ultima_persistencia = 0.0
+_persistencia_agendada = None
+_trava_persistencia = threading.Lock()
+
+
+def persistir(diretorio, intervalo=0.0):
+    """Grava o estado deste processo em <diretorio>/<pid>.json.
+
+    Inclui os coletores, então contadores de cada processo (ex.: o cache de
+    buscas de cada worker) também são somados. Com `intervalo`, grava no
+    máximo uma vez a cada `intervalo` segundos, para poder ser chamada a
+    cada requisição. Uma chamada que cai dentro do intervalo agenda a
+    gravação para o fim dele, então as últimas requisições antes de um
+    worker ficar ocioso também chegam ao arquivo.
+    """
+    global _ultima_persistencia, _persistencia_agendada
+    with _trava_persistencia:
+        agora = time.monotonic()
+        if intervalo and agora - _ultima_persistencia < intervalo:
+            if _persistencia_agendada is None:
+                _persistencia_agendada = threading.Timer(
+                    intervalo - (agora - _ultima_persistencia), _persistir_agendada, args=(diretorio,))
+                _persistencia_agendada.daemon = True
+                _persistencia_agendada.start()
+            return
+        _ultima_persistencia = agora
+    caminho = os.path.join(diretorio, f'{os.getpid()}.json')
+    temporario = f'{caminho}.{threading.get_ident()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(registro.estado(), arquivo)
+    os.replace(temporario, caminho)
+
+
+def _persistir_agendada(diretorio):
+    global _persistencia_agendada
+    with _trava_persistencia:
+        _persistencia_agendada = None
+    persistir(diretorio)
+
+
+def _processo_vivo(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def coletar(diretorio=None):
+    """Estado atual: o deste processo ou, com `diretorio`, a soma dos processos vivos.
+
+    Arquivos de processos que já terminaram (o master do Gunicorn os apaga
+    em `child_exit`, mas um worker morto à força pode ficar para trás) são
+    descartados. Os medidores ficam com o valor do arquivo gravado por último.
+    """
+    if not diretorio:
+        return registro.estado()
+    persistir(diretorio)
+    arquivos = []
+    for caminho in glob.glob(os.path.join(diretorio, '*.json')):
+        pid = os.path.basename(caminho)[:-len('.json')]
+        try:
+            if pid.isdigit() and not _processo_vivo(int(pid)):
+                os.remove(caminho)
+                continue
+            arquivos.append((os.path.getmtime(caminho), caminho))
+        except OSError:
+            continue
+    estados = []
+    for _, caminho in sorted(arquivos):
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                estados.append(json.load(arquivo))
+        except (OSError, ValueError):
+            continue
+    return somar_estados(estados)
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return '+Inf' if valor > 0 else '-Inf'
+        return repr(valor)
+    return str(valor)
+
+
+def _rotulos(rotulos, extra=None):
+    pares = list(rotulos.items()) + (list(extra.items()) if extra else [])
+    if not pares:
+        return ''
+    texto = ','.join(
+        f'{nome}="' + str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for nome, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+def formato_prometheus(estado=None):
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+    estado = registro.estado() if estado is None else estado
+    linhas = []
+    for nome in sorted(estado):
+        metrica = estado[nome]
+        linhas.append(f"# HELP {nome} {metrica['ajuda']}")
+        linhas.append(f"# TYPE {nome} {metrica['tipo']}")
+        for serie in metrica['series']:
+            rotulos = serie['rotulos']
+            if metrica['tipo'] != 'histogram':
+                linhas.append(f"{nome}{_rotulos(rotulos)} {_numero(serie['valor'])}")
+                continue
+            acumulado = 0
+            for limite, quantidade in zip(list(metrica['limites']) + [math.inf], serie['faixas']):
+                acumulado += quantidade
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos, {'le': _numero(float(limite))})} {acumulado}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos)} {_numero(float(serie['soma']))}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos)} {serie['contagem']}")
+    return '\n'.join(linhas) + '\n'
+
+
+def resumo_etapas(estado=None):
+    """{etapa: {execucoes, duracao_s, itens, linhas, bytes, linhas_por_s, mb_por_s}}"""
+    estado = registro.estado() if estado is None else estado
+    etapas = {}
+    for serie in estado.get('etapa_duracao_segundos', {}).get('series', []):
+        etapas[serie['rotulos']['etapa']] = {
+            'execucoes': serie['contagem'], 'duracao_s': round(serie['soma'], 3),
+            'itens': 0, 'linhas': 0, 'bytes': 0,
+        }
+    for nome, campo in (('etapa_itens_total', 'itens'), ('etapa_linhas_total', 'linhas'),
+                        ('etapa_bytes_total', 'bytes')):
+        for serie in estado.get(nome, {}).get('series', []):
+            resumo = etapas.setdefault(serie['rotulos']['etapa'], {
+                'execucoes': 0, 'duracao_s': 0.0, 'itens': 0, 'linhas': 0, 'bytes': 0,
+            })
+            resumo[campo] = serie['valor']
+    for resumo in etapas.values():
+        duracao = resumo['duracao_s']
+        resumo['linhas_por_s'] = round(resumo['linhas'] / duracao, 1) if duracao else None
+        resumo['mb_por_s'] = round(resumo['bytes'] / 2**20 / duracao, 2) if duracao else None
+    return etapas
+
+
+INICIO_PROCESSO = datetime.now()
+
+
+def salvar_relatorio(script, diretorio=DIRETORIO_RELATORIOS, extra=None):
+    """Grava <diretorio>/<script>-<data-hora>.json com as métricas da execução e retorna o caminho"""
+    fim = datetime.now()
+    estado = registro.estado()
+    relatorio = {
+        'script': script,
+        'inicio': INICIO_PROCESSO.isoformat(timespec='seconds'),
+        'fim': fim.isoformat(timespec='seconds'),
+        'duracao_s': round((fim - INICIO_PROCESSO).total_seconds(), 3),
+        'etapas': resumo_etapas(estado),
+        'metricas': estado,
+    }
+    if extra:
+        relatorio.update(extra)
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{script}-{fim.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False, default=str)
+    return caminho
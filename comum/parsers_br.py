@@ -0,0 +1,115 @@
+"""Parsing vetorizado de números e datas no formato brasileiro (CSVs da ANS).
+
+Cada coluna é convertida em uma passada pelos kernels de texto do Arrow
+(regex RE2, sem laço em Python). Valores malformados viram nulo, ou
+ValueError com erros='raise'; vazios são só nulos. Valores monetários saem
+em centavos inteiros, exatos como um Decimal de duas casas; mais casas
+decimais contam como valor malformado, sem arredondar. Colunas
+categóricas do pandas são convertidas uma vez por categoria.
+"""
+import functools
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Sinal opcional, parte inteira com ou sem '.' de milhar e até duas casas
+# depois da vírgula: "1.234.567,89", "-12,5", "300". Com no máximo 15
+# dígitos inteiros, os centavos cabem em int64
+PADRAO_DECIMAL = (
+    r'^(?P<sinal>[-+]?)(?P<inteiro>\d{1,15}|\d{1,3}(?:\.\d{3}){1,4})'
+    r'(?:,(?P<fracao>\d{1,2}))?$'
+)
+
+# Formatos de data aceitos e a forma exata do texto de cada um
+FORMATOS_DATA = {
+    '%d/%m/%Y': r'^\d{2}/\d{2}/\d{4}$',
+    '%Y-%m-%d': r'^\d{4}-\d{2}-\d{2}$',
+}
+
+EXEMPLOS_ERRO = 5
+
+
+def _texto(valores):
+    """Coluna como StringArray do Arrow, sem espaços nas pontas (NaN/None viram nulo)"""
+    if isinstance(valores, pd.Series):
+        valores = valores.astype(object)
+    return pc.utf8_trim_whitespace(pa.array(valores, type=pa.string(), from_pandas=True))
+
+
+def _checar(texto, convertidos, erros):
+    """Com erros='raise', falha se algum texto não vazio não foi convertido"""
+    if erros == 'coerce':
+        return
+    if erros != 'raise':
+        raise ValueError(f"erros deve ser 'coerce' ou 'raise', não {erros!r}")
+    preenchidos = pc.and_(pc.is_valid(texto), pc.not_equal(texto, ''))
+    malformados = pc.filter(texto, pc.and_(preenchidos, pc.is_null(convertidos)))
+    if len(malformados):
+        exemplos = ', '.join(repr(valor) for valor in malformados[:EXEMPLOS_ERRO].to_pylist())
+        raise ValueError(f"{len(malformados)} valores malformados (ex.: {exemplos})")
+
+
+def _por_categoria(converter):
+    """Numa Series categórica, converte só as categorias e espalha pelos códigos"""
+    @functools.wraps(converter)
+    def envoltorio(valores, *args, **kwargs):
+        if isinstance(valores, pd.Series) and isinstance(valores.dtype, pd.CategoricalDtype):
+            categorias = converter(pd.Series(valores.cat.categories), *args, **kwargs)
+            convertidos = categorias.array.take(valores.cat.codes.to_numpy(), allow_fill=True)
+            return pd.Series(convertidos, index=valores.index, name=valores.name)
+        convertidos = converter(valores, *args, **kwargs)
+        if isinstance(valores, pd.Series):
+            convertidos.index = valores.index
+            convertidos.name = valores.name
+        return convertidos
+    return envoltorio
+
+
+@_por_categoria
+def centavos(valores, erros='coerce'):
+    """'1.234,56' -> 123456 (Series Int64; nulo onde o valor falta ou é malformado).
+
+    Mais de duas casas decimais ('0,125') é malformado: o valor não é
+    arredondado em silêncio.
+    """
+    texto = _texto(valores)
+    partes = pc.extract_regex(texto, PADRAO_DECIMAL)
+    inteiro = pc.cast(pc.replace_substring(pc.struct_field(partes, 'inteiro'), '.', ''), pa.int64())
+    fracao = pc.cast(pc.utf8_rpad(pc.struct_field(partes, 'fracao'), 2, '0'), pa.int64())
+    total = pc.add(pc.multiply(inteiro, 100), fracao)
+    total = pc.if_else(pc.equal(pc.struct_field(partes, 'sinal'), '-'), pc.negate(total), total)
+    _checar(texto, total, erros)
+    nulos = total.is_null().to_numpy(zero_copy_only=False)
+    return pd.Series(pd.arrays.IntegerArray(total.fill_null(0).to_numpy(), nulos))
+
+
+def para_decimal(centavos_):
+    """Centavos (Series Int64) -> Series de Decimal com duas casas, None onde é nulo"""
+    return centavos_.map(lambda valor: Decimal(int(valor)).scaleb(-2), na_action='ignore').astype(object)
+
+
+def centavos_para_float(centavos_):
+    """Centavos -> float64 em reais (NaN onde é nulo); o repr do float volta ao texto exato"""
+    return centavos_.to_numpy(dtype=np.float64, na_value=np.nan) / 100
+
+
+@_por_categoria
+def datas(valores, formatos=tuple(FORMATOS_DATA), erros='coerce'):
+    """Texto em dd/mm/aaaa ou aaaa-mm-dd -> Series datetime64 (NaT se falta ou é inválida).
+
+    Datas impossíveis (31/02) são rejeitadas: o texto só vale se a data
+    lida, formatada de volta, dá o mesmo texto.
+    """
+    texto = _texto(valores)
+    nulo = pa.scalar(None, pa.string())
+    resultado = pa.nulls(len(texto), pa.timestamp('s'))
+    for formato in formatos:
+        forma_ok = pc.match_substring_regex(texto, FORMATOS_DATA[formato])
+        lidas = pc.strptime(pc.if_else(forma_ok, texto, nulo), format=formato, unit='s', error_is_null=True)
+        ida_e_volta = pc.equal(pc.strftime(lidas, format=formato), texto)
+        resultado = pc.coalesce(resultado, pc.if_else(ida_e_volta, lidas, pa.scalar(None, pa.timestamp('s'))))
+    _checar(texto, resultado, erros)
+    return pd.Series(resultado.to_numpy(zero_copy_only=False).astype('datetime64[ns]'))
@@ -0,0 +1,140 @@
+"""Servidor HTTP local que imita o servidor da ANS para testes e benchmarks.
+
+Serve os arquivos de um diretório com suporte a Range/If-Range, ETag,
+Last-Modified e respostas 304. Com `--cortar-apos N` a primeira resposta de
+cada arquivo é interrompida depois de N bytes, para exercitar a retomada.
+
+Uso:
+    python -m comum.servidor_local --diretorio dados_teste --porta 8000
+"""
+import argparse
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+TAMANHO_BLOCO = 1 << 16
+
+
+class ManipuladorLocal(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    cortar_apos = None
+    _cortados = set()
+    _trava = threading.Lock()
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _validadores(self, caminho):
+        info = os.stat(caminho)
+        etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+        return etag, formatdate(info.st_mtime, usegmt=True), info.st_size
+
+    def _nao_modificado(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [v.strip() for v in if_none_match.split(',')]
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(mtime)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _intervalo(self, etag, mtime, tamanho):
+        """Retorna o byte inicial pedido em Range, ou None para o arquivo inteiro"""
+        intervalo = self.headers.get('Range')
+        if not intervalo or not intervalo.startswith('bytes='):
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range not in (etag, mtime):
+            return None
+        inicio, _, fim = intervalo[len('bytes='):].partition('-')
+        if not inicio.isdigit() or fim:
+            return None
+        return int(inicio)
+
+    def do_GET(self):
+        caminho = self.translate_path(self.path)
+        if not os.path.isfile(caminho):
+            self.send_error(404)
+            return
+
+        etag, mtime, tamanho = self._validadores(caminho)
+        if self._nao_modificado(etag, mtime):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        inicio = self._intervalo(etag, mtime, tamanho)
+        if inicio is not None and inicio >= tamanho:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{tamanho}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(206 if inicio is not None else 200)
+        if inicio is not None:
+            self.send_header('Content-Range', f'bytes {inicio}-{tamanho - 1}/{tamanho}')
+        inicio = inicio or 0
+        self.send_header('Content-Length', str(tamanho - inicio))
+        self.send_header('Content-Type', self.guess_type(caminho))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', mtime)
+        self.end_headers()
+
+        limite = None
+        with self._trava:
+            if self.cortar_apos is not None and caminho not in self._cortados:
+                self._cortados.add(caminho)
+                limite = self.cortar_apos
+
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(inicio)
+            enviados = 0
+            while True:
+                bloco = arquivo.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                if limite is not None and enviados + len(bloco) > limite:
+                    self.wfile.write(bloco[:limite - enviados])
+                    self.close_connection = True
+                    return
+                self.wfile.write(bloco)
+                enviados += len(bloco)
+
+
+def iniciar(diretorio, porta=0, cortar_apos=None):
+    """Sobe o servidor em uma thread e retorna (servidor, url_base)"""
+    manipulador = type('Manipulador', (ManipuladorLocal,), {
+        'cortar_apos': cortar_apos,
+        '_cortados': set(),
+        '__init__': lambda self, *a, **k: ManipuladorLocal.__init__(self, *a, directory=diretorio, **k),
+    })
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), manipulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--diretorio', default='.')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--cortar-apos', type=int, help='interrompe a primeira resposta de cada arquivo após N bytes')
+    args = parser.parse_args()
+
+    servidor, url = iniciar(os.path.abspath(args.diretorio), args.porta, args.cortar_apos)
+    print(f'Servindo {args.diretorio} em {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,102 @@
+import argparse
 import os
 import requests
 from bs4 import BeautifulSoup
 from zipfile import ZipFile
+from comum import metricas
+from comum.download import baixar_arquivos
+from comum.empacotamento import baixar_para_zip
 
 
 
-url = 'https://www.gov.br/ans/pt-br/acesso-a-informacao/participacao-da-sociedade/atualizacao-do-rol-de-procedimentos'
+url = os.environ.get(
+    'ANS_ROL_URL',
+    'https://www.gov.br/ans/pt-br/acesso-a-informacao/participacao-da-sociedade/atualizacao-do-rol-de-procedimentos'
+)
 
 
 output = 'downloads'
-os.makedirs(output, exist_ok=True)
-
-
-# Fazer a requisição à página
-response = requests.get(url)
-response.raise_for_status()
-
-soup = BeautifulSoup(response.content, 'html.parser')
-
-pdf_links = []
-for link in soup.find_all('a', href=True):
-    href = link['href']
-    if 'Anexo I' in link.text or 'Anexo II' in link.text:
-        full_url = href if href.startswith('http') else f'https://www.gov.br{href}'
-        pdf_links.append((link.text.strip(), full_url))
-
-
-for title, link in pdf_links:
-    filename = os.path.join(output, f"{title}.pdf")
-    pdf_response = requests.get(link)
-    pdf_response.raise_for_status()
-
-    with open(filename, 'wb') as pdf_file:
-        pdf_file.write(pdf_response.content)
-    print(f'Download concluído: {filename}')
-
-
 zip_filename = 'anexos.zip'
 
-with ZipFile(zip_filename, 'w') as zipf:
-    for title, _ in pdf_links:
-        pdf_path = os.path.join(output, f"{title}.pdf")
-        zipf.write(pdf_path, os.path.basename(pdf_path))
-        print(f'Arquivo adicionado ao ZIP: {pdf_path}')
 
-print(f'Arquivo ZIP criado: {zip_filename}')
+def listar_anexos():
+    """Baixa a página e retorna (título, link) de cada Anexo I/II"""
+    with metricas.etapa('pagina') as medida:
+        response = requests.get(url)
+        response.raise_for_status()
+        medida.itens += 1
+        medida.bytes += len(response.content)
+
+    soup = BeautifulSoup(response.content, 'html.parser')
+
+    pdf_links = []
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if 'Anexo I' in link.text or 'Anexo II' in link.text:
+            full_url = href if href.startswith('http') else f'https://www.gov.br{href}'
+            pdf_links.append((link.text.strip(), full_url))
+    return pdf_links
+
+
+def informar(resultados):
+    for resultado in resultados:
+        if resultado.ok:
+            if resultado.status == 'inalterado':
+                print(f'Sem alterações desde o último download: {resultado.destino}')
+            else:
+                print(f'Download concluído: {resultado.destino}')
+        else:
+            print(f'Falha ao baixar {resultado.url}: {resultado.erro}')
+
+
+def empacotar_em_disco(pdf_links):
+    """Baixa os PDFs em downloads/ e depois os copia para o ZIP"""
+    os.makedirs(output, exist_ok=True)
+    # Baixar os anexos em paralelo, retomando parciais e pulando os inalterados
+    downloads = [(link, os.path.join(output, f"{title}.pdf")) for title, link in pdf_links]
+    with metricas.etapa('download') as medida:
+        resultados = baixar_arquivos(downloads, concorrencia=4)
+        medida.itens += len(resultados)
+        medida.bytes += sum(resultado.bytes_recebidos for resultado in resultados)
+    informar(resultados)
+    baixados = [resultado.destino for resultado in resultados if resultado.ok]
+
+    with metricas.etapa('zip') as medida, ZipFile(zip_filename, 'w') as zipf:
+        for pdf_path in baixados:
+            zipf.write(pdf_path, os.path.basename(pdf_path))
+            medida.itens += 1
+            medida.bytes += os.path.getsize(pdf_path)
+            print(f'Arquivo adicionado ao ZIP: {pdf_path}')
+
+
+def empacotar_direto(pdf_links, nivel):
+    """Baixa cada PDF direto para a sua entrada do ZIP, comprimindo em paralelo"""
+    pares = [(link, f"{title}.pdf") for title, link in pdf_links]
+    with metricas.etapa('download_zip') as medida:
+        resultados = baixar_para_zip(pares, zip_filename, nivel=nivel, concorrencia=4)
+        medida.itens += len(resultados)
+        medida.bytes += sum(resultado.bytes_recebidos for resultado in resultados)
+    informar(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Baixa os Anexos I e II do Rol de Procedimentos e os compacta")
+    parser.add_argument("--empacotamento", choices=["disco", "direto"], default="disco",
+                        help="disco: grava os PDFs em downloads/ e depois monta o ZIP; "
+                             "direto: grava cada PDF direto no ZIP, sem arquivos soltos")
+    parser.add_argument("--nivel-compressao", type=int, choices=range(10), default=0, metavar="0-9",
+                        help="nível do deflate no modo direto (0 = sem compressão, como no modo disco)")
+    args = parser.parse_args()
+
+    pdf_links = listar_anexos()
+    if args.empacotamento == "direto":
+        empacotar_direto(pdf_links, args.nivel_compressao)
+    else:
+        empacotar_em_disco(pdf_links)
+
+    print(f'Arquivo ZIP criado: {zip_filename}')
+    print(f'Relatório de métricas: {metricas.salvar_relatorio("teste1", extra={"empacotamento": args.empacotamento})}')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,574 @@
+import argparse
+import bisect
+import csv
+import hashlib
+import io
+import json
 import pandas as pd
 import pdfplumber
+import sqlite3
+import struct
+import time
 import zipfile
+import zlib
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_table_from_pdf(pdf_path):
-    """Extrai tabelas de PDF usando pdfplumber"""
-    all_tables = []
-    
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import PSLiteral
+from pdfplumber import utils as pdf_utils
+from pdfplumber.table import TableSettings, merge_edges
+
+from comum import metricas
+
+RENOMEAR_COLUNAS = {
+    'OD': 'Odontológico',
+    'AMB': 'Ambulatorial'
+}
+
+# Parâmetros do `extract_table`; entram na chave do cache de páginas
+CONFIG_TABELA = {}
+# Mude quando a extração mudar de um jeito que a chave não percebe
+VERSAO_CACHE = 1
+
+CACHE_PAGINAS = metricas.registro.contador(
+    'cache_paginas_total', 'Páginas do PDF por resultado no cache de extração', ['resultado'])
+PAGINAS_EXTRAIDAS = metricas.registro.contador(
+    'paginas_extraidas_total', 'Páginas extraídas pela grade aprendida ou pela detecção completa', ['modo'])
+
+
+def _resumir(objeto, hash_, memo, caminho=()):
+    """Alimenta `hash_` com o conteúdo de um objeto do PDF, resolvendo referências.
+
+    O resumo de cada objeto indireto (fontes, imagens) é calculado uma vez e
+    reaproveitado pelas outras páginas que o usam.
+    """
+    if isinstance(objeto, PDFObjRef):
+        if objeto.objid not in memo:
+            if objeto.objid in caminho:
+                hash_.update(b'ciclo')
+                return
+            sub = hashlib.sha256()
+            _resumir(objeto.resolve(), sub, memo, caminho + (objeto.objid,))
+            memo[objeto.objid] = sub.digest()
+        hash_.update(memo[objeto.objid])
+    elif isinstance(objeto, PDFStream):
+        _resumir(objeto.attrs, hash_, memo, caminho)
+        hash_.update(objeto.get_rawdata() or b'')
+    elif isinstance(objeto, dict):
+        for chave in sorted(objeto):
+            hash_.update(f'/{chave}'.encode())
+            _resumir(objeto[chave], hash_, memo, caminho)
+    elif isinstance(objeto, (list, tuple)):
+        hash_.update(b'[')
+        for item in objeto:
+            _resumir(item, hash_, memo, caminho)
+        hash_.update(b']')
+    elif isinstance(objeto, PSLiteral):
+        hash_.update(f'/{objeto.name}'.encode())
+    else:
+        hash_.update(repr(objeto).encode())
+
+
+def chaves_paginas(pdf_path):
+    """Chave de cache de cada página: conteúdo, recursos, geometria e configuração.
+
+    Páginas iguais em revisões diferentes do PDF têm a mesma chave, mesmo que
+    mudem de posição.
+    """
+    config = json.dumps([VERSAO_CACHE, pdfplumber.__version__, CONFIG_TABELA], sort_keys=True).encode()
+    memo = {}
+    chaves = []
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
-            table = page.extract_table()
-            if table:
-                all_tables.append(table)
+            pagina = page.page_obj
+            hash_ = hashlib.sha256(config)
+            _resumir([page.mediabox, page.cropbox, page.rotation], hash_, memo)
+            _resumir(pagina.resources, hash_, memo)
+            _resumir(pagina.contents, hash_, memo)
+            chaves.append(hash_.hexdigest())
+    return chaves
+
+
+def chave_cache(chave_pagina, assinatura=None):
+    """Chave de uma entrada do cache: a página mais o modo que a extraiu.
+
+    Tabelas da detecção completa (`assinatura` None) valem para os dois
+    modos. As da grade aprendida levam a assinatura da grade, e só são
+    reaproveitadas por uma extração com `grade`.
+    """
+    modo = 'completa' if assinatura is None else f'grade:{assinatura}'
+    return hashlib.sha256(f'{chave_pagina}:{modo}'.encode()).hexdigest()
+
+
+def codificar_tabela(tabela):
+    """Tabela de uma página em bytes: quantidades e textos com prefixo de tamanho, em zlib.
+
+    Célula vazia (None) é gravada com tamanho 0xFFFFFFFF; página sem tabela
+    vira b''.
+    """
+    if tabela is None:
+        return b''
+    partes = [struct.pack('<I', len(tabela))]
+    for linha in tabela:
+        partes.append(struct.pack('<H', len(linha)))
+        for celula in linha:
+            if celula is None:
+                partes.append(b'\xff\xff\xff\xff')
+            else:
+                texto = celula.encode('utf-8')
+                partes.append(struct.pack('<I', len(texto)) + texto)
+    return zlib.compress(b''.join(partes))
+
+
+def decodificar_tabela(dados):
+    if not dados:
+        return None
+    dados = zlib.decompress(dados)
+    (linhas,), posicao = struct.unpack_from('<I', dados), 4
+    tabela = []
+    for _ in range(linhas):
+        (colunas,), posicao = struct.unpack_from('<H', dados, posicao), posicao + 2
+        linha = []
+        for _ in range(colunas):
+            (tamanho,), posicao = struct.unpack_from('<I', dados, posicao), posicao + 4
+            if tamanho == 0xFFFFFFFF:
+                linha.append(None)
+            else:
+                linha.append(dados[posicao:posicao + tamanho].decode('utf-8'))
+                posicao += tamanho
+        tabela.append(linha)
+    return tabela
+
+
+class CachePaginas:
+    """Cache em disco (SQLite) das tabelas extraídas, por chave de página.
+
+    Cada acerto atualiza o último uso da entrada; `podar` remove as menos
+    usadas recentemente até o cache caber em `limite_bytes`.
+    """
+
+    def __init__(self, caminho, limite_bytes=256 << 20):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.execute(
+            'CREATE TABLE IF NOT EXISTS paginas ('
+            ' chave TEXT PRIMARY KEY, dados BLOB NOT NULL, tamanho INTEGER NOT NULL, usado REAL NOT NULL)'
+        )
+        self.conexao.execute('CREATE INDEX IF NOT EXISTS paginas_usado ON paginas (usado)')
+        # Grades aprendidas que já geraram entradas, para montar as chaves no modo grade
+        self.conexao.execute('CREATE TABLE IF NOT EXISTS grades (assinatura TEXT PRIMARY KEY)')
+        self.limite_bytes = limite_bytes
+        self.acertos = 0
+        self.faltas = 0
+        self.removidas = 0
+
+    def existentes(self, chaves):
+        existentes = set()
+        unicas = list(set(chaves))
+        for inicio in range(0, len(unicas), 500):
+            lote = unicas[inicio:inicio + 500]
+            marcadores = ','.join('?' * len(lote))
+            existentes.update(chave for (chave,) in self.conexao.execute(
+                f'SELECT chave FROM paginas WHERE chave IN ({marcadores})', lote))
+        return existentes
+
+    def assinaturas(self):
+        return [assinatura for (assinatura,) in self.conexao.execute('SELECT assinatura FROM grades')]
+
+    def obter(self, chave):
+        dados, = self.conexao.execute('SELECT dados FROM paginas WHERE chave = ?', (chave,)).fetchone()
+        self.conexao.execute('UPDATE paginas SET usado = ? WHERE chave = ?', (time.time(), chave))
+        self.acertos += 1
+        CACHE_PAGINAS.inc(resultado='acerto')
+        return decodificar_tabela(dados)
+
+    def guardar(self, chave, tabela, assinatura=None):
+        dados = codificar_tabela(tabela)
+        self.conexao.execute('INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?)',
+                             (chave, dados, len(dados), time.time()))
+        if assinatura is not None:
+            self.conexao.execute('INSERT OR IGNORE INTO grades VALUES (?)', (assinatura,))
+        # Uma execução interrompida não perde as páginas já extraídas
+        self.conexao.commit()
+        self.faltas += 1
+        CACHE_PAGINAS.inc(resultado='falta')
+
+    def tamanho(self):
+        return self.conexao.execute('SELECT COALESCE(SUM(tamanho), 0) FROM paginas').fetchone()[0]
+
+    def podar(self):
+        """Remove as entradas usadas há mais tempo até o total caber no limite.
+
+        Retorna o tamanho final do cache, em bytes.
+        """
+        total = self.tamanho()
+        excesso = total - self.limite_bytes
+        if excesso > 0:
+            for chave, tamanho in self.conexao.execute(
+                    'SELECT chave, tamanho FROM paginas ORDER BY usado').fetchall():
+                if excesso <= 0:
+                    break
+                self.conexao.execute('DELETE FROM paginas WHERE chave = ?', (chave,))
+                excesso -= tamanho
+                total -= tamanho
+                self.removidas += 1
+        self.conexao.commit()
+        return total
+
+    def fechar(self):
+        self.conexao.commit()
+        self.conexao.close()
+
+
+class GeometriaTabela:
+    """Grade da tabela aprendida com a detecção completa do pdfplumber.
+
+    A tabela do Rol tem as mesmas colunas em todas as páginas. Depois que
+    uma página com a tabela em grade completa ensina as posições das
+    colunas, as seguintes só unem as bordas (como o pdfplumber faz) e
+    conferem se elas formam uma grade completa sobre essas colunas. Se
+    formam, as células são essa grade, que é o que a detecção completa
+    encontraria, e cada caractere vai para a sua célula por busca binária,
+    sem calcular interseções nem varrer os caracteres de cada célula. Se
+    não formam, `extrair` retorna None e a página usa a detecção completa.
+    """
+
+    def __init__(self, config):
+        self.config = TableSettings.resolve(config)
+        self.texto = self.config.text_settings or {}
+        self.colunas = None
+        # A grade só reproduz a detecção por linhas desenhadas, sem layout
+        self.ativa = (self.config.vertical_strategy == self.config.horizontal_strategy == 'lines'
+                      and not self.config.explicit_vertical_lines
+                      and not self.config.explicit_horizontal_lines
+                      and 'layout' not in self.texto)
+
+    def aprender(self, tabela):
+        """Guarda as colunas de uma tabela achada pela detecção completa, se ela for uma grade completa"""
+        if not self.ativa or tabela is None:
+            return
+        colunas = sorted({x for celula in tabela.cells for x in (celula[0], celula[2])})
+        linhas = {y for celula in tabela.cells for y in (celula[1], celula[3])}
+        if len(tabela.cells) == (len(colunas) - 1) * (len(linhas) - 1):
+            self.colunas = colunas
+
+    @property
+    def assinatura(self):
+        """Identifica a grade aprendida (as colunas), para a chave do cache"""
+        return json.dumps(self.colunas)
+
+    def _linhas_da_grade(self, page):
+        """Posições das linhas da grade na página, ou None se as bordas não formam a grade aprendida"""
+        config = self.config
+        bordas = merge_edges(
+            pdf_utils.filter_edges(page.edges, 'v') + pdf_utils.filter_edges(page.edges, 'h'),
+            snap_x_tolerance=config.snap_x_tolerance, snap_y_tolerance=config.snap_y_tolerance,
+            join_x_tolerance=config.join_x_tolerance, join_y_tolerance=config.join_y_tolerance,
+        )
+        bordas = pdf_utils.filter_edges(bordas, min_length=config.edge_min_length)
+        verticais = sorted((b for b in bordas if b['orientation'] == 'v'), key=lambda b: b['x0'])
+        horizontais = sorted((b for b in bordas if b['orientation'] == 'h'), key=lambda b: b['top'])
+        # Uma borda por coluna, nas posições aprendidas, e nada além da grade
+        if [b['x0'] for b in verticais] != self.colunas or len(horizontais) < 2:
+            return None
+        linhas = [b['top'] for b in horizontais]
+        if len(set(linhas)) != len(linhas):
+            return None
+        esquerda, direita = self.colunas[0], self.colunas[-1]
+        if any(b['x0'] > esquerda or b['x1'] < direita for b in horizontais):
+            return None
+        if any(b['top'] > linhas[0] or b['bottom'] < linhas[-1] for b in verticais):
+            return None
+        return linhas
+
+    def extrair(self, page):
+        """Tabela da página pela grade aprendida, ou None se a página não a segue"""
+        if not self.ativa or self.colunas is None:
+            return None
+        linhas = self._linhas_da_grade(page)
+        if linhas is None:
+            return None
+
+        colunas = self.colunas
+        celulas = [[[] for _ in range(len(colunas) - 1)] for _ in range(len(linhas) - 1)]
+        for char in page.chars:
+            # Mesmo critério do pdfplumber: o meio do caractere dentro da célula
+            i = bisect.bisect_right(linhas, (char['top'] + char['bottom']) / 2) - 1
+            j = bisect.bisect_right(colunas, (char['x0'] + char['x1']) / 2) - 1
+            if 0 <= i < len(linhas) - 1 and 0 <= j < len(colunas) - 1:
+                celulas[i][j].append(char)
+        return [[pdf_utils.extract_text(chars, **self.texto) if chars else '' for chars in linha]
+                for linha in celulas]
+
+
+def _extrair_pagina(page, geometria):
+    """(tabela da página, assinatura da grade que a extraiu ou None se veio da detecção completa)"""
+    if geometria is not None:
+        tabela = geometria.extrair(page)
+        if tabela is not None:
+            return tabela, geometria.assinatura
+    tabela = page.find_table(CONFIG_TABELA)
+    if geometria is not None:
+        geometria.aprender(tabela)
+    if tabela is None:
+        return None, None
+    return tabela.extract(**(TableSettings.resolve(CONFIG_TABELA).text_settings or {})), None
+
+def _extrair_paginas(args):
+    """Extrai as tabelas de uma lista de páginas (roda dentro do pool)"""
+    pdf_path, paginas, grade = args
+    geometria = GeometriaTabela(CONFIG_TABELA) if grade else None
+    with pdfplumber.open(pdf_path) as pdf:
+        tabelas = []
+        for n in paginas:
+            tabelas.append(_extrair_pagina(pdf.pages[n], geometria))
+            pdf.pages[n].close()
+        return tabelas
+
+def iterar_tabelas(pdf_path, workers=1, cache=None, grade=False):
+    """Gera a tabela de cada página, na ordem das páginas.
+
+    Com `cache` (um CachePaginas), as páginas já extraídas vêm do cache e só
+    as novas ou alteradas passam pelo pdfplumber. Com `grade`, as páginas
+    que seguem a grade da tabela aprendida nas anteriores não passam pela
+    detecção completa (veja GeometriaTabela); a saída é a mesma. Sem
+    `grade`, o cache só devolve tabelas da detecção completa.
+    """
+    if cache is None:
+        for tabela, _ in _contar_modos(_extrair(pdf_path, None, workers, grade)):
+            yield tabela
+        return
+
+    paginas = chaves_paginas(pdf_path)
+    assinaturas = [None] + (cache.assinaturas() if grade else [])
+    candidatas = {pagina: [chave_cache(pagina, a) for a in assinaturas] for pagina in set(paginas)}
+    guardadas = cache.existentes([chave for chaves in candidatas.values() for chave in chaves])
+    encontradas = {}
+    # Uma página que se repete no PDF é extraída só na primeira vez
+    novas = {}
+    for n, pagina in enumerate(paginas):
+        chave = next((c for c in candidatas[pagina] if c in guardadas), None)
+        if chave is not None:
+            encontradas[pagina] = chave
+        else:
+            novas.setdefault(pagina, n)
+    extraidas = _contar_modos(_extrair(pdf_path, list(novas.values()), workers, grade))
+    for pagina in paginas:
+        if pagina in encontradas:
+            yield cache.obter(encontradas[pagina])
+        else:
+            tabela, assinatura = next(extraidas)
+            encontradas[pagina] = chave_cache(pagina, assinatura)
+            cache.guardar(encontradas[pagina], tabela, assinatura)
+            yield tabela
+
+def _contar_modos(extraidas):
+    for tabela, assinatura in extraidas:
+        PAGINAS_EXTRAIDAS.inc(modo='completa' if assinatura is None else 'grade')
+        yield tabela, assinatura
+
+def _extrair(pdf_path, paginas, workers, grade=False):
+    """Gera (tabela, assinatura da grade ou None) de `paginas` (None = todas), na ordem da lista.
+
+    Com workers > 1 as páginas são divididas em grupos processados em
+    paralelo, recolhidos na ordem de envio, então a saída é a mesma do modo
+    serial.
+    """
+    if paginas is not None and not paginas:
+        return
+    if workers <= 1:
+        geometria = GeometriaTabela(CONFIG_TABELA) if grade else None
+        with pdfplumber.open(pdf_path) as pdf:
+            for n in range(len(pdf.pages)) if paginas is None else paginas:
+                page = pdf.pages[n]
+                yield _extrair_pagina(page, geometria)
+                # Libera os objetos de layout já usados desta página
+                page.close()
+        return
+
+    if paginas is None:
+        with pdfplumber.open(pdf_path) as pdf:
+            paginas = range(len(pdf.pages))
+    total_paginas = len(paginas)
+
+    # Grupos menores que total/workers equilibram páginas mais pesadas
+    tamanho = max(1, -(-total_paginas // (workers * 4)))
+    intervalos = [(pdf_path, list(paginas[inicio:inicio + tamanho]), grade)
+                  for inicio in range(0, total_paginas, tamanho)]
+    # Janela limitada de intervalos em andamento: se a escrita atrasar, os
+    # resultados não se acumulam na memória
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pendentes = deque()
+        for intervalo in intervalos:
+            pendentes.append(executor.submit(_extrair_paginas, intervalo))
+            if len(pendentes) >= workers * 2:
+                yield from pendentes.popleft().result()
+        while pendentes:
+            yield from pendentes.popleft().result()
+
+def extract_table_from_pdf(pdf_path, workers=1):
+    """Extrai tabelas de PDF usando pdfplumber"""
+    all_tables = [table for table in iterar_tabelas(pdf_path, workers) if table]
     
     # Converte todas as tabelas para DataFrames e concatena
     dfs = [pd.DataFrame(table[1:], columns=table[0]) for table in all_tables if table]
     return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
+def contar_paginas(tabelas, medida):
+    """Repassa as tabelas somando cada página em `medida.itens`"""
+    for tabela in tabelas:
+        medida.itens += 1
+        yield tabela
+
+class Cabecalho(list):
+    """Cabeçalho no fluxo de `iterar_linhas`, já com as colunas renomeadas"""
+
+def iterar_linhas(tabelas):
+    """Transforma as tabelas das páginas em um fluxo de linhas.
+
+    A primeira linha gerada é o cabeçalho (um `Cabecalho`). Páginas com o
+    mesmo cabeçalho seguem posicionalmente; nas demais as colunas são
+    alinhadas pelo nome. Uma coluna que aparece só numa página seguinte é
+    acrescentada no fim, como no `pd.concat`: sai um novo `Cabecalho` com
+    todas as colunas, e as linhas a partir dali ficam mais largas. Linhas
+    totalmente vazias são puladas, como no `dropna(how='all')`.
+    """
+    cabecalho = None
+    for tabela in tabelas:
+        if not tabela:
+            continue
+        cabecalho_pagina, corpo = tabela[0], tabela[1:]
+        posicoes = None
+        if cabecalho is None:
+            cabecalho = list(cabecalho_pagina)
+            yield Cabecalho(RENOMEAR_COLUNAS.get(coluna, coluna) for coluna in cabecalho)
+        elif cabecalho_pagina != cabecalho:
+            extras = [c for c in cabecalho_pagina if c not in cabecalho]
+            if extras:
+                cabecalho += extras
+                yield Cabecalho(RENOMEAR_COLUNAS.get(coluna, coluna) for coluna in cabecalho)
+            posicoes = [cabecalho_pagina.index(c) if c in cabecalho_pagina else None for c in cabecalho]
+
+        for linha in corpo:
+            if posicoes is not None:
+                linha = [linha[p] if p is not None else None for p in posicoes]
+            if all(valor is None for valor in linha):
+                continue
+            yield linha
+
+def escrever_csv_no_zip(linhas, zip_path, csv_name, amostra=5):
+    """Escreve as linhas como CSV direto dentro do ZIP, sem arquivo intermediário.
+
+    Se o cabeçalho ganhar colunas no meio do fluxo, o CSV é reescrito no
+    fim com o cabeçalho completo, e as linhas anteriores ficam com essas
+    colunas vazias. Retorna (cabeçalho, total de registros, primeiras
+    linhas), contados durante a escrita.
+    """
+    cabecalho = None
+    ampliado = None
+    total = 0
+    primeiras = []
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        with zipf.open(csv_name, 'w', force_zip64=True) as entrada:
+            with io.TextIOWrapper(entrada, encoding='utf-8-sig', newline='') as texto:
+                escritor = csv.writer(texto, lineterminator='\n')
+                for linha in linhas:
+                    if isinstance(linha, Cabecalho):
+                        if cabecalho is None:
+                            cabecalho = linha
+                            escritor.writerow(linha)
+                        else:
+                            ampliado = linha
+                        continue
+                    escritor.writerow(linha)
+                    if total < amostra:
+                        primeiras.append(linha)
+                    total += 1
+
+    if ampliado is not None:
+        print(f"Colunas novas em páginas seguintes: {ampliado[len(cabecalho):]}; "
+              f"reescrevendo {csv_name} com todas as colunas...")
+        _reescrever_com_colunas(zip_path, csv_name, ampliado)
+        cabecalho = ampliado
+    if cabecalho is not None:
+        primeiras = [linha + [None] * (len(cabecalho) - len(linha)) for linha in primeiras]
+    return cabecalho, total, primeiras
+
+def _reescrever_com_colunas(zip_path, csv_name, cabecalho):
+    """Segunda passada: troca o cabeçalho e completa as linhas mais curtas com colunas vazias"""
+    temporario = zip_path + '.tmp'
+    with zipfile.ZipFile(zip_path) as origem, zipfile.ZipFile(temporario, 'w', zipfile.ZIP_DEFLATED) as destino:
+        with origem.open(csv_name) as entrada, destino.open(csv_name, 'w', force_zip64=True) as saida:
+            leitor = csv.reader(io.TextIOWrapper(entrada, encoding='utf-8-sig', newline=''))
+            with io.TextIOWrapper(saida, encoding='utf-8-sig', newline='') as texto:
+                escritor = csv.writer(texto, lineterminator='\n')
+                next(leitor, None)
+                escritor.writerow(cabecalho)
+                largura = len(cabecalho)
+                for linha in leitor:
+                    escritor.writerow(linha + [''] * (largura - len(linha)))
+    os.replace(temporario, zip_path)
+
 def main():
+    parser = argparse.ArgumentParser(description="Extrai a tabela do Anexo I para CSV compactado")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos usados na extração das páginas (1 = serial)")
+    parser.add_argument("--cache", default=os.environ.get("CACHE_PAGINAS", ".cache/paginas_pdf.sqlite"),
+                        help="arquivo do cache de páginas já extraídas")
+    parser.add_argument("--cache-mb", type=int, default=256, help="tamanho máximo do cache de páginas")
+    parser.add_argument("--sem-cache", action="store_true", help="extrai todas as páginas sem usar o cache")
+    parser.add_argument("--extracao", choices=["grade", "completa"], default="completa",
+                        help="grade: reaproveita as colunas aprendidas nas primeiras páginas; "
+                             "completa (padrão): detecta a tabela do zero em todas as páginas")
+    args = parser.parse_args()
+
     print("=== TESTE DE TRANSFORMAÇÃO DE DADOS ===")
     
     
     pdf_path = "downloads/Anexo I..pdf"
-    csv_path = "Rol_de_Procedimentos.csv"
+    csv_name = "Rol_de_Procedimentos.csv"
     zip_path = "Teste_Adeilton_Polovodoff.zip"  
     
     
-    print("\n1. Extraindo tabelas do PDF...")
+    print("\n1. Extraindo tabelas do PDF, página a página...")
+    print("2. Normalizando cabeçalhos e removendo linhas vazias...")
+    print(f"3. Gravando {csv_name} direto no arquivo compactado {zip_path}...")
+    cache = None if args.sem_cache else CachePaginas(args.cache, args.cache_mb << 20)
     try:
-        df = extract_table_from_pdf(pdf_path)
+        with metricas.etapa('extracao') as medida:
+            tabelas = iterar_tabelas(pdf_path, workers=args.workers, cache=cache,
+                                     grade=args.extracao == "grade")
+            linhas = iterar_linhas(contar_paginas(tabelas, medida))
+            cabecalho, total, primeiras = escrever_csv_no_zip(linhas, zip_path, csv_name)
+            medida.linhas += total
+            medida.bytes += os.path.getsize(pdf_path)
+        if cache is not None:
+            tamanho_cache = cache.podar()
+            print(f"Cache de páginas: {cache.acertos} do cache, {cache.faltas} extraídas, "
+                  f"{cache.removidas} removidas ({tamanho_cache / 2**20:.1f} MB em {args.cache})")
         
-        if df.empty:
+        if cabecalho is None:
+            os.remove(zip_path)
             print("Nenhuma tabela encontrada no PDF.")
             return
-            
-        print("\nVisualização da tabela extraída (primeiras 5 linhas):")
-        print(df.head())
-        
-        
-        print("\n2. Processando e limpando os dados...")
-        
-        
-        df = df.dropna(how='all')
-        df = df.reset_index(drop=True)
-        
-        
-        df = df.rename(columns={
-            'OD': 'Odontológico',
-            'AMB': 'Ambulatorial'
-        })
-        
-        
-        df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-        print(f"\n3. Arquivo CSV salvo em: {csv_path}")
-        
-        
-        print("\n4. Compactando o arquivo CSV...")
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(csv_path)
         
         print(f"Arquivo compactado criado: {zip_path}")
         
         
-        print("\n5. Verificação final:")
-        df_final = pd.read_csv(csv_path)
-        print(f"Total de registros no CSV: {len(df_final)}")
+        print("\n4. Verificação final:")
+        print(f"Total de registros no CSV: {total}")
         print("\nPrimeiras linhas do arquivo final:")
-        print(df_final.head())
+        print(pd.DataFrame(primeiras, columns=cabecalho))
+        extra = {'workers': args.workers, 'cache': not args.sem_cache, 'extracao': args.extracao}
+        print(f"\nRelatório de métricas: {metricas.salvar_relatorio('teste2', extra=extra)}")
         
     except Exception as e:
         print(f"\nOcorreu um erro: {str(e)}")
+    finally:
+        if cache is not None:
+            cache.fechar()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,224 @@
+"""Backend colunar das análises: Parquet particionado + DuckDB (ou pandas).
+
+Alternativa ao MySQL que não precisa de nenhum serviço. Os dados já
+limpos pelo script de carga são gravados em Parquet:
+
+    <diretorio>/operadoras.parquet
+    <diretorio>/demonstracoes/ano=2023/trimestre=1/dados.parquet
+    <diretorio>/cargas.json              (manifesto, como cargas_arquivos)
+
+Os relatórios "top 10" do trimestre e do ano são calculados direto nesses
+arquivos: o filtro de trimestre só abre a partição dele, e o de ano usa as
+estatísticas de mín/máx da coluna `data` para pular grupos de linhas.
+"""
+import json
+import os
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import duckdb
+except ImportError:  # sem o DuckDB, os relatórios usam pandas/pyarrow
+    duckdb = None
+
+DIRETORIO_PARQUET = os.environ.get('ANS_PARQUET_DIR', os.path.join('dados_ans', 'parquet'))
+
+MOTORES = ['duckdb', 'pandas']
+MOTOR_PADRAO = 'duckdb' if duckdb is not None else 'pandas'
+
+ESQUEMA_DEMONSTRACOES = pa.schema([
+    ('data', pa.date32()),
+    ('registro_ans', pa.string()),
+    ('conta', pa.string()),
+    ('descricao', pa.string()),
+    ('valor', pa.float64()),
+    ('categoria', pa.uint8()),
+])
+
+# Chave natural, a mesma de uk_demonstracao no MySQL
+CHAVE_DEMONSTRACOES = ['registro_ans', 'data', 'conta']
+
+
+def _caminho(diretorio, *partes):
+    return os.path.join(diretorio, *partes)
+
+
+def carregar_manifesto(diretorio=DIRETORIO_PARQUET):
+    """{arquivo: hash} das cargas já gravadas"""
+    try:
+        with open(_caminho(diretorio, 'cargas.json'), encoding='utf-8') as arquivo:
+            cargas = json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+    return {nome: carga['hash_sha256'] for nome, carga in cargas.items()}
+
+
+def registrar_carga(arquivo, periodo, file_hash, file_path, linhas, duracao, diretorio=DIRETORIO_PARQUET):
+    """Grava/atualiza a entrada do arquivo no manifesto (troca atômica do JSON)"""
+    caminho = _caminho(diretorio, 'cargas.json')
+    try:
+        with open(caminho, encoding='utf-8') as entrada:
+            cargas = json.load(entrada)
+    except FileNotFoundError:
+        cargas = {}
+    cargas[arquivo] = {
+        'periodo': periodo,
+        'hash_sha256': file_hash,
+        'tamanho_bytes': os.path.getsize(file_path),
+        'linhas': linhas,
+        'duracao_s': round(duracao, 2),
+        'carregado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    os.makedirs(diretorio, exist_ok=True)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as saida:
+        json.dump(cargas, saida, indent=2, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def gravar_operadoras(df, diretorio=DIRETORIO_PARQUET):
+    """Grava o cadastro limpo (saída de clean_operadoras); vale a última linha de cada registro"""
+    df = df[df['registro_ans'].notna()].drop_duplicates('registro_ans', keep='last')
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho(diretorio, 'operadoras.parquet')
+    df.reset_index(drop=True).to_parquet(caminho + '.tmp', engine='pyarrow', index=False)
+    os.replace(caminho + '.tmp', caminho)
+    return len(df)
+
+
+def ler_registros_operadoras(diretorio=DIRETORIO_PARQUET):
+    """Conjunto de registro_ans cadastrados (vazio se o cadastro ainda não foi gravado)"""
+    caminho = _caminho(diretorio, 'operadoras.parquet')
+    if not os.path.exists(caminho):
+        return set()
+    return set(pd.read_parquet(caminho, columns=['registro_ans'])['registro_ans'])
+
+
+def gravar_trimestre(blocos, ano, trimestre, diretorio=DIRETORIO_PARQUET):
+    """Substitui a partição do trimestre pelas linhas dos blocos (de iter_demonstracoes).
+
+    As linhas importáveis de um trimestre são poucas, então são juntadas para
+    remover repetições da chave natural (fica a última, como no upsert do
+    MySQL). A partição nova é montada fora de `demonstracoes/` e só então
+    troca a antiga, então leitores nunca veem um trimestre pela metade.
+    """
+    colunas = [campo.name for campo in ESQUEMA_DEMONSTRACOES]
+    partes = [bloco[colunas] for bloco in blocos]
+    df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=colunas)
+    df['data'] = pd.to_datetime(df['data']).dt.date
+    df = df.drop_duplicates(CHAVE_DEMONSTRACOES, keep='last')
+    tabela = pa.Table.from_pandas(df, schema=ESQUEMA_DEMONSTRACOES, preserve_index=False)
+
+    particao = _caminho(diretorio, 'demonstracoes', f'ano={ano}', f'trimestre={trimestre}')
+    temporaria = _caminho(diretorio, '_tmp', f'{ano}-{trimestre}')
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+    # Ordenar por data deixa as estatísticas de cada grupo de linhas estreitas
+    pq.write_table(tabela.sort_by([('data', 'ascending'), ('registro_ans', 'ascending')]),
+                   _caminho(temporaria, 'dados.parquet'), compression='zstd')
+    shutil.rmtree(particao, ignore_errors=True)
+    os.makedirs(os.path.dirname(particao), exist_ok=True)
+    os.replace(temporaria, particao)
+    return tabela.num_rows
+
+
+def _top10(linhas):
+    return [(razao_social, round(float(total), 2)) for razao_social, total in linhas]
+
+
+def _relatorios_duckdb(diretorio, despesas):
+    con = duckdb.connect()
+    try:
+        padrao = _caminho(diretorio, 'demonstracoes', 'ano=*', 'trimestre=*', '*.parquet').replace("'", "''")
+        operadoras = _caminho(diretorio, 'operadoras.parquet').replace("'", "''")
+        con.execute(f"CREATE VIEW dem AS SELECT * FROM read_parquet('{padrao}', hive_partitioning = true)")
+        con.execute(f"CREATE VIEW ops AS SELECT registro_ans, razao_social FROM read_parquet('{operadoras}')")
+
+        total, ultima_data = con.execute("SELECT count(*), max(data) FROM dem").fetchone()
+        if not total:
+            return {'total_registros': 0}
+        ano, trimestre = con.execute("""
+        SELECT ano, trimestre FROM dem WHERE data = ?
+        ORDER BY ano DESC, trimestre DESC LIMIT 1
+        """, [ultima_data]).fetchone()
+
+        def ranking(filtro, parametros, todas):
+            categorias = '' if todas else f"AND d.categoria IN ({', '.join(map(str, despesas)) or 'NULL'})"
+            return _top10(con.execute(f"""
+            SELECT o.razao_social, sum(d.valor) AS total
+            FROM dem d JOIN ops o ON o.registro_ans = d.registro_ans
+            WHERE {filtro} {categorias}
+            GROUP BY o.razao_social
+            ORDER BY total DESC
+            LIMIT 10
+            """, parametros).fetchall())
+
+        return _montar_relatorios(total, ultima_data, ano, trimestre, lambda todas: ranking(
+            "d.ano = ? AND d.trimestre = ?", [ano, trimestre], todas
+        ), lambda todas: ranking(
+            "d.data BETWEEN ? AND ?", [date(ultima_data.year, 1, 1), date(ultima_data.year, 12, 31)], todas
+        ))
+    finally:
+        con.close()
+
+
+def _relatorios_pandas(diretorio, despesas):
+    pasta = _caminho(diretorio, 'demonstracoes')
+    datas = pd.read_parquet(pasta, columns=['data', 'ano', 'trimestre'])
+    if datas.empty:
+        return {'total_registros': 0}
+    ultima_data = datas['data'].max()
+    ultimas = datas[datas['data'] == ultima_data]
+    ano, trimestre = max(zip(ultimas['ano'].astype(int), ultimas['trimestre'].astype(int)))
+    total = len(datas)
+    del datas, ultimas
+
+    operadoras = pd.read_parquet(_caminho(diretorio, 'operadoras.parquet'),
+                                 columns=['registro_ans', 'razao_social'])
+    colunas = ['registro_ans', 'valor', 'categoria']
+
+    def ranking(filtros, todas):
+        df = pd.read_parquet(pasta, columns=colunas, filters=filtros)
+        if not todas:
+            df = df[df['categoria'].isin(despesas)]
+        df = df.merge(operadoras, on='registro_ans')
+        somas = df.groupby('razao_social', observed=True)['valor'].sum()
+        return _top10(somas.nlargest(10).items())
+
+    return _montar_relatorios(total, ultima_data, ano, trimestre, lambda todas: ranking(
+        [('ano', '=', ano), ('trimestre', '=', trimestre)], todas
+    ), lambda todas: ranking(
+        [('data', '>=', date(ultima_data.year, 1, 1)), ('data', '<=', date(ultima_data.year, 12, 31))], todas
+    ))
+
+
+def _montar_relatorios(total, ultima_data, ano, trimestre, por_trimestre, por_ano):
+    """Mesma lógica do run_analytical_queries: sem despesas no recorte, soma todas as categorias"""
+    relatorios = {
+        'total_registros': int(total),
+        'ultima_data': ultima_data,
+        'ultimo_periodo': f"{trimestre}T{ano}",
+    }
+    for chave, calcular in (('trimestre', por_trimestre), ('ano', por_ano)):
+        linhas = calcular(False)
+        relatorios[chave] = (linhas, False) if linhas else (calcular(True), True)
+    return relatorios
+
+
+def relatorios(despesas, motor=MOTOR_PADRAO, diretorio=DIRETORIO_PARQUET):
+    """Top 10 do último trimestre e do último ano.
+
+    Retorna {'total_registros', 'ultima_data', 'ultimo_periodo',
+    'trimestre': ([(razao_social, total)], todas_categorias), 'ano': (...)};
+    sem dados, só total_registros = 0.
+    """
+    if not os.path.isdir(_caminho(diretorio, 'demonstracoes')):
+        return {'total_registros': 0}
+    if motor == 'duckdb':
+        if duckdb is None:
+            raise RuntimeError("DuckDB não está instalado; use o motor pandas")
+        return _relatorios_duckdb(diretorio, despesas)
+    return _relatorios_pandas(diretorio, despesas)
@@ -0,0 +1,358 @@
+"""Layout particionado de demonstracoes_contabeis.
+
+Os fatos ficam em `demonstracoes_fato`, particionada por RANGE do período
+(ano * 10 + trimestre), com a conta e a descrição normalizadas na dimensão
+`contas`. A view `demonstracoes_contabeis` expõe as mesmas colunas do
+layout clássico, então as leituras do script não mudam; as escritas passam
+pelas funções deste módulo.
+
+A dimensão tem uma linha por conta, e a chave do fato é a mesma chave
+natural do layout clássico, (registro_ans, data, conta): as mesmas linhas
+são deduplicadas nos dois layouts. Como no `ON DUPLICATE KEY UPDATE` do
+clássico, a descrição mais recente de uma conta é a que vale.
+
+Tabelas particionadas do InnoDB não aceitam chaves estrangeiras: a
+integridade com `operadoras` vem do filtro da carga, que só aceita
+operadoras já cadastradas.
+"""
+import re
+import threading
+
+from mysql.connector import Error
+
+TABELA_FATO = 'demonstracoes_fato'
+
+# Partição que recebe os períodos ainda sem partição própria
+PARTICAO_FUTURA = 'pfuturo'
+
+INSERT_FATO_SQL = """
+INSERT INTO demonstracoes_fato
+(periodo_id, registro_ans, conta_id, data, valor, categoria)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    valor = VALUES(valor),
+    categoria = VALUES(categoria)
+"""
+
+
+def periodo_id(periodo):
+    """'1T2023' -> 20231"""
+    encontrado = re.fullmatch(r'([1-4])T(\d{4})', periodo or '')
+    if not encontrado:
+        raise ValueError(f"Período inválido: {periodo!r}")
+    return int(encontrado.group(2)) * 10 + int(encontrado.group(1))
+
+
+def periodo_texto(pid):
+    """20231 -> '1T2023'"""
+    return f"{pid % 10}T{pid // 10}"
+
+
+def nome_particao(pid):
+    return f"p{pid}"
+
+
+def opcoes_tabela(compactar):
+    return "ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8" if compactar else "ROW_FORMAT=DYNAMIC"
+
+
+def existe_layout(cursor):
+    """True se o banco já usa o layout particionado"""
+    cursor.execute("""
+    SELECT COUNT(*) FROM information_schema.tables
+    WHERE table_schema = DATABASE() AND table_name = %s
+    """, (TABELA_FATO,))
+    return cursor.fetchone()[0] > 0
+
+
+def criar_tabelas(cursor, compactar=False):
+    """Cria a dimensão e o fato particionado (a view é criada à parte)"""
+    opcoes = opcoes_tabela(compactar)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS contas (
+        conta_id MEDIUMINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+        conta VARCHAR(100) NOT NULL,
+        descricao VARCHAR(255) NOT NULL,
+        categoria TINYINT UNSIGNED NOT NULL DEFAULT 0,
+        UNIQUE KEY uk_conta (conta)
+    ) {opcoes}
+    """)
+    # A chave primária começa pelo período (o acesso da carga e dos totais)
+    # e contém a chave natural; o índice secundário cobre a agregação por
+    # categoria sem ler as linhas
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS demonstracoes_fato (
+        periodo_id MEDIUMINT UNSIGNED NOT NULL,
+        registro_ans VARCHAR(20) NOT NULL,
+        conta_id MEDIUMINT UNSIGNED NOT NULL,
+        data DATE NOT NULL,
+        valor DECIMAL(15,2),
+        categoria TINYINT UNSIGNED NOT NULL DEFAULT 0,
+        PRIMARY KEY (periodo_id, registro_ans, conta_id, data),
+        INDEX idx_periodo_categoria (periodo_id, categoria, registro_ans, data, valor)
+    ) {opcoes}
+    PARTITION BY RANGE (periodo_id) (
+        PARTITION {PARTICAO_FUTURA} VALUES LESS THAN MAXVALUE
+    )
+    """)
+    migrar_chave_conta(cursor)
+
+
+def migrar_chave_conta(cursor):
+    """Bancos criados com a dimensão por (conta, descrição) passam a ter uma linha por conta.
+
+    Fica o conta_id mais recente de cada conta (o da última descrição
+    vista). Linhas do fato que só diferiam pela descrição são a mesma
+    linha na chave do clássico: fica a do conta_id mais recente.
+    """
+    cursor.execute("""
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'contas' AND index_name = 'uk_conta'
+    """)
+    if cursor.fetchone()[0] < 2:
+        return
+    print("Migrando a dimensão contas para uma linha por conta...")
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS contas_mantidas")
+    cursor.execute("""
+    CREATE TEMPORARY TABLE contas_mantidas (PRIMARY KEY (conta))
+    SELECT conta, MAX(conta_id) AS conta_id FROM contas GROUP BY conta
+    """)
+    cursor.execute("""
+    DELETE f FROM demonstracoes_fato f
+    JOIN contas cf ON cf.conta_id = f.conta_id
+    JOIN contas cg ON cg.conta = cf.conta AND cg.conta_id > cf.conta_id
+    JOIN demonstracoes_fato g ON g.conta_id = cg.conta_id AND g.periodo_id = f.periodo_id
+        AND g.registro_ans = f.registro_ans AND g.data = f.data
+    """)
+    cursor.execute("""
+    UPDATE demonstracoes_fato f
+    JOIN contas c ON c.conta_id = f.conta_id
+    JOIN contas_mantidas m ON m.conta = c.conta
+    SET f.conta_id = m.conta_id
+    WHERE f.conta_id <> m.conta_id
+    """)
+    cursor.execute("""
+    DELETE c FROM contas c JOIN contas_mantidas m ON m.conta = c.conta
+    WHERE c.conta_id <> m.conta_id
+    """)
+    cursor.execute("ALTER TABLE contas DROP INDEX uk_conta, ADD UNIQUE KEY uk_conta (conta)")
+    cursor.execute("DROP TEMPORARY TABLE contas_mantidas")
+    contas_cache.limpar()
+
+
+def criar_view(cursor):
+    """View com as colunas do layout clássico, usada por todas as leituras"""
+    cursor.execute("""
+    CREATE OR REPLACE VIEW demonstracoes_contabeis AS
+    SELECT f.data, f.registro_ans, c.conta, c.descricao, f.valor,
+           CONCAT(f.periodo_id % 10, 'T', f.periodo_id DIV 10) AS periodo,
+           f.categoria, f.periodo_id
+    FROM demonstracoes_fato f
+    JOIN contas c ON c.conta_id = f.conta_id
+    """)
+
+
+def garantir_particao(cursor, pid):
+    """Garante uma partição só do período.
+
+    A partição que hoje contém o período (a futura ou a de um período
+    posterior, se a carga vier fora de ordem) é dividida em duas. Como todo
+    período carregado tem partição própria, a nova só recebe linhas dele.
+    """
+    cursor.execute("""
+    SELECT partition_name, partition_description FROM information_schema.partitions
+    WHERE table_schema = DATABASE() AND table_name = %s
+    """, (TABELA_FATO,))
+    particoes = dict(cursor.fetchall())
+    if nome_particao(pid) in particoes:
+        return
+    limites = {
+        nome: float('inf') if descricao == 'MAXVALUE' else int(descricao)
+        for nome, descricao in particoes.items()
+    }
+    nome, limite = min(((n, l) for n, l in limites.items() if l > pid), key=lambda item: item[1])
+    limite_sql = 'MAXVALUE' if limite == float('inf') else f'({limite})'
+    cursor.execute(f"""
+    ALTER TABLE demonstracoes_fato REORGANIZE PARTITION {nome} INTO (
+        PARTITION {nome_particao(pid)} VALUES LESS THAN ({pid + 1}),
+        PARTITION {nome} VALUES LESS THAN {limite_sql}
+    )
+    """)
+
+
+def substituir_periodo(conn, periodo):
+    """Esvazia o período antes da recarga: TRUNCATE da partição, sem apagar linha a linha"""
+    pid = periodo_id(periodo)
+    cursor = conn.cursor()
+    try:
+        garantir_particao(cursor, pid)
+        cursor.execute("SELECT COUNT(*) FROM demonstracoes_fato WHERE periodo_id = %s", (pid,))
+        removidas = cursor.fetchone()[0]
+        if removidas:
+            cursor.execute(f"ALTER TABLE demonstracoes_fato TRUNCATE PARTITION {nome_particao(pid)}")
+        conn.commit()
+        return removidas
+    finally:
+        cursor.close()
+
+
+class CacheContas:
+    """conta_id e descrição de cada conta, compartilhados pelos gravadores.
+
+    Contas fora do cache (ou que chegam com outra descrição) são procuradas
+    no banco com uma leitura comum, sem travas. As que faltarem ou mudaram
+    de descrição são gravadas com upsert, em ordem de conta, numa transação
+    própria e confirmada na hora, e relidas depois dela. Assim gravadores
+    concorrentes que encontram a mesma conta chegam ao mesmo id, sem
+    segurar travas da dimensão enquanto gravam o lote do fato.
+    """
+
+    def __init__(self):
+        self._contas = {}
+        self._trava = threading.Lock()
+
+    def limpar(self):
+        with self._trava:
+            self._contas.clear()
+
+    def resolver(self, cursor, contas):
+        """Retorna {conta: conta_id} para as contas informadas ({conta: (descricao, categoria)})"""
+        with self._trava:
+            novas = {conta: dados for conta, dados in contas.items()
+                     if self._contas.get(conta, (None, None))[1] != dados[0]}
+        if novas:
+            encontradas = self._buscar(cursor, novas)
+            gravar = sorted(conta for conta, (descricao, _) in novas.items()
+                            if encontradas.get(conta, (None, None))[1] != descricao)
+            if gravar:
+                cursor.executemany("""
+                INSERT INTO contas (conta, descricao, categoria) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE descricao = VALUES(descricao), categoria = VALUES(categoria)
+                """, [(conta, *novas[conta]) for conta in gravar])
+                # A dimensão não espera o lote: a próxima leitura já vê as
+                # contas gravadas por qualquer gravador
+                cursor.execute("COMMIT")
+                encontradas.update(self._buscar(cursor, gravar))
+            with self._trava:
+                self._contas.update(encontradas)
+        with self._trava:
+            return {conta: self._contas[conta][0] for conta in contas}
+
+    @staticmethod
+    def _buscar(cursor, contas):
+        marcadores = ', '.join(['%s'] * len(contas))
+        cursor.execute(
+            f"SELECT conta, conta_id, descricao FROM contas WHERE conta IN ({marcadores})",
+            list(contas)
+        )
+        return {conta: (conta_id, descricao) for conta, conta_id, descricao in cursor.fetchall()}
+
+
+contas_cache = CacheContas()
+
+
+def inserir_lote(cursor, linhas):
+    """Grava linhas no formato de DEMONSTRACOES_INSERT_COLUMNS no fato particionado"""
+    contas = {}
+    for data, registro_ans, conta, descricao, valor, periodo, categoria in linhas:
+        contas[conta or ''] = (descricao or '', categoria)
+    try:
+        ids = contas_cache.resolver(cursor, contas)
+        cursor.executemany(INSERT_FATO_SQL, [
+            (periodo_id(periodo), registro_ans, ids[conta or ''], data, valor, categoria)
+            for data, registro_ans, conta, descricao, valor, periodo, categoria in linhas
+        ])
+    except Error:
+        # O lote será desfeito; o cache pode ter contas de uma dimensão que não foi gravada
+        contas_cache.limpar()
+        raise
+
+
+def reclassificar(cursor, classificar):
+    """Aplica novas regras de categoria na dimensão e propaga para o fato.
+
+    `classificar(pares)` recebe um DataFrame com conta e descricao e devolve
+    os códigos. Retorna a quantidade de contas reclassificadas.
+    """
+    import pandas as pd
+
+    cursor.execute("SELECT conta_id, conta, descricao FROM contas")
+    contas = pd.DataFrame(cursor.fetchall(), columns=['conta_id', 'conta', 'descricao'], dtype=object)
+    if contas.empty:
+        return 0
+    contas['categoria'] = classificar(contas)
+    cursor.executemany(
+        "UPDATE contas SET categoria = %s WHERE conta_id = %s",
+        [(int(categoria), int(conta_id)) for conta_id, categoria in zip(contas['conta_id'], contas['categoria'])]
+    )
+    cursor.execute("""
+    UPDATE demonstracoes_fato f JOIN contas c ON c.conta_id = f.conta_id
+    SET f.categoria = c.categoria
+    WHERE f.categoria <> c.categoria
+    """)
+    contas_cache.limpar()
+    return len(contas)
+
+
+def migrar(conn, compactar=False):
+    """Copia o layout clássico para o particionado e troca a tabela pela view.
+
+    A tabela antiga é mantida como `demonstracoes_contabeis_classica`; depois
+    de conferir os dados ela pode ser apagada com DROP TABLE.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT DISTINCT COALESCE(periodo, CONCAT(QUARTER(data), 'T', YEAR(data)))
+        FROM demonstracoes_contabeis WHERE data IS NOT NULL
+        """)
+        periodos = sorted(periodo_id(periodo) for (periodo,) in cursor.fetchall())
+
+        criar_tabelas(cursor, compactar)
+        for pid in periodos:
+            garantir_particao(cursor, pid)
+
+        # Uma linha por conta, com a descrição da linha gravada por último
+        cursor.execute("""
+        INSERT INTO contas (conta, descricao, categoria)
+        SELECT COALESCE(d.conta, ''), COALESCE(d.descricao, ''), d.categoria
+        FROM demonstracoes_contabeis d
+        JOIN (SELECT MAX(id) AS id FROM demonstracoes_contabeis GROUP BY COALESCE(conta, '')) u
+          ON u.id = d.id
+        """)
+        cursor.execute("""
+        INSERT INTO demonstracoes_fato (periodo_id, registro_ans, conta_id, data, valor, categoria)
+        SELECT CASE WHEN d.periodo IS NOT NULL
+                    THEN CAST(SUBSTRING(d.periodo, 3) AS UNSIGNED) * 10 + CAST(LEFT(d.periodo, 1) AS UNSIGNED)
+                    ELSE YEAR(d.data) * 10 + QUARTER(d.data) END,
+               d.registro_ans, c.conta_id, d.data, d.valor, d.categoria
+        FROM demonstracoes_contabeis d
+        JOIN contas c ON c.conta = COALESCE(d.conta, '')
+        WHERE d.data IS NOT NULL AND d.registro_ans IS NOT NULL
+        ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+        """)
+        migradas = cursor.rowcount
+        conn.commit()
+
+        # Só depois da cópia a tabela sai de cena e a view assume o nome
+        cursor.execute("RENAME TABLE demonstracoes_contabeis TO demonstracoes_contabeis_classica")
+        criar_view(cursor)
+        return migradas
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def tamanho_tabelas(cursor, tabelas):
+    """Bytes de dados e de índices de cada tabela, depois de atualizar as estatísticas"""
+    for tabela in tabelas:
+        cursor.execute(f"ANALYZE TABLE {tabela}")
+        cursor.fetchall()
+    marcadores = ', '.join(['%s'] * len(tabelas))
+    cursor.execute(f"""
+    SELECT table_name, data_length, index_length FROM information_schema.tables
+    WHERE table_schema = DATABASE() AND table_name IN ({marcadores})
+    """, list(tabelas))
+    return {nome: (dados or 0, indices or 0) for nome, dados, indices in cursor.fetchall()}
@@ -1,3 +1,5 @@
 SET GLOBAL max_allowed_packet=1073741824;
 SET GLOBAL innodb_buffer_pool_size=536870912;
-SET GLOBAL sql_mode=(SELECT REPLACE(@@sql_mode,'ONLY_FULL_GROUP_BY',''));
\ No newline at end of file
+SET GLOBAL sql_mode=(SELECT REPLACE(@@sql_mode,'ONLY_FULL_GROUP_BY',''));
+-- Permite o LOAD DATA LOCAL INFILE usado na carga em lote das operadoras
+SET PERSIST local_infile=1;
@@ -33,5 +33,56 @@ CREATE TABLE IF NOT EXISTS demonstracoes_contabeis (
     conta VARCHAR(100),
     descricao VARCHAR(255),
     valor DECIMAL(15,2),
-    FOREIGN KEY (registro_ans) REFERENCES operadoras(registro_ans)
+    periodo VARCHAR(20),
+    categoria TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    FOREIGN KEY (registro_ans) REFERENCES operadoras(registro_ans),
+    UNIQUE KEY uk_demonstracao (registro_ans, data, conta),
+    INDEX idx_periodo (periodo),
+    INDEX idx_categoria_periodo (categoria, periodo)
+);
+
+-- Layout alternativo (python teste3_bancoDeDados.py --layout particionado):
+-- fato demonstracoes_fato particionado por período, dimensão contas e uma
+-- view com o nome acima. É criado pelo script, ver layout_particionado.py
+
+-- Categorias definidas em regras_categorias.json (publicadas pelo script de carga)
+CREATE TABLE IF NOT EXISTS categorias_despesa (
+    codigo TINYINT UNSIGNED PRIMARY KEY,
+    nome VARCHAR(100) NOT NULL,
+    despesa BOOLEAN NOT NULL,
+    importar BOOLEAN NOT NULL
+);
+
+-- Totais pré-agregados por período, categoria e operadora (mantidos a cada carga)
+CREATE TABLE IF NOT EXISTS despesas_periodo (
+    periodo VARCHAR(20) NOT NULL,
+    registro_ans VARCHAR(20) NOT NULL,
+    ano SMALLINT NOT NULL,
+    categoria TINYINT UNSIGNED NOT NULL,
+    data_max DATE,
+    linhas INT NOT NULL,
+    total DECIMAL(18,2) NOT NULL,
+    PRIMARY KEY (periodo, categoria, registro_ans, ano),
+    INDEX idx_data_max (data_max)
+);
+
+-- Totais pré-agregados por ano, categoria e operadora
+CREATE TABLE IF NOT EXISTS despesas_ano (
+    ano SMALLINT NOT NULL,
+    registro_ans VARCHAR(20) NOT NULL,
+    categoria TINYINT UNSIGNED NOT NULL,
+    linhas INT NOT NULL,
+    total DECIMAL(18,2) NOT NULL,
+    PRIMARY KEY (ano, categoria, registro_ans)
+);
+
+-- Manifesto de cargas: hash, linhas e duração de cada arquivo importado
+CREATE TABLE IF NOT EXISTS cargas_arquivos (
+    arquivo VARCHAR(100) PRIMARY KEY,
+    periodo VARCHAR(20),
+    hash_sha256 CHAR(64) NOT NULL,
+    tamanho_bytes BIGINT,
+    linhas INT,
+    duracao_s DECIMAL(10,2),
+    carregado_em DATETIME
 );
\ No newline at end of file
@@ -1,56 +1,147 @@
+import argparse
+import hashlib
+import json
 import os
+import queue
+import re
+import sys
+import threading
+import time
+import numpy as np
 import pandas as pd
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
 import zipfile
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comum import metricas, parsers_br
+from comum.download import baixar_arquivo, baixar_arquivos
+
+import analise_colunar
+import layout_particionado
+
 # Configurações do banco de dados
 DB_CONFIG = {
-    'host': 'localhost',
-    'port': 3307,
-    'user': 'admin',
-    'password': 'admin123',
-    'database': 'ans_dados',
+    'host': os.environ.get('MYSQL_HOST', 'localhost'),
+    'port': int(os.environ.get('MYSQL_PORT', 3307)),
+    'user': os.environ.get('MYSQL_USER', 'admin'),
+    'password': os.environ.get('MYSQL_PASSWORD', 'admin123'),
+    'database': os.environ.get('MYSQL_DATABASE', 'ans_dados'),
     'auth_plugin': 'mysql_native_password'
 }
 
-def create_db_connection():
-    """Cria e retorna a conexão com o banco de dados"""
+# Arquivo da carga em lote das operadoras. Só a conexão dessa carga aceita
+# LOAD DATA LOCAL, e só de arquivos neste diretório (ver staging_options)
+DIRETORIO_STAGING = os.path.join("dados_ans", "staging")
+
+# Layout das demonstrações no banco: 'classico' (uma tabela) ou 'particionado'
+# (fato particionado por período + dimensão de contas, ver layout_particionado.py).
+# Definido por setup_database_tables a partir do que o banco já usa
+layout_demonstracoes = 'classico'
+
+# Leitura dos trimestres: 'direta' lê o CSV de dentro do ZIP baixado;
+# 'extrair' extrai o CSV em dados_ans e lê do disco
+leitura_trimestres = 'direta'
+
+# Latência de cada lote das demonstrações, por layout, e lotes desfeitos por erro
+LOTE_INSERCAO = metricas.registro.histograma(
+    'lote_insercao_segundos', 'Duração do INSERT de um lote de demonstrações', ['layout'])
+LOTES_COM_FALHA = metricas.registro.contador(
+    'lotes_com_falha_total', 'Lotes de demonstrações desfeitos por erro no banco')
+LOTES_REPETIDOS = metricas.registro.contador(
+    'lotes_repetidos_total', 'Lotes de demonstrações repetidos após deadlock ou espera de trava')
+
+# Erros do InnoDB em que o lote pode ser repetido inteiro: deadlock (1213)
+# e tempo de espera por trava esgotado (1205)
+ERROS_REPETIVEIS = (1213, 1205)
+TENTATIVAS_LOTE = 5
+
+def create_db_connection(**opcoes):
+    """Cria e retorna a conexão com o banco de dados (`opcoes` completam o DB_CONFIG)"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = mysql.connector.connect(**{**DB_CONFIG, **opcoes})
         print("Conexão com o banco estabelecida com sucesso")
         return conn
     except Error as e:
         print(f"Erro ao conectar ao MySQL: {e}")
         return None
 
+def staging_options():
+    """Opções da conexão da carga em lote: LOAD DATA LOCAL só de arquivos em DIRETORIO_STAGING.
+
+    As demais conexões não aceitam LOAD DATA LOCAL; assim um servidor
+    comprometido não consegue pedir outros arquivos da máquina.
+    """
+    caminho = os.path.abspath(DIRETORIO_STAGING)
+    os.makedirs(caminho, exist_ok=True)
+    return {'allow_local_infile_in_path': caminho}
+
+def create_connection_pool(size):
+    """Cria um pool de conexões para os gravadores do modo paralelo"""
+    return pooling.MySQLConnectionPool(
+        pool_name="ans_import",
+        pool_size=min(size, pooling.CNX_POOL_MAXSIZE),
+        **DB_CONFIG
+    )
+
 def download_file(url, save_path):
-    """Baixa um arquivo da URL e salva localmente"""
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        return True
-    except Exception as e:
-        print(f"Erro ao baixar {url}: {e}")
-        return False
+    """Baixa um arquivo da URL e salva localmente (com retomada e novas tentativas)"""
+    resultado = baixar_arquivo(url, save_path)
+    if not resultado.ok:
+        print(f"Erro ao baixar {url}: {resultado.erro}")
+    return resultado.ok
+
+def download_files(downloads, concorrencia=4):
+    """Baixa vários (url, destino) em paralelo; retorna {destino: resultado} de todos"""
+    resultados = {}
+    for resultado in baixar_arquivos(downloads, concorrencia=concorrencia):
+        if not resultado.ok:
+            print(f"Erro ao baixar {resultado.url}: {resultado.erro}")
+        resultados[resultado.destino] = resultado
+    return resultados
 
 def extract_zip(zip_path, extract_to):
     """Extrai arquivo ZIP para o diretório especificado"""
     try:
+        inicio = time.perf_counter()
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             zip_ref.extractall(extract_to)
+            extraidos = sum(info.file_size for info in zip_ref.infolist())
+        metricas.registrar_etapa('extracao_zip', time.perf_counter() - inicio, 1, bytes_=extraidos)
         return True
     except Exception as e:
         print(f"Erro ao extrair {zip_path}: {e}")
         return False
 
+def zip_csv_member(zip_ref):
+    """Nome do CSV dentro de um ZIP trimestral"""
+    membros = [nome for nome in zip_ref.namelist() if nome.lower().endswith('.csv')]
+    if not membros:
+        raise ValueError(f"Nenhum CSV dentro de {zip_ref.filename}")
+    return membros[0]
+
+def open_csv_source(path):
+    """Abre o CSV para leitura binária: o arquivo em disco ou, se `path` é um .zip,
+    o CSV de dentro dele, descompactado enquanto é lido"""
+    if not path.lower().endswith('.zip'):
+        return open(path, 'rb')
+    # O membro aberto continua válido depois que o ZipFile é fechado
+    with zipfile.ZipFile(path) as zip_ref:
+        return zip_ref.open(zip_csv_member(zip_ref))
+
+def csv_source_name(path):
+    """Nome do CSV de uma fonte ('dados_ans/1T2023.zip' -> '1T2023.csv'), usado no manifesto"""
+    return os.path.splitext(os.path.basename(path))[0] + '.csv'
+
+def csv_source_size(path):
+    """Tamanho do CSV descompactado, em bytes"""
+    if not path.lower().endswith('.zip'):
+        return os.path.getsize(path)
+    with zipfile.ZipFile(path) as zip_ref:
+        return zip_ref.getinfo(zip_csv_member(zip_ref)).file_size
+
 def check_table_structure(conn):
     """Verifica a estrutura atual da tabela operadoras"""
     try:
@@ -63,8 +154,294 @@ def check_table_structure(conn):
     except Error as e:
         print(f"Erro ao verificar estrutura da tabela: {e}")
 
-def setup_database_tables(conn):
-    """Cria as tabelas no banco de dados com tamanhos adequados"""
+# Regras de classificação das linhas em categorias. São a única definição
+# do critério: a carga grava o código da categoria e os relatórios filtram
+# por ele. Pode ser trocado pela variável REGRAS_CATEGORIAS
+REGRAS_CATEGORIAS_PATH = os.environ.get(
+    'REGRAS_CATEGORIAS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regras_categorias.json')
+)
+
+# Código das linhas que não casam com nenhuma regra
+CATEGORIA_OUTRAS = 0
+
+def normalize_text(textos):
+    """Maiúsculas e sem acentos, para comparar como o LIKE da collation padrão do MySQL"""
+    return (textos.astype(str).str.normalize('NFKD')
+            .str.encode('ascii', 'ignore').str.decode('ascii').str.upper())
+
+def load_category_rules(path=REGRAS_CATEGORIAS_PATH):
+    """Lê as regras de categoria (a primeira que casar vale) e valida os códigos"""
+    with open(path, encoding='utf-8') as arquivo:
+        regras = json.load(arquivo)
+    codigos = [regra['codigo'] for regra in regras]
+    if len(set(codigos)) != len(codigos) or not all(0 < codigo < 256 for codigo in codigos):
+        raise ValueError(f"{path}: os códigos das categorias devem ser únicos e estar entre 1 e 255")
+    for regra in regras:
+        termos = normalize_text(pd.Series(regra.get('termos', []), dtype=object))
+        regra['padrao'] = '|'.join(re.escape(termo) for termo in termos)
+        regra['contas'] = tuple(regra.get('contas', []))
+    return regras
+
+REGRAS_CATEGORIAS = load_category_rules()
+CATEGORIAS_DESPESA = [regra['codigo'] for regra in REGRAS_CATEGORIAS if regra.get('despesa')]
+CATEGORIAS_IMPORTADAS = [regra['codigo'] for regra in REGRAS_CATEGORIAS if regra.get('importar')]
+
+def classify_categorias(contas, descricoes, regras=REGRAS_CATEGORIAS):
+    """Código da categoria de cada linha, pela primeira regra que casar.
+
+    Uma regra casa quando a conta começa com um dos prefixos de `contas` e
+    a descrição contém um dos `termos` (lista vazia não restringe). O texto
+    é comparado uma vez por conta e por descrição distintas; nas linhas só
+    se combinam os resultados pelos códigos das categorias do pandas.
+    """
+    contas = contas.astype('category')
+    descricoes = descricoes.astype('category')
+    # O código -1 (nulo) indexa a última posição, que nunca casa
+    codigos_conta = contas.cat.codes.to_numpy()
+    codigos_descricao = descricoes.cat.codes.to_numpy()
+    valores_conta = contas.cat.categories.to_series().astype(str)
+    valores_descricao = normalize_text(descricoes.cat.categories.to_series())
+
+    resultado = np.full(len(contas), CATEGORIA_OUTRAS, dtype=np.uint8)
+    livres = np.ones(len(contas), dtype=bool)
+    for regra in regras:
+        casa = livres.copy()
+        if regra['contas']:
+            casa_conta = np.append(valores_conta.str.startswith(regra['contas']).to_numpy(dtype=bool), False)
+            casa &= casa_conta[codigos_conta]
+        if regra['padrao']:
+            casa_descricao = np.append(
+                valores_descricao.str.contains(regra['padrao'], regex=True).to_numpy(dtype=bool), False
+            )
+            casa &= casa_descricao[codigos_descricao]
+        resultado[casa] = regra['codigo']
+        livres &= ~casa
+    return resultado
+
+def sync_category_rules(conn, path=REGRAS_CATEGORIAS_PATH):
+    """Publica as categorias no banco e reclassifica tudo se as regras mudaram.
+
+    O hash do arquivo de regras fica no manifesto de cargas; com regras
+    novas, a reclassificação lê só os pares (conta, descrição) distintos e
+    atualiza as linhas com um único UPDATE, sem reler os CSVs. Linhas de
+    categorias que não eram importadas nunca chegaram ao banco: se alguma
+    categoria passou a ser importada, os trimestres saem do manifesto e são
+    recarregados na importação seguinte.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT codigo FROM categorias_despesa WHERE importar")
+    importadas_antes = {codigo for (codigo,) in cursor.fetchall()}
+    cursor.execute("DELETE FROM categorias_despesa")
+    cursor.executemany(
+        "INSERT INTO categorias_despesa (codigo, nome, despesa, importar) VALUES (%s, %s, %s, %s)",
+        [(CATEGORIA_OUTRAS, 'Outras', False, False)] +
+        [(r['codigo'], r['nome'], bool(r.get('despesa')), bool(r.get('importar'))) for r in REGRAS_CATEGORIAS]
+    )
+    conn.commit()
+
+    arquivo = os.path.basename(path)
+    regras_hash = file_sha256(path)
+    if load_manifest(conn).get(arquivo) == regras_hash:
+        return
+    
+    inicio = time.perf_counter()
+    novas = sorted(set(CATEGORIAS_IMPORTADAS) - importadas_antes)
+    if novas:
+        cursor.execute("DELETE FROM cargas_arquivos WHERE periodo IS NOT NULL")
+        conn.commit()
+        if cursor.rowcount:
+            print(f"Categorias {novas} passaram a ser importadas; "
+                  f"{cursor.rowcount} trimestres serão recarregados")
+    
+    if layout_demonstracoes == 'particionado':
+        # A categoria fica na dimensão de contas e é propagada para o fato
+        reclassificadas = layout_particionado.reclassificar(
+            cursor, lambda pares: classify_categorias(pares['conta'], pares['descricao'])
+        )
+        conn.commit()
+        if reclassificadas:
+            print(f"Regras de categoria alteradas; {reclassificadas} contas reclassificadas")
+            for periodo in loaded_periods(conn):
+                refresh_rollups(conn, periodo)
+        cursor.close()
+        record_manifest(conn, arquivo, None, regras_hash, path, len(REGRAS_CATEGORIAS), time.perf_counter() - inicio)
+        return
+    
+    cursor.execute("SELECT DISTINCT conta, descricao FROM demonstracoes_contabeis")
+    pares = pd.DataFrame(cursor.fetchall(), columns=['conta', 'descricao'], dtype=object)
+    if not pares.empty:
+        print(f"Regras de categoria alteradas; reclassificando {len(pares)} pares conta/descrição...")
+        pares['categoria'] = classify_categorias(pares['conta'], pares['descricao'])
+        # Os pares vão para uma tabela temporária indexada e um UPDATE com
+        # JOIN reclassifica tudo de uma vez, em vez de uma varredura por par
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS categorias_pares")
+        cursor.execute("""
+        CREATE TEMPORARY TABLE categorias_pares (
+            conta VARCHAR(100),
+            descricao VARCHAR(255),
+            categoria TINYINT UNSIGNED NOT NULL,
+            INDEX (conta, descricao)
+        )
+        """)
+        # O conector agrupa o executemany de INSERT em um único VALUES (...), (...)
+        cursor.executemany(
+            "INSERT INTO categorias_pares (conta, descricao, categoria) VALUES (%s, %s, %s)",
+            [(conta, descricao, int(c)) for conta, descricao, c in pares.itertuples(index=False)]
+        )
+        cursor.execute("""
+        UPDATE demonstracoes_contabeis d
+        JOIN categorias_pares p ON d.conta <=> p.conta AND d.descricao <=> p.descricao
+        SET d.categoria = p.categoria
+        WHERE d.categoria <> p.categoria
+        """)
+        cursor.execute("DROP TEMPORARY TABLE categorias_pares")
+        conn.commit()
+        for periodo in loaded_periods(conn):
+            refresh_rollups(conn, periodo)
+    cursor.close()
+    record_manifest(conn, arquivo, None, regras_hash, path, len(REGRAS_CATEGORIAS), time.perf_counter() - inicio)
+
+def refresh_rollups(conn, periodo):
+    """Recalcula os totais pré-agregados (por categoria) de um período e dos anos que ele toca.
+
+    Só as linhas do período são lidas (pelo índice de `periodo`, ou só a
+    partição do período no layout particionado); o total anual é refeito a
+    partir de despesas_periodo, que tem poucas linhas.
+    """
+    cursor = conn.cursor()
+    inicio = time.perf_counter()
+    try:
+        # Anos afetados: os que o período tinha antes e os que tem agora
+        cursor.execute("SELECT DISTINCT ano FROM despesas_periodo WHERE periodo = %s", (periodo,))
+        anos = {row[0] for row in cursor.fetchall()}
+        cursor.execute("DELETE FROM despesas_periodo WHERE periodo = %s", (periodo,))
+        if layout_demonstracoes == 'particionado':
+            # Coberto por idx_periodo_categoria, sem ler as linhas do fato
+            cursor.execute("""
+            INSERT INTO despesas_periodo
+            (periodo, registro_ans, ano, categoria, data_max, linhas, total)
+            SELECT %s, registro_ans, YEAR(data), categoria, MAX(data), COUNT(*), COALESCE(SUM(valor), 0)
+            FROM demonstracoes_fato
+            WHERE periodo_id = %s
+            GROUP BY registro_ans, YEAR(data), categoria
+            """, (periodo, layout_particionado.periodo_id(periodo)))
+        else:
+            cursor.execute("""
+            INSERT INTO despesas_periodo
+            (periodo, registro_ans, ano, categoria, data_max, linhas, total)
+            SELECT periodo, registro_ans, YEAR(data), categoria, MAX(data), COUNT(*), COALESCE(SUM(valor), 0)
+            FROM demonstracoes_contabeis
+            WHERE periodo = %s AND data IS NOT NULL
+            GROUP BY periodo, registro_ans, YEAR(data), categoria
+            """, (periodo,))
+        
+        cursor.execute("SELECT DISTINCT ano FROM despesas_periodo WHERE periodo = %s", (periodo,))
+        anos.update(row[0] for row in cursor.fetchall())
+        for ano in sorted(anos):
+            cursor.execute("DELETE FROM despesas_ano WHERE ano = %s", (ano,))
+            cursor.execute("""
+            INSERT INTO despesas_ano
+            (ano, registro_ans, categoria, linhas, total)
+            SELECT ano, registro_ans, categoria, SUM(linhas), SUM(total)
+            FROM despesas_periodo
+            WHERE ano = %s
+            GROUP BY ano, registro_ans, categoria
+            """, (ano,))
+        conn.commit()
+        metricas.registrar_etapa('rollups', time.perf_counter() - inicio, itens=1)
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def loaded_periods(conn):
+    """Períodos com linhas importadas, no formato '1T2023'"""
+    cursor = conn.cursor()
+    try:
+        if layout_demonstracoes == 'particionado':
+            cursor.execute("SELECT DISTINCT periodo_id FROM demonstracoes_fato")
+            return [layout_particionado.periodo_texto(pid) for (pid,) in cursor.fetchall()]
+        cursor.execute("SELECT DISTINCT periodo FROM demonstracoes_contabeis WHERE periodo IS NOT NULL")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def setup_classic_demonstracoes(cursor):
+    """Cria demonstracoes_contabeis no layout clássico e migra bancos antigos"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS demonstracoes_contabeis (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        data DATE,
+        registro_ans VARCHAR(20),
+        conta VARCHAR(100),
+        descricao VARCHAR(255),
+        valor DECIMAL(15,2),
+        periodo VARCHAR(20),
+        categoria TINYINT UNSIGNED NOT NULL DEFAULT 0,
+        FOREIGN KEY (registro_ans) REFERENCES operadoras(registro_ans),
+        UNIQUE KEY uk_demonstracao (registro_ans, data, conta),
+        INDEX idx_periodo (periodo),
+        INDEX idx_categoria_periodo (categoria, periodo),
+        INDEX (data),
+        INDEX (registro_ans),
+        INDEX (descricao)
+    )
+    """)
+    
+    # Bancos criados antes da chave natural: remove as linhas duplicadas
+    # pelas reimportações (fica a mais recente) e cria a chave
+    cursor.execute("""
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'demonstracoes_contabeis'
+      AND index_name = 'uk_demonstracao'
+    """)
+    if cursor.fetchone()[0] == 0:
+        print("Criando chave natural (registro_ans, data, conta) em demonstracoes_contabeis...")
+        cursor.execute("""
+        DELETE antiga FROM demonstracoes_contabeis antiga
+        JOIN demonstracoes_contabeis nova
+          ON nova.registro_ans = antiga.registro_ans
+         AND nova.data = antiga.data
+         AND nova.conta = antiga.conta
+         AND nova.id > antiga.id
+        """)
+        print(f"{cursor.rowcount} linhas duplicadas removidas")
+        cursor.execute("""
+        ALTER TABLE demonstracoes_contabeis
+            ADD UNIQUE KEY uk_demonstracao (registro_ans, data, conta),
+            ADD INDEX idx_periodo (periodo)
+        """)
+    
+    # Bancos criados antes da categoria: a coluna é criada zerada e o
+    # sync_category_rules abaixo classifica as linhas existentes
+    cursor.execute("""
+    SELECT column_name FROM information_schema.columns
+    WHERE table_schema = DATABASE()
+      AND table_name = 'demonstracoes_contabeis'
+      AND column_name IN ('categoria', 'despesa')
+    """)
+    colunas = {row[0].lower() for row in cursor.fetchall()}
+    if 'categoria' not in colunas:
+        print("Adicionando a coluna categoria em demonstracoes_contabeis...")
+        cursor.execute("""
+        ALTER TABLE demonstracoes_contabeis
+            ADD COLUMN categoria TINYINT UNSIGNED NOT NULL DEFAULT 0,
+            ADD INDEX idx_categoria_periodo (categoria, periodo)
+        """)
+    if 'despesa' in colunas:
+        cursor.execute("ALTER TABLE demonstracoes_contabeis DROP COLUMN despesa")
+
+def setup_database_tables(conn, layout=None, compactar=False):
+    """Cria as tabelas no banco de dados com tamanhos adequados.
+
+    `layout` escolhe o formato das demonstrações ('classico' ou
+    'particionado'); sem ele, vale o que o banco já usa. Pedir o particionado
+    num banco clássico migra os dados. `compactar` usa ROW_FORMAT=COMPRESSED
+    nas tabelas do layout particionado quando elas são criadas.
+    """
+    global layout_demonstracoes
     try:
         cursor = conn.cursor()
         
@@ -94,74 +471,227 @@ def setup_database_tables(conn):
         )
         """)
         
+        particionado = layout_particionado.existe_layout(cursor)
+        if particionado and layout == 'classico':
+            print("O banco já usa o layout particionado; mantendo-o "
+                  "(a tabela antiga está em demonstracoes_contabeis_classica)")
         cursor.execute("""
-        CREATE TABLE IF NOT EXISTS demonstracoes_contabeis (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            data DATE,
-            registro_ans VARCHAR(20),
-            conta VARCHAR(100),
-            descricao VARCHAR(255),
-            valor DECIMAL(15,2),
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = 'demonstracoes_contabeis'
+          AND table_type = 'BASE TABLE'
+        """)
+        tem_classica = cursor.fetchone()[0] > 0
+        if particionado or (layout == 'particionado' and not tem_classica):
+            layout_particionado.criar_tabelas(cursor, compactar)
+            layout_particionado.criar_view(cursor)
+            layout_demonstracoes = 'particionado'
+        else:
+            setup_classic_demonstracoes(cursor)
+            layout_demonstracoes = 'classico'
+            if layout == 'particionado':
+                conn.commit()
+                print("Migrando demonstracoes_contabeis para o layout particionado...")
+                inicio = time.perf_counter()
+                migradas = layout_particionado.migrar(conn, compactar)
+                layout_demonstracoes = 'particionado'
+                print(f"{migradas} linhas migradas em {time.perf_counter() - inicio:.1f}s")
+        
+        # Categorias publicadas a partir das regras, para consultas e relatórios
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categorias_despesa (
+            codigo TINYINT UNSIGNED PRIMARY KEY,
+            nome VARCHAR(100) NOT NULL,
+            despesa BOOLEAN NOT NULL,
+            importar BOOLEAN NOT NULL
+        )
+        """)
+        
+        # Totais pré-agregados lidos pelos relatórios, mantidos a cada carga;
+        # o layout antigo (sem categoria) é descartado e remontado
+        cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = 'despesas_periodo'
+          AND NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'despesas_periodo'
+              AND column_name = 'categoria'
+          )
+        """)
+        if cursor.fetchone()[0]:
+            cursor.execute("DROP TABLE despesas_periodo, despesas_ano")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS despesas_periodo (
+            periodo VARCHAR(20) NOT NULL,
+            registro_ans VARCHAR(20) NOT NULL,
+            ano SMALLINT NOT NULL,
+            categoria TINYINT UNSIGNED NOT NULL,
+            data_max DATE,
+            linhas INT NOT NULL,
+            total DECIMAL(18,2) NOT NULL,
+            PRIMARY KEY (periodo, categoria, registro_ans, ano),
+            INDEX idx_data_max (data_max)
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS despesas_ano (
+            ano SMALLINT NOT NULL,
+            registro_ans VARCHAR(20) NOT NULL,
+            categoria TINYINT UNSIGNED NOT NULL,
+            linhas INT NOT NULL,
+            total DECIMAL(18,2) NOT NULL,
+            PRIMARY KEY (ano, categoria, registro_ans)
+        )
+        """)
+        
+        # Manifesto de cargas: um registro por arquivo de origem importado
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cargas_arquivos (
+            arquivo VARCHAR(100) PRIMARY KEY,
             periodo VARCHAR(20),
-            FOREIGN KEY (registro_ans) REFERENCES operadoras(registro_ans),
-            INDEX (data),
-            INDEX (registro_ans),
-            INDEX (descricao)
+            hash_sha256 CHAR(64) NOT NULL,
+            tamanho_bytes BIGINT,
+            linhas INT,
+            duracao_s DECIMAL(10,2),
+            carregado_em DATETIME
         )
         """)
         
         conn.commit()
+        
+        # Categorias no banco; reclassifica as linhas se as regras mudaram
+        sync_category_rules(conn)
+        
+        # Dados importados antes dos totais pré-agregados
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM despesas_periodo), EXISTS(SELECT 1 FROM demonstracoes_contabeis)")
+        tem_totais, tem_dados = cursor.fetchone()
+        if tem_dados and not tem_totais:
+            periodos = loaded_periods(conn)
+            print(f"Montando totais pré-agregados de {len(periodos)} períodos...")
+            for periodo in periodos:
+                refresh_rollups(conn, periodo)
+        
         print("Tabelas criadas/verificadas com sucesso")
         return True
     except Error as e:
         print(f"Erro ao criar tabelas: {e}")
         return False
 
-def import_operadoras(conn):
-    """Importa dados das operadoras com tratamento completo"""
+def file_sha256(path, block_size=1 << 20):
+    """Calcula o SHA-256 do arquivo lendo em blocos (de um .zip, o do CSV de dentro)"""
+    sha = hashlib.sha256()
+    with open_csv_source(path) as arquivo:
+        for bloco in iter(lambda: arquivo.read(block_size), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def load_manifest(conn):
+    """Retorna {arquivo: hash} das cargas já concluídas"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT arquivo, hash_sha256 FROM cargas_arquivos")
+    manifest = dict(cursor.fetchall())
+    cursor.close()
+    return manifest
+
+def record_manifest(conn, arquivo, periodo, file_hash, file_path, linhas, duracao):
+    """Registra (ou substitui) a carga concluída de um arquivo"""
+    cursor = conn.cursor()
+    cursor.execute("""
+    INSERT INTO cargas_arquivos
+    (arquivo, periodo, hash_sha256, tamanho_bytes, linhas, duracao_s, carregado_em)
+    VALUES (%s, %s, %s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        periodo = VALUES(periodo),
+        hash_sha256 = VALUES(hash_sha256),
+        tamanho_bytes = VALUES(tamanho_bytes),
+        linhas = VALUES(linhas),
+        duracao_s = VALUES(duracao_s),
+        carregado_em = VALUES(carregado_em)
+    """, (arquivo, periodo, file_hash, os.path.getsize(file_path), linhas, round(duracao, 2)))
+    conn.commit()
+    cursor.close()
+
+# Colunas da tabela operadoras na ordem de inserção, com o tamanho máximo de cada campo
+OPERADORAS_COLUMNS = [
+    ('registro_ans', 20),
+    ('cnpj', 20),
+    ('razao_social', 255),
+    ('nome_fantasia', 255),
+    ('modalidade', 100),
+    ('logradouro', 255),
+    ('numero', 50),
+    ('complemento', 255),
+    ('bairro', 100),
+    ('cidade', 100),
+    ('uf', 2),
+    ('cep', 10),
+    ('ddd', 5),
+    ('telefone', 50),
+    ('fax', 50),
+    ('email', 100),
+    ('representante', 255),
+    ('cargo_representante', 100),
+    ('data_registro_ans', None),
+]
+
+OPERADORAS_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
+OPERADORAS_CSV = "dados_ans/operadoras_ativas.csv"
+
+def fetch_operadoras_csv():
+    """Atualiza o Relatorio_cadop com GET condicional; sem conexão, usa a cópia local"""
+    if not download_file(OPERADORAS_URL, OPERADORAS_CSV) and not os.path.exists(OPERADORAS_CSV):
+        return None
+    return OPERADORAS_CSV
+
+def read_operadoras_csv():
+    """Baixa (se preciso) e lê o Relatorio_cadop com as colunas no padrão do banco"""
+    file_path = OPERADORAS_CSV
+    if not os.path.exists(file_path):
+        if not download_file(OPERADORAS_URL, file_path):
+            return None
+    
+    # Ler o arquivo CSV com tratamento robusto
     try:
-        file_path = "dados_ans/operadoras_ativas.csv"
-        if not os.path.exists(file_path):
-            url = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
-            if not download_file(url, file_path):
-                return False
+        df = pd.read_csv(file_path, sep=';', encoding='latin1', dtype=str)
+        print(f"CSV lido com sucesso. Linhas: {len(df)}")
         
-        # Ler o arquivo CSV com tratamento robusto
-        try:
-            df = pd.read_csv(file_path, sep=';', encoding='latin1', dtype=str)
-            print(f"CSV lido com sucesso. Linhas: {len(df)}")
-            
-            # Padronizar nomes de colunas
-            df.columns = [col.strip().replace(' ', '_').lower() for col in df.columns]
-            print("Colunas encontradas:", df.columns.tolist())
-            
-            # Renomear colunas para padrão do banco
-            column_mapping = {
-                'registro_ans': 'registro_ans',
-                'cnpj': 'cnpj',
-                'razao_social': 'razao_social',
-                'nome_fantasia': 'nome_fantasia',
-                'modalidade': 'modalidade',
-                'logradouro': 'logradouro',
-                'numero': 'numero',
-                'complemento': 'complemento',
-                'bairro': 'bairro',
-                'cidade': 'cidade',
-                'uf': 'uf',
-                'cep': 'cep',
-                'ddd': 'ddd',
-                'telefone': 'telefone',
-                'fax': 'fax',
-                'endereco_eletronico': 'email',
-                'representante': 'representante',
-                'cargo_representante': 'cargo_representante',
-                'data_registro_ans': 'data_registro_ans'
-            }
-            
-            df = df.rename(columns=column_mapping)
-            
-        except Exception as e:
-            print(f"Falha ao processar CSV: {str(e)}")
+        # Padronizar nomes de colunas
+        df.columns = [col.strip().replace(' ', '_').lower() for col in df.columns]
+        print("Colunas encontradas:", df.columns.tolist())
+        
+        # Renomear colunas para padrão do banco
+        column_mapping = {
+            'registro_ans': 'registro_ans',
+            'cnpj': 'cnpj',
+            'razao_social': 'razao_social',
+            'nome_fantasia': 'nome_fantasia',
+            'modalidade': 'modalidade',
+            'logradouro': 'logradouro',
+            'numero': 'numero',
+            'complemento': 'complemento',
+            'bairro': 'bairro',
+            'cidade': 'cidade',
+            'uf': 'uf',
+            'cep': 'cep',
+            'ddd': 'ddd',
+            'telefone': 'telefone',
+            'fax': 'fax',
+            'endereco_eletronico': 'email',
+            'representante': 'representante',
+            'cargo_representante': 'cargo_representante',
+            'data_registro_ans': 'data_registro_ans'
+        }
+        
+        return df.rename(columns=column_mapping)
+        
+    except Exception as e:
+        print(f"Falha ao processar CSV: {str(e)}")
+        return None
+
+def import_operadoras(conn):
+    """Importa dados das operadoras com tratamento completo (linha a linha)"""
+    try:
+        df = read_operadoras_csv()
+        if df is None:
             return False
 
         # Função para ajustar campos
@@ -199,6 +729,10 @@ def import_operadoras(conn):
             data_registro_ans = VALUES(data_registro_ans)
         """
 
+        # Datas convertidas de uma vez, fora do laço
+        datas_registro = parsers_br.datas(df['data_registro_ans'], formatos=('%d/%m/%Y',)) \
+            if 'data_registro_ans' in df.columns else pd.Series(pd.NaT, index=df.index)
+
         cursor = conn.cursor()
         batch_size = 500
         total_rows = len(df)
@@ -231,8 +765,7 @@ def import_operadoras(conn):
                         ajustar_campo(row.get('email'), 100),
                         ajustar_campo(row.get('representante'), 255),
                         ajustar_campo(row.get('cargo_representante'), 100),
-                        pd.to_datetime(row.get('data_registro_ans'), format='%d/%m/%Y', errors='coerce').to_pydatetime()
-                        if not pd.isna(row.get('data_registro_ans')) else None
+                        datas_registro[_].to_pydatetime() if not pd.isna(datas_registro[_]) else None
                     )
                     batch_data.append(data_tuple)
                 except Exception as e:
@@ -257,12 +790,343 @@ def import_operadoras(conn):
         print(f"Erro fatal ao importar operadoras: {str(e)}")
         return False
 
-def import_demonstracoes(conn, anos=2):
-    """Importa dados das demonstrações contábeis para o banco de dados"""
+def clean_operadoras(df):
+    """Versão vetorizada do ajustar_campo: aplica as mesmas regras coluna a coluna.
+
+    Valores nulos ou '', 'nan', 'NaN' viram None; os demais são aparados e
+    truncados no tamanho da coluna. A data é convertida de uma vez só.
+    """
+    limpo = pd.DataFrame(index=df.index)
+    for coluna, tamanho in OPERADORAS_COLUMNS:
+        if coluna not in df.columns:
+            limpo[coluna] = None
+            continue
+        valores = df[coluna]
+        if tamanho is None:
+            datas = parsers_br.datas(valores, formatos=('%d/%m/%Y',))
+            limpo[coluna] = datas.dt.date.astype(object).where(datas.notna(), None)
+            continue
+        nulos = valores.isna() | valores.isin(['', 'nan', 'NaN'])
+        valores = valores.astype(str).str.strip().str.slice(0, tamanho)
+        limpo[coluna] = valores.astype(object).where(~nulos, None)
+    return limpo
+
+def _write_load_file(df, path):
+    """Grava o DataFrame no formato padrão do LOAD DATA (tab, \\N para nulo)"""
+    colunas = []
+    for coluna, tamanho in OPERADORAS_COLUMNS:
+        valores = df[coluna]
+        nulos = valores.isna()
+        texto = valores.astype(str)
+        if tamanho is not None:
+            texto = (texto.str.replace('\\', '\\\\', regex=False)
+                          .str.replace('\t', '\\t', regex=False)
+                          .str.replace('\n', '\\n', regex=False)
+                          .str.replace('\r', '\\r', regex=False))
+        colunas.append(texto.where(~nulos, '\\N'))
+    linhas = colunas[0].str.cat(colunas[1:], sep='\t')
+    with open(path, 'w', encoding='utf-8', newline='\n') as arquivo:
+        for inicio in range(0, len(linhas), 50000):
+            arquivo.write('\n'.join(linhas.iloc[inicio:inicio + 50000]))
+            arquivo.write('\n')
+
+def import_operadoras_bulk(conn):
+    """Importa as operadoras em lote: limpeza vetorizada, staging e um único upsert.
+
+    O arquivo limpo entra na tabela temporária via LOAD DATA LOCAL INFILE; se
+    o servidor ou a conexão (aberta sem `staging_options`) não permitirem,
+    cai para INSERTs de várias linhas. A coluna
+    `linha` da staging preserva a ordem do CSV, então em registros repetidos
+    vale o último, como no upsert linha a linha.
+    """
+    inicio = datetime.now()
+    os.makedirs(DIRETORIO_STAGING, exist_ok=True)
+    load_path = os.path.abspath(os.path.join(DIRETORIO_STAGING, "operadoras_staging.tsv"))
+    cursor = conn.cursor()
+    try:
+        df = read_operadoras_csv()
+        if df is None:
+            return False
+
+        df = clean_operadoras(df)
+        sem_registro = df['registro_ans'].isna()
+        if sem_registro.any():
+            print(f"{int(sem_registro.sum())} linhas sem registro_ans ignoradas")
+            df = df[~sem_registro]
+        print(f"Dados limpos em {(datetime.now() - inicio).total_seconds():.2f}s")
+
+        colunas = ', '.join(coluna for coluna, _ in OPERADORAS_COLUMNS)
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS operadoras_staging")
+        cursor.execute("CREATE TEMPORARY TABLE operadoras_staging AS SELECT * FROM operadoras LIMIT 0")
+        cursor.execute("ALTER TABLE operadoras_staging ADD COLUMN linha INT AUTO_INCREMENT PRIMARY KEY")
+
+        try:
+            _write_load_file(df, load_path)
+            cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE operadoras_staging
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({colunas})
+            """, (load_path,))
+            print(f"Staging carregada via LOAD DATA: {cursor.rowcount} linhas")
+        except Error as e:
+            print(f"LOAD DATA LOCAL indisponível ({e}); usando INSERT de várias linhas")
+            cursor.execute("TRUNCATE TABLE operadoras_staging")
+            marcadores = ', '.join(['%s'] * len(OPERADORAS_COLUMNS))
+            registros = df.values.tolist()
+            for i in range(0, len(registros), 5000):
+                # O conector agrupa o executemany de INSERT em um único VALUES (...), (...)
+                cursor.executemany(
+                    f"INSERT INTO operadoras_staging ({colunas}) VALUES ({marcadores})",
+                    registros[i:i + 5000]
+                )
+        finally:
+            if os.path.exists(load_path):
+                os.remove(load_path)
+
+        atualizacoes = ',\n            '.join(
+            f"{coluna} = VALUES({coluna})" for coluna, _ in OPERADORAS_COLUMNS[1:]
+        )
+        cursor.execute(f"""
+        INSERT INTO operadoras ({colunas})
+        SELECT {colunas} FROM operadoras_staging ORDER BY linha
+        ON DUPLICATE KEY UPDATE
+            {atualizacoes}
+        """)
+        conn.commit()
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS operadoras_staging")
+
+        duracao = (datetime.now() - inicio).total_seconds()
+        print(f"Importação em lote concluída: {len(df)} registros em {duracao:.2f}s")
+        return len(df) > 0
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro fatal ao importar operadoras em lote: {str(e)}")
+        return False
+
+def sync_operadoras(conn, importar, forcar=False):
+    """Importa o cadastro de operadoras só se o arquivo mudou desde a última carga"""
+    csv_path = fetch_operadoras_csv()
+    if csv_path is None:
+        return False
+    
+    arquivo = os.path.basename(csv_path)
+    file_hash = file_sha256(csv_path)
+    if not forcar and load_manifest(conn).get(arquivo) == file_hash:
+        print(f"{arquivo} não mudou desde a última carga; importação das operadoras pulada")
+        return True
+    
+    inicio = time.perf_counter()
+    if not importar(conn):
+        return False
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM operadoras")
+    linhas = cursor.fetchone()[0]
+    cursor.close()
+    duracao = time.perf_counter() - inicio
+    metricas.registrar_etapa('operadoras', duracao, 1, linhas, os.path.getsize(csv_path))
+    record_manifest(conn, arquivo, None, file_hash, csv_path, linhas, duracao)
+    return True
+
+# Origem dos ZIPs trimestrais (pode apontar para o comum/servidor_local em testes)
+DEMONSTRACOES_URL = os.environ.get(
+    'ANS_DEMONSTRACOES_URL', "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
+)
+
+# Colunas do CSV trimestral que são usadas, e o nome delas no banco
+DEMONSTRACOES_COLUMNS = {
+    'DATA': 'data',
+    'REG_ANS': 'registro_ans',
+    'CD_CONTA_CONTABIL': 'conta',
+    'DESCRICAO': 'descricao',
+    'VL_SALDO_FINAL': 'valor'
+}
+
+# Linhas lidas por vez dos CSVs trimestrais
+CHUNK_DEMONSTRACOES = 200_000
+
+# Colunas gravadas em demonstracoes_contabeis, na ordem do INSERT
+DEMONSTRACOES_INSERT_COLUMNS = ['data', 'registro_ans', 'conta', 'descricao', 'valor', 'periodo', 'categoria']
+
+INSERT_DEMONSTRACOES_SQL = """
+INSERT INTO demonstracoes_contabeis 
+(data, registro_ans, conta, descricao, valor, periodo, categoria) 
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    valor = VALUES(valor),
+    descricao = VALUES(descricao),
+    categoria = VALUES(categoria)
+"""
+
+def quarter_periods(anos=2):
+    """Lista os (ano, trimestre) a importar, sem trimestres futuros"""
+    current_year = datetime.now().year
+    years_to_process = list(range(max(2023, current_year - anos + 1), min(current_year, 2024) + 1))
+    return [
+        (year, quarter)
+        for year in years_to_process
+        for quarter in ['1T', '2T', '3T', '4T']
+        # Não processar trimestres futuros
+        if not (year == current_year and quarter > f"{(datetime.now().month - 1) // 3 + 1}T")
+    ]
+
+def quarter_download(year, quarter):
+    """Par (url, destino) do ZIP do trimestre"""
+    return f"{DEMONSTRACOES_URL}{year}/{quarter}{year}.zip", f"dados_ans/{quarter}{year}.zip"
+
+def extract_quarter_csv(year, quarter, resultado):
+    """Caminho de onde o CSV do trimestre será lido.
+
+    O ZIP fica em dados_ans para que o próximo download seja condicional
+    (ETag/Last-Modified): um trimestre sem mudanças não é baixado de novo.
+    Na leitura 'direta' o próprio ZIP é a fonte e o CSV é descompactado
+    enquanto é lido, sem arquivo intermediário. Na leitura 'extrair' o CSV é
+    extraído se o ZIP mudou ou se ainda não existe; se o download falhar, o
+    CSV já extraído continua valendo.
+    """
+    csv_path = f"dados_ans/{quarter}{year}.csv"
+    _, zip_path = quarter_download(year, quarter)
+    if leitura_trimestres == 'direta' and zipfile.is_zipfile(zip_path):
+        # Um CSV extraído por uma execução anterior só ocuparia espaço
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+        return zip_path
+    if resultado is not None and resultado.ok and os.path.exists(zip_path):
+        if resultado.status != 'inalterado' or not os.path.exists(csv_path):
+            if not extract_zip(zip_path, "dados_ans"):
+                return None
+    return csv_path if os.path.exists(csv_path) else None
+
+def quarter_disk_usage(year, quarter):
+    """Espaço ocupado pelo trimestre em dados_ans: 'ZIP 12.3 MB + CSV 250.1 MB'"""
+    partes = []
+    for rotulo, caminho in (("ZIP", f"dados_ans/{quarter}{year}.zip"), ("CSV", f"dados_ans/{quarter}{year}.csv")):
+        if os.path.exists(caminho):
+            partes.append(f"{rotulo} {os.path.getsize(caminho) / 2**20:.1f} MB")
+    return " + ".join(partes) or "nada"
+
+def replace_period(conn, periodo):
+    """Apaga as linhas de um período antes de recarregá-lo a partir de um arquivo alterado"""
+    if layout_demonstracoes == 'particionado':
+        return layout_particionado.substituir_periodo(conn, periodo)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM demonstracoes_contabeis WHERE periodo = %s", (periodo,))
+    removidas = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    return removidas
+
+def insert_demonstracoes(cursor, rows):
+    """Grava um lote de linhas (na ordem de DEMONSTRACOES_INSERT_COLUMNS) no layout em uso"""
+    with LOTE_INSERCAO.cronometrar(layout=layout_demonstracoes):
+        if layout_demonstracoes == 'particionado':
+            layout_particionado.inserir_lote(cursor, rows)
+        else:
+            cursor.executemany(INSERT_DEMONSTRACOES_SQL, rows)
+
+def commit_batch(conn, cursor, rows):
+    """Grava e confirma um lote; em deadlock ou espera de trava, desfaz e tenta de novo"""
+    for tentativa in range(TENTATIVAS_LOTE):
+        try:
+            insert_demonstracoes(cursor, rows)
+            conn.commit()
+            return
+        except Error as e:
+            conn.rollback()
+            if e.errno not in ERROS_REPETIVEIS or tentativa == TENTATIVAS_LOTE - 1:
+                raise
+            LOTES_REPETIDOS.inc()
+            time.sleep(0.05 * 2 ** tentativa)
+
+def map_demonstracoes_columns(csv_path):
+    """Lê só o cabeçalho do CSV e retorna ({coluna original: nome no banco}, colunas ausentes)"""
+    with open_csv_source(csv_path) as arquivo:
+        cabecalho = pd.read_csv(arquivo, sep=';', encoding='latin1', nrows=0).columns
+    originais = {col.strip().upper(): col for col in cabecalho}
+    renomear = {originais[col]: nome for col, nome in DEMONSTRACOES_COLUMNS.items() if col in originais}
+    missing_cols = [nome for col, nome in DEMONSTRACOES_COLUMNS.items() if col not in originais]
+    return renomear, missing_cols
+
+def iter_demonstracoes(csv_path, renomear, periodo, operadoras_existentes, chunksize=CHUNK_DEMONSTRACOES):
+    """Lê o CSV trimestral em blocos e gera só as linhas que serão importadas.
+
+    Apenas as colunas usadas são lidas, e as repetitivas (operadora, conta,
+    descrição, data) chegam como categorias, então os filtros comparam
+    poucos valores distintos por bloco. Cada linha é classificada pelas
+    REGRAS_CATEGORIAS e só seguem as categorias marcadas para importação.
+    Datas e valores só são convertidos nas linhas que sobraram. A memória
+    fica limitada ao tamanho do bloco, seja qual for o tamanho do arquivo.
+    `csv_path` também pode ser o ZIP do trimestre (ver open_csv_source).
+    """
+    categorias = {col: 'category' for col, nome in renomear.items() if nome != 'valor'}
+    categorias.update({col: str for col, nome in renomear.items() if nome == 'valor'})
+    operadoras = list(operadoras_existentes)
+    with open_csv_source(csv_path) as arquivo, pd.read_csv(
+        arquivo, sep=';', encoding='latin1',
+        usecols=list(renomear), dtype=categorias, chunksize=chunksize
+    ) as leitor:
+        for chunk in leitor:
+            chunk = chunk.rename(columns=renomear)
+            chunk = chunk[chunk['registro_ans'].isin(operadoras)]
+            if chunk.empty:
+                continue
+            chunk = chunk.assign(categoria=classify_categorias(chunk['conta'], chunk['descricao']))
+            chunk = chunk[chunk['categoria'].isin(CATEGORIAS_IMPORTADAS)]
+            if chunk.empty:
+                continue
+            
+            # Converter dados (as categorias voltam a texto comum para o insert)
+            df = chunk.astype({'registro_ans': object, 'conta': object, 'descricao': object})
+            # Data categórica: só as datas distintas são convertidas. O valor
+            # vira centavos exatos (malformado = nulo) e volta a reais em float
+            df['data'] = parsers_br.datas(chunk['data'])
+            df['valor'] = parsers_br.centavos_para_float(parsers_br.centavos(chunk['valor']))
+            df['periodo'] = periodo
+            df['categoria'] = chunk['categoria'].astype(object)
+            df = df[df['data'].notna() & df['valor'].notna()]
+            if not df.empty:
+                yield df
+
+def load_quarter_file(conn, csv_path, renomear, periodo, operadoras_existentes, batch_size=1000):
+    """Grava as linhas importáveis de um CSV trimestral em lotes.
+
+    Retorna (linhas gravadas, lotes com falha); um lote com erro é desfeito
+    e a carga segue com os próximos.
+    """
+    cursor = conn.cursor()
+    csv_filename = csv_source_name(csv_path)
+    file_imported = 0
+    falhas = 0
+    try:
+        for df in iter_demonstracoes(csv_path, renomear, periodo, operadoras_existentes):
+            for i in range(0, len(df), batch_size):
+                batch = df.iloc[i:i + batch_size]
+                data_to_insert = batch[DEMONSTRACOES_INSERT_COLUMNS].values.tolist()
+                
+                try:
+                    commit_batch(conn, cursor, data_to_insert)
+                    file_imported += len(data_to_insert)
+                except Error as e:
+                    conn.rollback()
+                    falhas += 1
+                    LOTES_COM_FALHA.inc()
+                    print(f"Erro no lote {i//batch_size + 1}: {str(e)}")
+                    continue
+            print(f"Progresso: {file_imported} registros de {csv_filename}")
+    finally:
+        cursor.close()
+    return file_imported, falhas
+
+def import_demonstracoes(conn, anos=2, forcar=False):
+    """Importa dados das demonstrações contábeis para o banco de dados.
+
+    Trimestres cujo CSV tem o mesmo hash da última carga são pulados; os que
+    mudaram têm o período apagado e recarregado. O manifesto só é gravado
+    quando todos os lotes entram, então uma carga interrompida é refeita.
+    """
     try:
-        base_url = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
-        current_year = datetime.now().year
-        
         # 1. Primeiro verificamos quais operadoras existem no banco
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT registro_ans FROM operadoras")
@@ -274,114 +1138,355 @@ def import_demonstracoes(conn, anos=2):
 
         # 2. Processar arquivos por ano e trimestre
         total_imported = 0
-        years_to_process = list(range(max(2023, current_year - anos + 1), min(current_year, 2024) + 1))
+        concluidos = 0
+        periodos = quarter_periods(anos)
+        manifest = load_manifest(conn)
+
+        # Baixar de uma vez, em paralelo; ZIPs sem mudança no servidor respondem 304
+        resultados = download_files([quarter_download(year, quarter) for year, quarter in periodos])
         
-        for year in years_to_process:
-            for quarter in ['1T', '2T', '3T', '4T']:
-                # Não processar trimestres futuros
-                if year == current_year and quarter > f"{(datetime.now().month - 1) // 3 + 1}T":
+        for year, quarter in periodos:
+            csv_filename = f"{quarter}{year}.csv"
+            _, zip_path = quarter_download(year, quarter)
+            inicio_trimestre = time.perf_counter()
+            csv_path = extract_quarter_csv(year, quarter, resultados.get(zip_path))
+            if csv_path is None:
+                continue
+            
+            # Processar arquivo CSV em blocos, já filtrados
+            try:
+                periodo = f"{quarter}{year}"
+                file_hash = file_sha256(csv_path)
+                if not forcar and manifest.get(csv_filename) == file_hash:
+                    print(f"Arquivo {csv_filename} não mudou desde a última carga; pulando")
+                    concluidos += 1
                     continue
                 
-                csv_filename = f"{quarter}{year}.csv"
-                csv_path = f"dados_ans/{csv_filename}"
+                renomear, missing_cols = map_demonstracoes_columns(csv_path)
+                if missing_cols:
+                    print(f"Arquivo {csv_filename} não contém colunas: {missing_cols}")
+                    continue
                 
-                # Baixar arquivo se não existir
-                if not os.path.exists(csv_path):
-                    zip_filename = f"{quarter}{year}.zip"
-                    url = f"{base_url}{year}/{zip_filename}"
-                    if not download_file(url, f"dados_ans/{zip_filename}"):
-                        continue
-                    if not extract_zip(f"dados_ans/{zip_filename}", "dados_ans"):
-                        continue
-                    os.remove(f"dados_ans/{zip_filename}")
+                inicio = time.perf_counter()
+                removidas = replace_period(conn, periodo)
+                if removidas:
+                    print(f"Período {periodo}: {removidas} registros antigos removidos")
                 
-                # Processar arquivo CSV
-                try:
-                    df = pd.read_csv(csv_path, sep=';', encoding='latin1', dtype=str)
-                    df.columns = [col.strip().upper() for col in df.columns]
-                    
-                    # Mapeamento de colunas
-                    column_map = {
-                        'data': 'DATA',
-                        'registro_ans': 'REG_ANS',
-                        'conta': 'CD_CONTA_CONTABIL',
-                        'descricao': 'DESCRICAO',
-                        'valor': 'VL_SALDO_FINAL'
-                    }
-                    
-                    # Verificar colunas
-                    missing_cols = [k for k, v in column_map.items() if v not in df.columns]
-                    if missing_cols:
-                        print(f"Arquivo {csv_filename} não contém colunas: {missing_cols}")
-                        continue
-                    
-                    df = df.rename(columns={v: k for k, v in column_map.items()})
-                    
-                    # Converter dados
-                    df['data'] = pd.to_datetime(df['data'], format='%Y-%m-%d', errors='coerce')
-                    df['valor'] = pd.to_numeric(
-                        df['valor'].str.replace('.', '').str.replace(',', '.'), 
-                        errors='coerce'
-                    )
-                    df['periodo'] = f"{quarter}{year}"
-                    
-                    # Filtrar apenas registros válidos e de operadoras existentes
-                    df = df[
-                        df['registro_ans'].isin(operadoras_existentes) &
-                        df['descricao'].str.contains('EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS', case=False, na=False) &
-                        df['data'].notna() &
-                        df['valor'].notna()
-                    ]
-                    
-                    # Inserir em lotes
-                    batch_size = 1000
-                    for i in range(0, len(df), batch_size):
-                        batch = df.iloc[i:i + batch_size]
-                        data_to_insert = batch[['data', 'registro_ans', 'conta', 'descricao', 'valor', 'periodo']].values.tolist()
-                        
-                        insert_sql = """
-                        INSERT INTO demonstracoes_contabeis 
-                        (data, registro_ans, conta, descricao, valor, periodo) 
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON DUPLICATE KEY UPDATE
-                            valor = VALUES(valor),
-                            descricao = VALUES(descricao)
-                        """
-                        
-                        try:
-                            cursor.executemany(insert_sql, data_to_insert)
-                            conn.commit()
-                            imported = len(data_to_insert)
-                            total_imported += imported
-                            print(f"Progresso: {min(i + batch_size, len(df))}/{len(df)} registros")
-                        except Error as e:
-                            conn.rollback()
-                            print(f"Erro no lote {i//batch_size + 1}: {str(e)}")
-                            continue
-                    
-                    print(f"Arquivo {csv_filename}: {len(df)} registros importados")
-                    
-                except Exception as e:
-                    conn.rollback()
-                    print(f"Erro ao processar {csv_filename}: {str(e)}")
-                    continue
+                file_imported, falhas = load_quarter_file(conn, csv_path, renomear, periodo,
+                                                          operadoras_existentes)
+                total_imported += file_imported
+                metricas.registrar_etapa('demonstracoes', time.perf_counter() - inicio, 1,
+                                         file_imported, csv_source_size(csv_path))
+                print(f"Arquivo {csv_filename}: {file_imported} registros importados em "
+                      f"{time.perf_counter() - inicio_trimestre:.1f}s (disco: {quarter_disk_usage(year, quarter)})")
+                refresh_rollups(conn, periodo)
+                if not falhas:
+                    record_manifest(conn, csv_filename, periodo, file_hash, csv_path,
+                                    file_imported, time.perf_counter() - inicio)
+                    concluidos += 1
+                
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao processar {csv_filename}: {str(e)}")
+                continue
         
         print(f"\nTotal de registros importados: {total_imported}")
-        return total_imported > 0
+        return concluidos > 0
         
     except Exception as e:
         conn.rollback()
         print(f"Erro fatal: {str(e)}")
         return False
 
+class StageStats:
+    """Contadores de uma etapa do pipeline, atualizados por várias threads"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.start = None
+        self.end = None
+        self._lock = threading.Lock()
+
+    def record(self, started, items=1, rows=0, nbytes=0):
+        """Registra um item que começou em `started` (time.perf_counter) e acabou agora"""
+        finished = time.perf_counter()
+        with self._lock:
+            self.items += items
+            self.rows += rows
+            self.bytes += nbytes
+            self.busy += finished - started
+            self.start = started if self.start is None else min(self.start, started)
+            self.end = finished if self.end is None else max(self.end, finished)
+        metricas.registrar_etapa(f"pipeline_{self.name}", finished - started, items, rows, nbytes)
+
+    def report(self):
+        elapsed = (self.end - self.start) if self.start is not None else 0.0
+        taxa = f"{self.rows / elapsed:,.0f} linhas/s" if elapsed else "-"
+        if self.bytes and elapsed:
+            taxa += f", {self.bytes / 2**20 / elapsed:,.1f} MB/s"
+        return (f"{self.name:<9} {self.items:>6} itens {self.rows:>10} linhas "
+                f"{self.bytes / 2**20:>9.1f} MB  {elapsed:>7.2f}s  ({taxa}; ocupado {self.busy:.2f}s)")
+
+def import_demonstracoes_pipeline(conn, anos=2, paralelismo=4, batch_size=1000, forcar=False):
+    """Importa os trimestres com download, leitura e gravação sobrepostos.
+
+    Cada etapa tem `paralelismo` threads: downloads (já extraindo o ZIP),
+    leitores que filtram o CSV em blocos e gravadores que inserem os lotes,
+    cada um com sua conexão do pool. A fila entre leitura e gravação é
+    limitada, então a leitura espera o banco e a memória não cresce.
+
+    Como no modo sequencial, arquivos sem mudança desde a última carga são
+    pulados e os alterados substituem o período inteiro; o manifesto é
+    gravado no fim, para os arquivos cujos lotes entraram todos.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT registro_ans FROM operadoras")
+        operadoras_existentes = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+        if not operadoras_existentes:
+            print("Nenhuma operadora encontrada no banco. Importe as operadoras primeiro.")
+            return False
+
+        periodos = quarter_periods(anos)
+        manifest = load_manifest(conn)
+        # Conexões obtidas antes de iniciar as threads: falha cedo se o pool não atender
+        pool = create_connection_pool(paralelismo)
+        writer_conns = [pool.get_connection() for _ in range(paralelismo)]
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro fatal: {str(e)}")
+        return False
+
+    stats = {name: StageStats(name) for name in ("download", "leitura", "gravacao")}
+    arquivos = queue.Queue()
+    lotes = queue.Queue(maxsize=paralelismo * 2)
+    # Situação de cada arquivo em carga: enviados pelo leitor x gravados
+    cargas = {}
+    pulados = []
+    cargas_lock = threading.Lock()
+    # A conexão principal só é usada, sob trava, para apagar períodos alterados
+    conn_lock = threading.Lock()
+    inicio = time.perf_counter()
+
+    def baixar(year, quarter):
+        started = time.perf_counter()
+        url, zip_path = quarter_download(year, quarter)
+        resultado = baixar_arquivo(url, zip_path)
+        if not resultado.ok:
+            print(f"Erro ao baixar {url}: {resultado.erro}")
+        elif resultado.status != 'inalterado':
+            # Respostas 304 não contam na vazão
+            stats["download"].record(started, nbytes=resultado.bytes_recebidos)
+        return extract_quarter_csv(year, quarter, resultado), f"{quarter}{year}"
+
+    def ler():
+        while (item := arquivos.get()) is not None:
+            csv_path, periodo = item
+            csv_filename = csv_source_name(csv_path)
+            try:
+                started = time.perf_counter()
+                file_hash = file_sha256(csv_path)
+                if not forcar and manifest.get(csv_filename) == file_hash:
+                    print(f"Arquivo {csv_filename} não mudou desde a última carga; pulando")
+                    with cargas_lock:
+                        pulados.append(csv_filename)
+                    continue
+                renomear, missing_cols = map_demonstracoes_columns(csv_path)
+                if missing_cols:
+                    print(f"Arquivo {csv_filename} não contém colunas: {missing_cols}")
+                    continue
+                carga = {"periodo": periodo, "hash": file_hash, "path": csv_path, "inicio": started,
+                         "enviados": 0, "gravados": 0, "falhas": 0, "lido": False}
+                with cargas_lock:
+                    cargas[csv_filename] = carga
+                with conn_lock:
+                    removidas = replace_period(conn, periodo)
+                if removidas:
+                    print(f"Período {periodo}: {removidas} registros antigos removidos")
+                enviados = 0
+                for df in iter_demonstracoes(csv_path, renomear, periodo, operadoras_existentes):
+                    for i in range(0, len(df), batch_size):
+                        batch = df.iloc[i:i + batch_size]
+                        rows = batch[DEMONSTRACOES_INSERT_COLUMNS].values.tolist()
+                        # O tempo parado esperando os gravadores não conta como leitura
+                        stats["leitura"].record(started, items=0, rows=len(rows))
+                        with cargas_lock:
+                            carga["enviados"] += len(rows)
+                        lotes.put((csv_filename, rows))
+                        started = time.perf_counter()
+                        enviados += len(rows)
+                stats["leitura"].record(started, nbytes=csv_source_size(csv_path))
+                carga["lido"] = True
+                print(f"Arquivo {csv_filename}: {enviados} registros enviados para gravação em "
+                      f"{time.perf_counter() - carga['inicio']:.1f}s "
+                      f"(disco: {quarter_disk_usage(periodo[2:], periodo[:2])})")
+            except Exception as e:
+                print(f"Erro ao processar {csv_filename}: {str(e)}")
+
+    def gravar(writer_conn):
+        writer_cursor = writer_conn.cursor()
+        while (item := lotes.get()) is not None:
+            csv_filename, rows = item
+            started = time.perf_counter()
+            try:
+                commit_batch(writer_conn, writer_cursor, rows)
+                stats["gravacao"].record(started, rows=len(rows))
+                with cargas_lock:
+                    cargas[csv_filename]["gravados"] += len(rows)
+            except Exception as e:
+                writer_conn.rollback()
+                LOTES_COM_FALHA.inc()
+                with cargas_lock:
+                    cargas[csv_filename]["falhas"] += 1
+                print(f"Erro em lote de {csv_filename}: {str(e)}")
+        writer_cursor.close()
+
+    leitores = [threading.Thread(target=ler, name=f"leitor-{n}") for n in range(paralelismo)]
+    gravadores = [threading.Thread(target=gravar, args=(c,), name=f"gravador-{n}")
+                  for n, c in enumerate(writer_conns)]
+    for thread in leitores + gravadores:
+        thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=paralelismo, thread_name_prefix="download") as executor:
+            futuros = [executor.submit(baixar, year, quarter) for year, quarter in periodos]
+            # Cada trimestre segue para a leitura assim que fica pronto
+            for futuro in as_completed(futuros):
+                try:
+                    csv_path, periodo = futuro.result()
+                except Exception as e:
+                    print(f"Erro ao baixar trimestre: {str(e)}")
+                    continue
+                if csv_path:
+                    arquivos.put((csv_path, periodo))
+    finally:
+        for _ in leitores:
+            arquivos.put(None)
+        for thread in leitores:
+            thread.join()
+        for _ in gravadores:
+            lotes.put(None)
+        for thread in gravadores:
+            thread.join()
+        for writer_conn in writer_conns:
+            writer_conn.close()
+
+    concluidos = len(pulados)
+    for csv_filename, carga in cargas.items():
+        try:
+            refresh_rollups(conn, carga["periodo"])
+        except Error as e:
+            print(f"Erro ao atualizar os totais de {carga['periodo']}: {str(e)}")
+            continue
+        if carga["lido"] and not carga["falhas"] and carga["gravados"] == carga["enviados"]:
+            record_manifest(conn, csv_filename, carga["periodo"], carga["hash"], carga["path"],
+                            carga["gravados"], time.perf_counter() - carga["inicio"])
+            concluidos += 1
+
+    total_imported = stats["gravacao"].rows
+    print(f"\nVazão por etapa (paralelismo {paralelismo}):")
+    for etapa in stats.values():
+        print(etapa.report())
+    print(f"\nTotal de registros importados: {total_imported} em {time.perf_counter() - inicio:.2f}s")
+    return concluidos > 0
+
+def sync_operadoras_parquet(forcar=False, diretorio=analise_colunar.DIRETORIO_PARQUET):
+    """Grava o cadastro limpo de operadoras em Parquet, se o arquivo mudou desde a última carga"""
+    csv_path = fetch_operadoras_csv()
+    if csv_path is None:
+        return False
+    
+    arquivo = os.path.basename(csv_path)
+    file_hash = file_sha256(csv_path)
+    if not forcar and analise_colunar.carregar_manifesto(diretorio).get(arquivo) == file_hash:
+        print(f"{arquivo} não mudou desde a última carga; operadoras em Parquet mantidas")
+        return True
+    
+    inicio = time.perf_counter()
+    df = read_operadoras_csv()
+    if df is None:
+        return False
+    linhas = analise_colunar.gravar_operadoras(clean_operadoras(df), diretorio)
+    print(f"{linhas} operadoras gravadas em Parquet")
+    duracao = time.perf_counter() - inicio
+    metricas.registrar_etapa('operadoras', duracao, 1, linhas, os.path.getsize(csv_path))
+    analise_colunar.registrar_carga(arquivo, None, file_hash, csv_path, linhas, duracao, diretorio)
+    return True
+
+def import_demonstracoes_parquet(anos=2, forcar=False, diretorio=analise_colunar.DIRETORIO_PARQUET):
+    """Grava as demonstrações em Parquet, uma partição por ano/trimestre.
+
+    Mesma leitura em blocos e mesmo manifesto incremental da carga no MySQL:
+    trimestres com o CSV inalterado são pulados e os alterados têm a
+    partição inteira substituída.
+    """
+    operadoras_existentes = analise_colunar.ler_registros_operadoras(diretorio)
+    if not operadoras_existentes:
+        print("Nenhuma operadora encontrada em Parquet. Importe as operadoras primeiro.")
+        return False
+    
+    total_imported = 0
+    concluidos = 0
+    periodos = quarter_periods(anos)
+    manifest = analise_colunar.carregar_manifesto(diretorio)
+    resultados = download_files([quarter_download(year, quarter) for year, quarter in periodos])
+    
+    for year, quarter in periodos:
+        csv_filename = f"{quarter}{year}.csv"
+        _, zip_path = quarter_download(year, quarter)
+        inicio_trimestre = time.perf_counter()
+        csv_path = extract_quarter_csv(year, quarter, resultados.get(zip_path))
+        if csv_path is None:
+            continue
+        
+        try:
+            periodo = f"{quarter}{year}"
+            file_hash = file_sha256(csv_path)
+            if not forcar and manifest.get(csv_filename) == file_hash:
+                print(f"Arquivo {csv_filename} não mudou desde a última carga; pulando")
+                concluidos += 1
+                continue
+            
+            renomear, missing_cols = map_demonstracoes_columns(csv_path)
+            if missing_cols:
+                print(f"Arquivo {csv_filename} não contém colunas: {missing_cols}")
+                continue
+            
+            inicio = time.perf_counter()
+            blocos = iter_demonstracoes(csv_path, renomear, periodo, operadoras_existentes)
+            linhas = analise_colunar.gravar_trimestre(blocos, year, int(quarter[0]), diretorio)
+            total_imported += linhas
+            print(f"Arquivo {csv_filename}: {linhas} registros gravados em Parquet em "
+                  f"{time.perf_counter() - inicio_trimestre:.1f}s (disco: {quarter_disk_usage(year, quarter)})")
+            duracao = time.perf_counter() - inicio
+            metricas.registrar_etapa('demonstracoes', duracao, 1, linhas, csv_source_size(csv_path))
+            analise_colunar.registrar_carga(csv_filename, periodo, file_hash, csv_path, linhas,
+                                            duracao, diretorio)
+            concluidos += 1
+        except Exception as e:
+            print(f"Erro ao processar {csv_filename}: {str(e)}")
+            continue
+    
+    print(f"\nTotal de registros gravados: {total_imported}")
+    return concluidos > 0
+
 def run_analytical_queries(conn):
-    """Executa as queries analíticas solicitadas com critérios mais flexíveis"""
+    """Executa as queries analíticas solicitadas com critérios mais flexíveis.
+
+    Os rankings leem os totais pré-agregados (despesas_periodo e
+    despesas_ano), mantidos a cada carga, em vez de agrupar a tabela bruta.
+    """
     try:
         cursor = conn.cursor(dictionary=True)
         
         # 1. Verificar se existem dados nas demonstrações contábeis
-        cursor.execute("SELECT COUNT(*) as total FROM demonstracoes_contabeis")
-        total_registros = cursor.fetchone()['total']
+        cursor.execute("SELECT COALESCE(SUM(linhas), 0) as total FROM despesas_periodo")
+        total_registros = int(cursor.fetchone()['total'])
         
         if total_registros == 0:
             print("\nNenhum dado de demonstrações contábeis encontrado no banco.")
@@ -389,11 +1494,10 @@ def run_analytical_queries(conn):
             
         # 2. Obter o período mais recente com qualquer dado
         cursor.execute("""
-        SELECT MAX(data) as max_date, 
-               (SELECT periodo FROM demonstracoes_contabeis 
-                WHERE data = (SELECT MAX(data) FROM demonstracoes_contabeis) 
-                LIMIT 1) as periodo
-        FROM demonstracoes_contabeis
+        SELECT data_max as max_date, periodo
+        FROM despesas_periodo
+        ORDER BY data_max DESC
+        LIMIT 1
         """)
         last_data = cursor.fetchone()
         last_date = last_data['max_date']
@@ -402,18 +1506,16 @@ def run_analytical_queries(conn):
         print(f"\nÚltimo período com dados disponíveis: {last_period} (até {last_date})")
         print(f"Total de registros no banco: {total_registros}")
         
-        # 3. Query flexível para o último trimestre - busca por termos relacionados
-        query_trimestre = """
+        # 3. Último trimestre: categorias marcadas como despesa nas regras
+        despesas = ', '.join(str(codigo) for codigo in CATEGORIAS_DESPESA) or 'NULL'
+        query_trimestre = f"""
         SELECT o.razao_social, 
-               SUM(d.valor) AS total_despesas,
-               MAX(d.periodo) as periodo
-        FROM demonstracoes_contabeis d
-        JOIN operadoras o ON d.registro_ans = o.registro_ans
-        WHERE (d.descricao LIKE '%EVENTOS%' 
-               OR d.descricao LIKE '%SINISTROS%'
-               OR d.descricao LIKE '%ASSISTÊNCIA%'
-               OR d.descricao LIKE '%SAÚDE%')
-        AND d.periodo = %s
+               SUM(r.total) AS total_despesas,
+               MAX(r.periodo) as periodo
+        FROM despesas_periodo r
+        JOIN operadoras o ON r.registro_ans = o.registro_ans
+        WHERE r.periodo = %s
+        AND r.categoria IN ({despesas})
         GROUP BY o.razao_social
         ORDER BY total_despesas DESC
         LIMIT 10
@@ -430,10 +1532,10 @@ def run_analytical_queries(conn):
             # Se não encontrar, mostrar as 10 operadoras com maiores despesas independente da descrição
             cursor.execute("""
             SELECT o.razao_social, 
-                   SUM(d.valor) AS total_despesas
-            FROM demonstracoes_contabeis d
-            JOIN operadoras o ON d.registro_ans = o.registro_ans
-            WHERE d.periodo = %s
+                   SUM(r.total) AS total_despesas
+            FROM despesas_periodo r
+            JOIN operadoras o ON r.registro_ans = o.registro_ans
+            WHERE r.periodo = %s
             GROUP BY o.razao_social
             ORDER BY total_despesas DESC
             LIMIT 10
@@ -447,24 +1549,21 @@ def run_analytical_queries(conn):
             else:
                 print("Nenhuma operadora com despesas no período.")
         
-        # 4. Query flexível para o último ano - busca por termos relacionados
-        query_ano = """
+        # 4. Último ano: mesmas categorias, somadas por ano
+        query_ano = f"""
         SELECT o.razao_social, 
-        SUM(d.valor) AS total_despesas,
-        YEAR(MAX(d.data)) as ano
-        FROM demonstracoes_contabeis d
-        JOIN operadoras o ON d.registro_ans = o.registro_ans
-        WHERE (d.descricao LIKE '%EVENTOS%' 
-        OR d.descricao LIKE '%SINISTROS%'
-        OR d.descricao LIKE '%ASSISTÊNCIA%'
-        OR d.descricao LIKE '%SAÚDE%')
-        AND YEAR(d.data) = YEAR(%s)
+        SUM(r.total) AS total_despesas,
+        MAX(r.ano) as ano
+        FROM despesas_ano r
+        JOIN operadoras o ON r.registro_ans = o.registro_ans
+        WHERE r.ano = %s
+        AND r.categoria IN ({despesas})
         GROUP BY o.razao_social
         ORDER BY total_despesas DESC
         LIMIT 10
         """
         
-        cursor.execute(query_ano, (last_date,))
+        cursor.execute(query_ano, (last_date.year,))
         resultados_ano = cursor.fetchall()
         
         print("\nTop 10 operadoras com maiores despesas (último ano disponível):")
@@ -475,14 +1574,14 @@ def run_analytical_queries(conn):
             # Se não encontrar, mostrar as 10 operadoras com maiores despesas no ano
             cursor.execute("""
             SELECT o.razao_social, 
-            SUM(d.valor) AS total_despesas
-            FROM demonstracoes_contabeis d
-            JOIN operadoras o ON d.registro_ans = o.registro_ans
-            WHERE YEAR(d.data) = YEAR(%s)
+            SUM(r.total) AS total_despesas
+            FROM despesas_ano r
+            JOIN operadoras o ON r.registro_ans = o.registro_ans
+            WHERE r.ano = %s
             GROUP BY o.razao_social
             ORDER BY total_despesas DESC
             LIMIT 10
-            """, (last_date,))
+            """, (last_date.year,))
             resultados_alternativos = cursor.fetchall()
             
             if resultados_alternativos:
@@ -498,10 +1597,81 @@ def run_analytical_queries(conn):
         print(f"\nErro ao executar queries analíticas: {e}")
         return False
 
+def print_top10(titulo, resultado, alternativo):
+    """Imprime um ranking de analise_colunar.relatorios no formato do relatório do MySQL"""
+    linhas, todas_categorias = resultado
+    print(f"\nTop 10 operadoras com maiores despesas ({titulo}):")
+    if todas_categorias and linhas:
+        print(f"(Considerando todas as despesas do {alternativo})")
+    for i, (razao_social, total) in enumerate(linhas, 1):
+        print(f"{i}. {razao_social}: R$ {total:,.2f}")
+    if not linhas:
+        print(f"Nenhuma operadora com despesas no {alternativo}.")
+
+def run_analytical_queries_parquet(motor=analise_colunar.MOTOR_PADRAO,
+                                   diretorio=analise_colunar.DIRETORIO_PARQUET):
+    """Os mesmos relatórios de run_analytical_queries, calculados nos arquivos Parquet"""
+    try:
+        relatorios = analise_colunar.relatorios(CATEGORIAS_DESPESA, motor, diretorio)
+    except Exception as e:
+        print(f"\nErro ao executar queries analíticas: {e}")
+        return False
+    if not relatorios['total_registros']:
+        print("\nNenhum dado de demonstrações contábeis encontrado em Parquet.")
+        return False
+    
+    print(f"\nÚltimo período com dados disponíveis: {relatorios['ultimo_periodo']} "
+          f"(até {relatorios['ultima_data']})")
+    print(f"Total de registros em Parquet: {relatorios['total_registros']} (motor {motor})")
+    print_top10("último período disponível", relatorios['trimestre'], "período")
+    print_top10("último ano disponível", relatorios['ano'], "ano")
+    return True
+
 def main():
+    parser = argparse.ArgumentParser(description="Importa os dados da ANS para o MySQL")
+    parser.add_argument("--modo-operadoras", choices=["bulk", "linha"], default="bulk",
+                        help="bulk = LOAD DATA + upsert único; linha = upsert linha a linha")
+    parser.add_argument("--paralelismo", type=int, default=1,
+                        help="threads por etapa na importação das demonstrações (1 = sequencial, "
+                             f"no máximo {pooling.CNX_POOL_MAXSIZE})")
+    parser.add_argument("--forcar", action="store_true",
+                        help="reimporta todos os arquivos, mesmo os que não mudaram desde a última carga")
+    parser.add_argument("--layout", choices=["classico", "particionado"],
+                        help="formato das demonstrações; particionado migra um banco clássico "
+                             "(padrão: o que o banco já usa)")
+    parser.add_argument("--compactar", action="store_true",
+                        help="ROW_FORMAT=COMPRESSED nas tabelas do layout particionado")
+    parser.add_argument("--leitura-trimestres", choices=["direta", "extrair"], default="direta",
+                        help="direta = lê o CSV de dentro do ZIP, sem extrair; extrair = extrai o CSV "
+                             "em dados_ans antes de ler")
+    parser.add_argument("--backend", choices=["mysql", "parquet"], default="mysql",
+                        help="parquet = arquivos Parquet + motor colunar, sem banco de dados")
+    parser.add_argument("--motor", choices=analise_colunar.MOTORES, default=analise_colunar.MOTOR_PADRAO,
+                        help="motor dos relatórios no backend parquet")
+    args = parser.parse_args()
+    # Cada gravador do modo paralelo segura uma conexão do pool, que tem um teto
+    if not 1 <= args.paralelismo <= pooling.CNX_POOL_MAXSIZE:
+        parser.error(f"--paralelismo deve estar entre 1 e {pooling.CNX_POOL_MAXSIZE}")
+    global leitura_trimestres
+    leitura_trimestres = args.leitura_trimestres
+
     # Criar pasta de dados se não existir
     os.makedirs("dados_ans", exist_ok=True)
     
+    if args.backend == "parquet":
+        print("\nGravando operadoras em Parquet...")
+        if not sync_operadoras_parquet(forcar=args.forcar):
+            return
+        print("\nGravando demonstrações contábeis em Parquet...")
+        if not import_demonstracoes_parquet(anos=2, forcar=args.forcar):
+            return
+        print("\nExecutando queries analíticas...")
+        with metricas.etapa('relatorios'):
+            concluido = run_analytical_queries_parquet(motor=args.motor)
+        if concluido:
+            print("\nProcesso concluído com sucesso!")
+        return
+    
     # Conectar ao banco de dados
     conn = create_db_connection()
     if not conn:
@@ -509,22 +1679,39 @@ def main():
     
     try:
         # Criar/verificar tabelas no banco de dados
-        if not setup_database_tables(conn):
+        if not setup_database_tables(conn, layout=args.layout, compactar=args.compactar):
             return
         
         # Importar dados das operadoras
         print("\nImportando dados das operadoras...")
-        if not import_operadoras(conn):
+        if args.modo_operadoras == "bulk":
+            # Conexão só para a carga em lote, a única que aceita LOAD DATA LOCAL
+            conn_operadoras = create_db_connection(**staging_options())
+            if not conn_operadoras:
+                return
+            try:
+                if not sync_operadoras(conn_operadoras, import_operadoras_bulk, forcar=args.forcar):
+                    return
+            finally:
+                conn_operadoras.close()
+        elif not sync_operadoras(conn, import_operadoras, forcar=args.forcar):
             return
         
         # Importar dados das demonstrações contábeis
         print("\nImportando demonstrações contábeis...")
-        if not import_demonstracoes(conn, anos=2):
+        if args.paralelismo > 1:
+            importado = import_demonstracoes_pipeline(conn, anos=2, paralelismo=args.paralelismo,
+                                                      forcar=args.forcar)
+        else:
+            importado = import_demonstracoes(conn, anos=2, forcar=args.forcar)
+        if not importado:
             return
         
         # Executar queries analíticas
         print("\nExecutando queries analíticas...")
-        if not run_analytical_queries(conn):
+        with metricas.etapa('relatorios'):
+            concluido = run_analytical_queries(conn)
+        if not concluido:
             return
         
         print("\nProcesso concluído com sucesso!")
@@ -534,4 +1721,8 @@ def main():
             conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        # Relatório da execução, mesmo se ela parou no meio
+        print(f"\nRelatório de métricas: {metricas.salvar_relatorio('teste3')}")
\ No newline at end of file
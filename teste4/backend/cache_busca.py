@@ -0,0 +1,104 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+class CacheBusca:
+    """Cache LRU + TTL dos resultados ranqueados de /api/buscar.
+
+    A chave é (versão do snapshot, termo em minúsculas, campos, modo). Além do
+    limite de entradas, o total de ids guardados também é limitado, já que
+    um termo curto pode casar com quase todas as linhas.
+    """
+
+    def __init__(self, capacidade=256, ttl=60.0, max_ids=2_000_000):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.max_ids = max_ids
+        self._entradas = OrderedDict()
+        self._total_ids = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.refinamentos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.expirados = 0
+
+    @staticmethod
+    def chave(versao, termo_lower, campos, modo='substring'):
+        return versao, termo_lower, tuple(campos) if campos else None, modo
+
+    def _buscar(self, chave, agora):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        criado_em, ids = entrada
+        if agora - criado_em > self.ttl:
+            self._remover(chave)
+            self.expirados += 1
+            return None
+        self._entradas.move_to_end(chave)
+        return ids
+
+    def _remover(self, chave):
+        _, ids = self._entradas.pop(chave)
+        self._total_ids -= len(ids)
+
+    def obter(self, versao, termo_lower, campos=None, modo='substring'):
+        """Retorna os ids ranqueados do termo, ou None se não estiver no cache"""
+        with self._trava:
+            ids = self._buscar(self.chave(versao, termo_lower, campos, modo), time.monotonic())
+            if ids is not None:
+                self.acertos += 1
+            return ids
+
+    def obter_prefixo(self, versao, termo_lower, campos=None, modo='substring'):
+        """Ids do maior prefixo do termo que estiver no cache.
+
+        Quem contém "unimed" também contém "unim", então o resultado do
+        prefixo é um superconjunto e basta filtrá-lo. Só vale para a busca
+        por substring; nos outros modos conta a falha e retorna None.
+        """
+        agora = time.monotonic()
+        with self._trava:
+            for tamanho in range(len(termo_lower) - 1 if modo == 'substring' else 0, 0, -1):
+                ids = self._buscar(self.chave(versao, termo_lower[:tamanho], campos), agora)
+                if ids is not None:
+                    self.refinamentos += 1
+                    return ids
+            self.falhas += 1
+            return None
+
+    def guardar(self, versao, termo_lower, campos, ids, modo='substring'):
+        ids = array('I', ids)
+        if len(ids) > self.max_ids:
+            return ids
+        chave = self.chave(versao, termo_lower, campos, modo)
+        with self._trava:
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (time.monotonic(), ids)
+            self._total_ids += len(ids)
+            while len(self._entradas) > self.capacidade or self._total_ids > self.max_ids:
+                self._remover(next(iter(self._entradas)))
+                self.despejos += 1
+        return ids
+
+    def limpar(self):
+        """Descarta tudo; chamado quando um novo snapshot é carregado"""
+        with self._trava:
+            self._entradas.clear()
+            self._total_ids = 0
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                "entradas": len(self._entradas),
+                "ids_armazenados": self._total_ids,
+                "acertos": self.acertos,
+                "refinamentos": self.refinamentos,
+                "falhas": self.falhas,
+                "despejos": self.despejos,
+                "expirados": self.expirados
+            }
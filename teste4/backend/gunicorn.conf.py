@@ -0,0 +1,66 @@
+"""Configuração do Gunicorn para servir a API em produção.
+
+Uso (a partir de teste4/backend):
+    gunicorn -c gunicorn.conf.py
+
+Com `preload_app` o CSV é lido e indexado uma única vez no processo master.
+Os workers são criados por fork depois disso e compartilham as páginas de
+memória do snapshot por copy-on-write. O `gc.freeze()` antes de cada fork
+tira esses objetos do alcance do coletor de lixo, que de outra forma
+escreveria nos cabeçalhos dos objetos e forçaria a cópia das páginas.
+
+Cada worker grava as próprias métricas em METRICAS_DIR (um diretório
+temporário por execução, se não for definido) e o /metrics de qualquer
+worker devolve a soma de todos. Quando um worker sai (recarga, reinício
+por timeout), o master apaga o arquivo dele.
+
+Quando operadoras.csv muda, o master recarrega o snapshot e envia SIGHUP
+para si mesmo. Os workers antigos terminam as requisições em andamento e
+os novos nascem já com os dados novos.
+"""
+import gc
+import multiprocessing
+import os
+import signal
+import tempfile
+
+wsgi_app = 'server:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+
+# Definido antes do preload, para o server.py já encontrá-lo. O diretório
+# temporário só é criado quando METRICAS_DIR não foi informado
+if 'METRICAS_DIR' not in os.environ:
+    os.environ['METRICAS_DIR'] = tempfile.mkdtemp(prefix='metricas-api-')
+
+
+def when_ready(server):
+    import server as api
+
+    master = os.getpid()
+    api.iniciar_observador(apos_recarga=lambda: os.kill(master, signal.SIGHUP))
+    server.log.info("Snapshot %s com %s operadoras pronto para os workers",
+                    api.snapshot.versao, len(api.snapshot.operadoras))
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import server as api
+
+    # Cada worker começa com um cache próprio e vazio; o do master pode ter
+    # sido copiado no meio de uma limpeza, com a trava fechada
+    api.cache = api.criar_cache()
+
+
+def child_exit(server, worker):
+    # As métricas de um worker que saiu não entram mais na soma do /metrics
+    try:
+        os.remove(os.path.join(os.environ['METRICAS_DIR'], f'{worker.pid}.json'))
+    except FileNotFoundError:
+        pass
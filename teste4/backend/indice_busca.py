@@ -0,0 +1,202 @@
+import unicodedata
+from array import array
+
+from tabela_colunar import ColunaDicionario
+
+TAMANHO_NGRAMA = 3
+
+# Abaixo deste número de candidatos vale mais a pena verificar direto do que
+# continuar intersectando listas de postings
+LIMIAR_VERIFICACAO = 64
+
+# Relevância: igualdade > prefixo > substring
+NIVEL_EXATO = 3
+NIVEL_PREFIXO = 2
+NIVEL_SUBSTRING = 1
+
+# Campos identificadores pesam mais no ranking (comparados em minúsculas)
+PESO_CAMPOS = {'registro_ans': 2, 'cnpj': 2}
+
+
+def normalizar(texto):
+    """Normaliza o texto para indexação: minúsculas e sem acentos"""
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def ngramas(texto, n=TAMANHO_NGRAMA):
+    """Retorna o conjunto de n-gramas distintos de um texto já normalizado"""
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+def nivel_casamento(valor, termo_lower):
+    """Relevância do termo em um valor: igualdade, prefixo, substring ou 0"""
+    if not isinstance(valor, str):
+        return 0
+    valor_lower = valor.lower()
+    if valor_lower == termo_lower:
+        return NIVEL_EXATO
+    if valor_lower.startswith(termo_lower):
+        return NIVEL_PREFIXO
+    if termo_lower in valor_lower:
+        return NIVEL_SUBSTRING
+    return 0
+
+
+class IndiceBusca:
+    """Índice invertido por campo para busca por substring sobre uma TabelaColunar.
+
+    Colunas de texto recebem postings de trigramas. A normalização
+    (minúsculas + remoção de acentos) só serve para gerar candidatos: todo
+    termo contido em um valor continua contido depois de normalizado, então
+    os postings nunca perdem resultados. Cada candidato é confirmado com a
+    mesma regra da busca linear (`termo in valor.lower()`), o que mantém os
+    resultados idênticos aos da varredura completa.
+
+    Colunas codificadas por dicionário dispensam os trigramas: basta testar
+    cada valor distinto e unir as linhas dos que casam.
+    """
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+        self.postings = {}
+        self.valores_curtos = {}
+        self.linhas_por_valor = {}
+        self._construir()
+
+    def _construir(self):
+        for campo in self.tabela.colunas:
+            coluna = self.tabela.dados[campo]
+            if isinstance(coluna, ColunaDicionario):
+                self.linhas_por_valor[campo] = list(zip(coluna.valores, coluna.linhas_por_codigo()))
+                continue
+
+            postings_campo = self.postings[campo] = {}
+            curtos = self.valores_curtos[campo] = {}
+            texto, offsets = coluna.texto, coluna.offsets
+            for id_registro in range(len(coluna)):
+                valor = texto[offsets[id_registro]:offsets[id_registro + 1]]
+                if not valor:
+                    continue
+                normalizado = normalizar(valor.lower())
+                if len(normalizado) < TAMANHO_NGRAMA:
+                    curtos[id_registro] = normalizado
+                for grama in ngramas(normalizado):
+                    lista = postings_campo.get(grama)
+                    if lista is None:
+                        postings_campo[grama] = lista = array('I')
+                    lista.append(id_registro)
+
+    def __len__(self):
+        return len(self.tabela)
+
+    def _candidatos_campo(self, campo, termo_normalizado):
+        """Ids que contêm todos os trigramas do termo em um campo"""
+        gramas = ngramas(termo_normalizado)
+        postings_campo = self.postings.get(campo, {})
+        listas = []
+        for grama in gramas:
+            lista = postings_campo.get(grama)
+            if lista is None:
+                return set()
+            listas.append(lista)
+
+        listas.sort(key=len)
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            if len(candidatos) <= LIMIAR_VERIFICACAO:
+                break
+            candidatos.intersection_update(lista)
+        return candidatos
+
+    def _candidatos_curtos(self, campo, termo_normalizado):
+        """Termos menores que um trigrama: une os postings dos trigramas que os contêm"""
+        candidatos = set()
+        for grama, lista in self.postings.get(campo, {}).items():
+            if termo_normalizado in grama:
+                candidatos.update(lista)
+        valores = self.valores_curtos.get(campo, {})
+        candidatos.update(i for i, valor in valores.items() if termo_normalizado in valor)
+        return candidatos
+
+    def pontuar_ids(self, termo_lower, campos=None):
+        """Mapeia cada id encontrado para o melhor casamento entre os campos buscados"""
+        termo_normalizado = normalizar(termo_lower)
+        if campos is None:
+            campos = self.tabela.colunas
+
+        pontos = {}
+        for campo in campos:
+            peso = PESO_CAMPOS.get(campo.lower(), 1)
+            if campo in self.linhas_por_valor:
+                for valor, linhas in self.linhas_por_valor[campo]:
+                    nivel = nivel_casamento(valor, termo_lower)
+                    if nivel:
+                        self._acumular(pontos, linhas, nivel * peso)
+                continue
+
+            if len(termo_normalizado) >= TAMANHO_NGRAMA:
+                candidatos = self._candidatos_campo(campo, termo_normalizado)
+            else:
+                candidatos = self._candidatos_curtos(campo, termo_normalizado)
+
+            coluna = self.tabela.dados[campo]
+            for id_registro in candidatos:
+                nivel = nivel_casamento(coluna[id_registro], termo_lower)
+                if nivel and pontos.get(id_registro, 0) < nivel * peso:
+                    pontos[id_registro] = nivel * peso
+        return pontos
+
+    @staticmethod
+    def _acumular(pontos, linhas, valor):
+        if not pontos:
+            pontos.update(dict.fromkeys(linhas, valor))
+            return
+        for id_registro in linhas:
+            if pontos.get(id_registro, 0) < valor:
+                pontos[id_registro] = valor
+
+    def buscar_ids(self, termo_lower, campos=None):
+        """Retorna, em ordem de carga, os ids cujo algum campo contém o termo"""
+        return sorted(self.pontuar_ids(termo_lower, campos))
+
+    def buscar(self, termo_lower, campos=None):
+        """Retorna os registros que contêm o termo"""
+        return [self.tabela[i] for i in self.buscar_ids(termo_lower, campos)]
+
+    def campos(self):
+        """Mapeia o nome do campo em minúsculas para o nome original do CSV"""
+        return {campo.lower(): campo for campo in self.tabela.colunas}
+
+    def pontuar_candidatos(self, candidatos, termo_lower, campos=None):
+        """Pontua apenas os ids informados, sem consultar os postings"""
+        if campos is None:
+            campos = self.tabela.colunas
+        colunas = [(self.tabela.dados[campo], PESO_CAMPOS.get(campo.lower(), 1)) for campo in campos]
+        pontos = {}
+        for id_registro in candidatos:
+            melhor = 0
+            for coluna, peso in colunas:
+                nivel = nivel_casamento(coluna[id_registro], termo_lower)
+                if nivel * peso > melhor:
+                    melhor = nivel * peso
+            if melhor:
+                pontos[id_registro] = melhor
+        return pontos
+
+    @staticmethod
+    def ranquear(pontos):
+        """Ordena por relevância e, no empate, pela ordem de carga"""
+        return sorted(pontos, key=lambda i: (-pontos[i], i))
+
+    def buscar_ranqueado(self, termo_lower, campos=None, candidatos=None):
+        """Retorna os ids encontrados ordenados por relevância.
+
+        Se `candidatos` for informado (resultado de um termo contido neste),
+        só esses ids são avaliados.
+        """
+        if candidatos is not None:
+            return self.ranquear(self.pontuar_candidatos(candidatos, termo_lower, campos))
+        return self.ranquear(self.pontuar_ids(termo_lower, campos))
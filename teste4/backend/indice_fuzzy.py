@@ -0,0 +1,187 @@
+import re
+from array import array
+from bisect import bisect_left
+from itertools import chain, combinations
+
+from indice_busca import normalizar
+from tabela_colunar import ColunaDicionario
+
+# Campos de nome, os únicos em que erro de digitação faz sentido
+CAMPOS_FUZZY = ('razao_social', 'nome_fantasia')
+
+# Só os primeiros caracteres de cada palavra geram apagamentos, como no
+# SymSpell: limita o dicionário sem perder palavras longas
+TAMANHO_PREFIXO = 7
+
+# Termos a partir deste tamanho também casam com as palavras que começam
+# com eles ("assist" -> "assistencia")
+MINIMO_COMPLETAR = 3
+
+# Custo no ranking: cada edição vale mais que completar uma palavra
+CUSTO_EDICAO = 2
+CUSTO_COMPLETAR = 1
+
+_PALAVRA = re.compile(r'[a-z0-9]+')
+
+
+def palavras(texto):
+    """Palavras normalizadas de um texto: minúsculas, sem acentos e sem pontos (S.A. -> sa)"""
+    return _PALAVRA.findall(normalizar(texto).replace('.', ''))
+
+
+def distancia_maxima(palavra):
+    """Edições toleradas: nenhuma em termos curtos, até 2 nos longos"""
+    if len(palavra) <= 3:
+        return 0
+    return 1 if len(palavra) <= 5 else 2
+
+
+def apagamentos(palavra, maximo):
+    """A palavra e todas as variantes com até `maximo` caracteres removidos"""
+    variantes = {palavra}
+    for quantidade in range(1, min(maximo, len(palavra)) + 1):
+        for posicoes in combinations(range(len(palavra)), quantidade):
+            variantes.add(''.join(c for i, c in enumerate(palavra) if i not in posicoes))
+    return variantes
+
+
+def distancia_edicao(a, b, limite):
+    """Distância de edição com transposição de vizinhos (OSA), ou limite + 1 se passar do limite"""
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                atual[j] = min(atual[j], anterior2[j - 2] + 1)
+        if min(atual) > limite:
+            return limite + 1
+        anterior2, anterior = anterior, atual
+    return anterior[-1] if anterior[-1] <= limite else limite + 1
+
+
+class IndiceFuzzy:
+    """Busca tolerante a acentos, abreviações e erros de digitação nos nomes.
+
+    Cada palavra distinta de `razao_social` e `nome_fantasia` entra em um
+    dicionário de apagamentos no estilo SymSpell: as variantes da palavra
+    com até 2 caracteres removidos apontam para ela. Um termo digitado gera
+    as próprias variantes e as palavras que compartilham alguma delas são
+    as candidatas, confirmadas pela distância de edição. Assim a busca não
+    compara o termo com cada linha nem com cada palavra do vocabulário.
+
+    Palavras só com dígitos (números no nome) não entram nos apagamentos:
+    casam apenas por igualdade ou prefixo.
+    """
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+        self.campos = [campo for campo in tabela.colunas if campo.lower() in CAMPOS_FUZZY]
+        self.vocabulario = []
+        self.linhas = {}
+        self.apagamentos = {}
+        self._construir()
+
+    def _construir(self):
+        linhas_por_palavra = {}
+        for campo in self.campos:
+            coluna = self.tabela.dados[campo]
+            postings = linhas_por_palavra[campo] = {}
+            if isinstance(coluna, ColunaDicionario):
+                # Cada valor distinto é quebrado uma vez só; as linhas de
+                # valores diferentes se misturam e precisam ser reordenadas
+                for valor, linhas in zip(coluna.valores, coluna.linhas_por_codigo()):
+                    for palavra in set(palavras(valor or '')):
+                        postings.setdefault(palavra, array('I')).extend(linhas)
+                for palavra, linhas in postings.items():
+                    postings[palavra] = array('I', sorted(linhas))
+                continue
+            for id_registro in range(len(coluna)):
+                valor = coluna[id_registro]
+                if valor:
+                    for palavra in set(palavras(valor)):
+                        postings.setdefault(palavra, array('I')).append(id_registro)
+
+        self.vocabulario = sorted(set(chain.from_iterable(linhas_por_palavra.values())))
+        id_palavra = {palavra: i for i, palavra in enumerate(self.vocabulario)}
+        for campo, postings in linhas_por_palavra.items():
+            self.linhas[campo] = {id_palavra[palavra]: linhas for palavra, linhas in postings.items()}
+
+        for i, palavra in enumerate(self.vocabulario):
+            if palavra.isdigit():
+                continue
+            for variante in apagamentos(palavra[:TAMANHO_PREFIXO], distancia_maxima(palavra)):
+                self.apagamentos.setdefault(variante, []).append(i)
+
+    def __len__(self):
+        return len(self.vocabulario)
+
+    def casamentos(self, termo):
+        """Mapeia cada palavra do vocabulário que casa com o termo para o seu custo"""
+        custos = {}
+        inicio = bisect_left(self.vocabulario, termo)
+        if len(termo) >= MINIMO_COMPLETAR:
+            for i in range(inicio, len(self.vocabulario)):
+                if not self.vocabulario[i].startswith(termo):
+                    break
+                custos[i] = CUSTO_COMPLETAR
+        if inicio < len(self.vocabulario) and self.vocabulario[inicio] == termo:
+            custos[inicio] = 0
+
+        maximo = distancia_maxima(termo)
+        if maximo and not termo.isdigit():
+            candidatos = set()
+            for variante in apagamentos(termo[:TAMANHO_PREFIXO], maximo):
+                candidatos.update(self.apagamentos.get(variante, ()))
+            for i in candidatos:
+                palavra = self.vocabulario[i]
+                # A tolerância é a do menor dos dois: "amil" não vira "mi"
+                limite = min(maximo, distancia_maxima(palavra))
+                distancia = distancia_edicao(termo, palavra, limite)
+                if distancia <= limite and custos.get(i, CUSTO_EDICAO * limite + 1) > CUSTO_EDICAO * distancia:
+                    custos[i] = CUSTO_EDICAO * distancia
+        return custos
+
+    def _custos_termo(self, termo, campos):
+        """Menor custo do termo em cada linha que tem alguma palavra compatível"""
+        por_custo = {}
+        for i, custo in self.casamentos(termo).items():
+            for campo in campos:
+                linhas = self.linhas[campo].get(i)
+                if linhas:
+                    por_custo.setdefault(custo, []).append(linhas)
+
+        # Do maior custo para o menor: o update deixa o menor em cada linha
+        custos = {}
+        for custo in sorted(por_custo, reverse=True):
+            custos.update(dict.fromkeys(chain.from_iterable(por_custo[custo]), custo))
+        return custos
+
+    def buscar_ranqueado(self, termo_lower, campos=None):
+        """Ids das linhas que casam com todas as palavras do termo, do menor custo para o maior.
+
+        No empate, vale a ordem de carga.
+        """
+        termos = palavras(termo_lower)
+        if campos is None:
+            campos = self.campos
+        if not termos or not campos:
+            return []
+
+        total = None
+        for termo in dict.fromkeys(termos):
+            custos = self._custos_termo(termo, campos)
+            if total is None:
+                total = custos
+            else:
+                menor, maior = sorted((total, custos), key=len)
+                total = {i: custo + maior[i] for i, custo in menor.items() if i in maior}
+            if not total:
+                return []
+
+        ids = sorted(total)
+        ids.sort(key=total.__getitem__)
+        return ids
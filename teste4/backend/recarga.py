@@ -0,0 +1,73 @@
+import hashlib
+import os
+import threading
+
+
+def assinatura_arquivo(caminho):
+    """Retorna (mtime, tamanho) do arquivo ou None se ele não existir"""
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do arquivo lendo em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+class ObservadorArquivo(threading.Thread):
+    """Thread que verifica periodicamente se um arquivo mudou.
+
+    A mudança é detectada por mtime/tamanho e confirmada pelo hash do
+    conteúdo, então um simples `touch` não provoca recarga. A assinatura
+    precisa se repetir em duas verificações seguidas antes da recarga, para
+    não ler um arquivo que ainda está sendo copiado.
+    """
+
+    def __init__(self, caminho, ao_mudar, intervalo=5.0, hash_inicial=None):
+        super().__init__(name='observador-csv', daemon=True)
+        self.caminho = caminho
+        self.ao_mudar = ao_mudar
+        self.intervalo = intervalo
+        self._hash = hash_inicial
+        self._assinatura = assinatura_arquivo(caminho)
+        self._pendente = None
+        self._parar = threading.Event()
+
+    def verificar(self):
+        """Executa uma verificação; retorna True se disparou a recarga"""
+        assinatura = assinatura_arquivo(self.caminho)
+        if assinatura is None or assinatura == self._assinatura:
+            self._pendente = None
+            return False
+
+        if assinatura != self._pendente:
+            # Primeira vez que vemos esta assinatura: espera estabilizar
+            self._pendente = assinatura
+            return False
+
+        self._assinatura = assinatura
+        self._pendente = None
+        novo_hash = hash_arquivo(self.caminho)
+        if novo_hash == self._hash:
+            return False
+
+        self._hash = novo_hash
+        self.ao_mudar(novo_hash)
+        return True
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar()
+            except Exception as e:
+                print(f"Erro ao verificar {self.caminho}: {e}")
+
+    def parar(self):
+        self._parar.set()
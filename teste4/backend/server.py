@@ -1,58 +1,286 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import csv
+import json
 import os
+import sys
+import threading
+import time
 from urllib.parse import unquote
 from flasgger import Swagger
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import islice
+from cache_busca import CacheBusca
+from indice_busca import IndiceBusca
+from indice_fuzzy import CAMPOS_FUZZY, IndiceFuzzy
+from tabela_colunar import TabelaColunar
+from recarga import ObservadorArquivo, hash_arquivo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from comum import metricas
 
 app = Flask(__name__)
 CORS(app)
 swagger = Swagger(app)
 
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 1000
+TAMANHO_LOTE_CSV = 4096
+
+CAMINHO_CSV = os.environ.get('OPERADORAS_CSV', os.path.join(os.path.dirname(__file__), 'operadoras.csv'))
+INTERVALO_RECARGA = float(os.environ.get('RECARGA_INTERVALO', '5'))
+# Com vários workers (Gunicorn), cada um grava as métricas aqui a cada
+# INTERVALO_METRICAS segundos e o /metrics soma os arquivos de todos
+METRICAS_DIR = os.environ.get('METRICAS_DIR')
+INTERVALO_METRICAS = float(os.environ.get('METRICAS_INTERVALO', '1'))
+
+HTTP_DURACAO = metricas.registro.histograma(
+    'http_requisicao_duracao_segundos',
+    'Duração das requisições até o fim da resposta (inclusive as em streaming)',
+    ['endpoint', 'metodo', 'status']
+)
+
+def criar_cache():
+    """Cria o cache de buscas com a configuração do ambiente"""
+    return CacheBusca(
+        capacidade=int(os.environ.get('CACHE_CAPACIDADE', '256')),
+        ttl=float(os.environ.get('CACHE_TTL', '60'))
+    )
+
+cache = criar_cache()
+
+@dataclass(frozen=True)
+class SnapshotDados:
+    """Versão imutável dos dados e do índice; é trocada inteira a cada recarga"""
+    versao: int
+    operadoras: TabelaColunar
+    indice: IndiceBusca
+    fuzzy: IndiceFuzzy
+    hash_arquivo: str
+    duracao_carga: float
+    carregado_em: str
+
+snapshot = None
+_trava_recarga = threading.Lock()
+
 def ler_csv(caminho):
-    """Função melhorada para leitura de CSV com tratamento de erros robusto"""
-    dados = []
+    """Lê o CSV para uma TabelaColunar com tratamento de erros robusto"""
     try:
         if not os.path.exists(caminho):
             raise FileNotFoundError(f"Arquivo '{caminho}' não encontrado.")
 
-        with open(caminho, 'r', encoding='utf-8-sig') as arquivo_csv:
-            leitor_csv = csv.DictReader(arquivo_csv)
-            for linha in leitor_csv:
-                if linha:
-                    linha_limpa = {
-                        k.strip(): v.strip() if v and isinstance(v, str) else v
-                        for k, v in linha.items()
-                        if k and k.strip()
-                    }
-                    if linha_limpa:
-                        dados.append(linha_limpa)
+        with open(caminho, 'r', encoding='utf-8-sig', newline='') as arquivo_csv:
+            # O export da ANS usa ';' como separador
+            cabecalho = arquivo_csv.readline()
+            delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+            arquivo_csv.seek(0)
+            leitor_csv = csv.reader(arquivo_csv, delimiter=delimitador)
+
+            # Colunas sem nome são descartadas; com nomes repetidos vale a última
+            posicoes = {}
+            for posicao, nome in enumerate(next(leitor_csv, [])):
+                if nome and nome.strip():
+                    posicoes[nome.strip()] = posicao
+            tabela = TabelaColunar(posicoes.keys())
+            indices = list(posicoes.values())
+            largura = max(indices, default=-1) + 1
+
+            # Lê em lotes e transpõe para preencher a tabela coluna a coluna
+            while indices:
+                lote = [linha for linha in islice(leitor_csv, TAMANHO_LOTE_CSV) if linha]
+                if not lote:
+                    break
+                # Campos faltando no fim da linha viram None, como no DictReader
+                lote = [linha if len(linha) >= largura else linha + [None] * (largura - len(linha)) for linha in lote]
+                colunas = list(zip(*lote))
+                tabela.adicionar_lote([
+                    [v.strip() if v is not None else None for v in colunas[j]]
+                    if None in colunas[j] else list(map(str.strip, colunas[j]))
+                    for j in indices
+                ])
     except Exception as e:
         print(f"Erro crítico ao ler o arquivo CSV: {e}")
         raise
-    return dados
+    return tabela.finalizar()
+
+def montar_snapshot(caminho, versao):
+    """Lê o CSV e monta o índice fora do caminho das requisições"""
+    inicio = time.perf_counter()
+    digest = hash_arquivo(caminho)
+    operadoras = ler_csv(caminho)
+    indice = IndiceBusca(operadoras)
+    fuzzy = IndiceFuzzy(operadoras)
+    return SnapshotDados(
+        versao=versao,
+        operadoras=operadoras,
+        indice=indice,
+        fuzzy=fuzzy,
+        hash_arquivo=digest,
+        duracao_carga=time.perf_counter() - inicio,
+        carregado_em=datetime.now().isoformat()
+    )
 
 def carregar_dados():
-    """Carrega os dados com tratamento de erros global"""
-    global operadoras
-    try:
-        caminho_csv = os.path.join(os.path.dirname(__file__), 'operadoras.csv')
-        operadoras = ler_csv(caminho_csv)
-    except Exception as e:
-        print(f"Falha ao carregar dados: {e}")
-        operadoras = []
+    """Carrega os dados e troca o snapshot atual de forma atômica.
+
+    Requisições em andamento continuam usando o snapshot que já tinham em
+    mãos. Se uma recarga falhar, o snapshot anterior é mantido.
+    """
+    global snapshot
+    with _trava_recarga:
+        versao = snapshot.versao + 1 if snapshot else 1
+        try:
+            novo = montar_snapshot(CAMINHO_CSV, versao)
+        except Exception as e:
+            print(f"Falha ao carregar dados: {e}")
+            if snapshot is not None:
+                return snapshot
+            vazia = TabelaColunar([]).finalizar()
+            novo = SnapshotDados(versao, vazia, IndiceBusca(vazia), IndiceFuzzy(vazia), None, 0.0,
+                                 datetime.now().isoformat())
+        snapshot = novo
+        cache.limpar()
+        print(f"Snapshot {novo.versao} carregado: {len(novo.operadoras)} operadoras em {novo.duracao_carga:.2f}s")
+        return novo
+
+@metricas.registro.coletor
+def _metricas_dados():
+    """Snapshot em uso e contadores do cache de buscas, lidos na hora da coleta"""
+    snap = snapshot
+    estatisticas = cache.estatisticas()
+    return {
+        'api_operadoras': {'tipo': 'gauge', 'ajuda': 'Operadoras no snapshot em uso', 'series': [
+            {'rotulos': {}, 'valor': len(snap.operadoras) if snap else 0}
+        ]},
+        'api_snapshot_versao': {'tipo': 'gauge', 'ajuda': 'Versão do snapshot em uso', 'series': [
+            {'rotulos': {}, 'valor': snap.versao if snap else 0}
+        ]},
+        'api_snapshot_carga_segundos': {'tipo': 'gauge', 'ajuda': 'Duração da carga do snapshot em uso', 'series': [
+            {'rotulos': {}, 'valor': snap.duracao_carga if snap else 0.0}
+        ]},
+        'api_cache_eventos_total': {'tipo': 'counter', 'ajuda': 'Eventos do cache de buscas', 'series': [
+            {'rotulos': {'evento': evento}, 'valor': estatisticas[evento]}
+            for evento in ('acertos', 'refinamentos', 'falhas', 'despejos', 'expirados')
+        ]},
+    }
+
+@app.before_request
+def _iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def _medir_requisicao(response):
+    """Registra a duração quando a resposta termina de ser enviada (streaming incluído)"""
+    inicio = g.get('inicio_requisicao', time.perf_counter())
+    rotulos = {
+        'endpoint': request.url_rule.rule if request.url_rule else 'sem_rota',
+        'metodo': request.method,
+        'status': response.status_code,
+    }
+
+    def registrar():
+        HTTP_DURACAO.observar(time.perf_counter() - inicio, **rotulos)
+        if METRICAS_DIR:
+            metricas.persistir(METRICAS_DIR, INTERVALO_METRICAS)
+
+    response.call_on_close(registrar)
+    return response
+
+def iniciar_observador(intervalo=INTERVALO_RECARGA, apos_recarga=None):
+    """Inicia a thread que recarrega operadoras.csv quando o arquivo muda.
+
+    `apos_recarga` é chamado depois que o novo snapshot entra no ar; o modo de
+    produção usa isso para reiniciar os workers a partir do master.
+    """
+    if intervalo <= 0:
+        return None
+
+    def recarregar(_hash):
+        carregar_dados()
+        if apos_recarga:
+            apos_recarga()
+
+    observador = ObservadorArquivo(
+        CAMINHO_CSV,
+        recarregar,
+        intervalo=intervalo,
+        hash_inicial=snapshot.hash_arquivo if snapshot else None
+    )
+    observador.start()
+    return observador
 
 # Carrega os dados ao iniciar
 carregar_dados()
 
-def buscar_operadoras(termo):
-    """Busca otimizada com tratamento de erros"""
-    if not termo or not operadoras:
+def buscar_operadoras(termo, campos=None, snap=None, modo='substring'):
+    """Busca por substring ou aproximada (via cache ou índice) e retorna os ids ordenados por relevância"""
+    snap = snap or snapshot
+    if not termo or not snap.operadoras:
         return []
     
     termo_lower = termo.lower().strip()
-    return [op for op in operadoras if any(termo_lower in str(valor).lower() for valor in op.values() if isinstance(valor, str))]
+    ids = cache.obter(snap.versao, termo_lower, campos, modo)
+    if ids is None:
+        # Conta o refinamento ou a falha igual nos dois modos
+        candidatos = cache.obter_prefixo(snap.versao, termo_lower, campos, modo)
+        if modo == 'fuzzy':
+            ids = snap.fuzzy.buscar_ranqueado(termo_lower, campos)
+        else:
+            ids = snap.indice.buscar_ranqueado(termo_lower, campos, candidatos)
+        ids = cache.guardar(snap.versao, termo_lower, campos, ids, modo)
+    return ids
+
+def _ler_parametros_pagina(indice):
+    """Valida modo, campo, limit, cursor e formato da query string"""
+    modo = request.args.get('modo', 'substring').lower()
+    if modo not in ('substring', 'fuzzy'):
+        raise ValueError("Parâmetro 'modo' deve ser 'substring' ou 'fuzzy'")
+
+    campos = None
+    campo = request.args.get('campo', '').strip()
+    if campo:
+        disponiveis = indice.campos()
+        pedidos = [c.strip().lower() for c in campo.split(',') if c.strip()]
+        invalidos = [c for c in pedidos if c not in disponiveis]
+        if invalidos:
+            raise ValueError(f"Campo(s) inválido(s): {', '.join(invalidos)}")
+        if modo == 'fuzzy':
+            invalidos = [c for c in pedidos if c not in CAMPOS_FUZZY]
+            if invalidos:
+                raise ValueError(f"Campo(s) sem busca aproximada: {', '.join(invalidos)}")
+        campos = [disponiveis[c] for c in pedidos]
+
+    try:
+        limite = int(request.args.get('limit', LIMITE_PADRAO))
+        inicio = int(request.args.get('cursor', 0) or 0)
+    except ValueError:
+        raise ValueError("Parâmetros 'limit' e 'cursor' devem ser inteiros")
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ValueError(f"Parâmetro 'limit' deve estar entre 1 e {LIMITE_MAXIMO}")
+    if inicio < 0:
+        raise ValueError("Parâmetro 'cursor' inválido")
+
+    formato = request.args.get('formato', 'json').lower()
+    if formato not in ('json', 'ndjson'):
+        raise ValueError("Parâmetro 'formato' deve ser 'json' ou 'ndjson'")
+
+    return modo, campos, limite, inicio, formato
+
+def _gerar_json(registros, pagina, total, proximo_cursor, meta):
+    """Emite o envelope JSON da busca item a item, sem montar a lista inteira"""
+    yield '{"status": "success", "data": {"resultados": ['
+    for n, id_registro in enumerate(pagina):
+        yield (', ' if n else '') + json.dumps(registros[id_registro], ensure_ascii=False)
+    yield '], "total": %d, "proximo_cursor": %s}, "meta": %s}' % (
+        total, json.dumps(proximo_cursor), json.dumps(meta, ensure_ascii=False))
+
+def _gerar_ndjson(registros, pagina, total, proximo_cursor, meta):
+    """Emite um registro por linha e, na última linha, os metadados da página"""
+    for id_registro in pagina:
+        yield json.dumps(registros[id_registro], ensure_ascii=False) + '\n'
+    meta = dict(meta, total=total, proximo_cursor=proximo_cursor)
+    yield json.dumps({"meta": meta}, ensure_ascii=False) + '\n'
 
 @app.route('/api/buscar', methods=['GET'])
 def buscar():
@@ -65,6 +293,36 @@ def buscar():
         type: string
         required: true
         description: Termo de busca para encontrar operadoras
+      - name: campo
+        in: query
+        type: string
+        required: false
+        description: Restringe a busca a um ou mais campos (separados por vírgula)
+      - name: modo
+        in: query
+        type: string
+        required: false
+        enum: [substring, fuzzy]
+        default: substring
+        description: fuzzy tolera acentos, abreviações e erros de digitação em razao_social e nome_fantasia
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Quantidade máxima de resultados por página (até 1000)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Valor de proximo_cursor retornado pela página anterior
+      - name: formato
+        in: query
+        type: string
+        required: false
+        enum: [json, ndjson]
+        default: json
+        description: ndjson emite um registro por linha e os metadados na última linha
     responses:
       200:
         description: Lista de operadoras encontradas
@@ -83,16 +341,20 @@ def buscar():
                     type: object
                 total:
                   type: integer
+                proximo_cursor:
+                  type: string
             meta:
               type: object
               properties:
                 termo_buscado:
                   type: string
+                modo:
+                  type: string
                 timestamp:
                   type: string
                   format: date-time
       400:
-        description: Erro - termo não informado
+        description: Erro - termo não informado ou parâmetros inválidos
       500:
         description: Erro interno no servidor
     """
@@ -102,19 +364,28 @@ def buscar():
         if not termo:
             return jsonify({"status": "error", "message": "Parâmetro 'termo' é obrigatório", "code": 400}), 400
 
-        resultados = buscar_operadoras(termo)
-
-        return jsonify({
-            "status": "success",
-            "data": {
-                "resultados": resultados,
-                "total": len(resultados)
-            },
-            "meta": {
-                "termo_buscado": termo,
-                "timestamp": datetime.now().isoformat()
-            }
-        })
+        try:
+            snap = snapshot
+            modo, campos, limite, inicio, formato = _ler_parametros_pagina(snap.indice)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e), "code": 400}), 400
+
+        registros = snap.operadoras
+        ids = buscar_operadoras(termo, campos, snap, modo)
+        pagina = ids[inicio:inicio + limite]
+        proximo_cursor = str(inicio + limite) if inicio + limite < len(ids) else None
+        meta = {
+            "termo_buscado": termo,
+            "modo": modo,
+            "timestamp": datetime.now().isoformat()
+        }
+
+        if formato == 'ndjson':
+            gerador = _gerar_ndjson(registros, pagina, len(ids), proximo_cursor, meta)
+            return Response(stream_with_context(gerador), mimetype='application/x-ndjson')
+
+        gerador = _gerar_json(registros, pagina, len(ids), proximo_cursor, meta)
+        return Response(stream_with_context(gerador), mimetype='application/json')
         
     except Exception as e:
         print(f"Erro no endpoint /buscar: {e}")
@@ -138,16 +409,46 @@ def health_check():
               type: boolean
             operadoras_count:
               type: integer
+            snapshot_versao:
+              type: integer
+            carga_duracao_ms:
+              type: number
+            carregado_em:
+              type: string
+              format: date-time
+            cache:
+              type: object
+              description: Entradas e contadores de acerto, refinamento, falha e despejo do cache de buscas
     """
+    snap = snapshot
     return jsonify({
         "status": "healthy",
-        "data_loaded": bool(operadoras),
-        "operadoras_count": len(operadoras) if operadoras else 0
+        "data_loaded": bool(snap.operadoras),
+        "operadoras_count": len(snap.operadoras),
+        "snapshot_versao": snap.versao,
+        "carga_duracao_ms": round(snap.duracao_carga * 1000, 1),
+        "carregado_em": snap.carregado_em,
+        "cache": cache.estatisticas()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas da API no formato de exposição do Prometheus.
+    ---
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Latência por endpoint, carga do snapshot e contadores do cache (somados entre os workers)
+    """
+    estado = metricas.coletar(METRICAS_DIR)
+    return Response(metricas.formato_prometheus(estado), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     try:
         print(f"\n⚡ API iniciando em {datetime.now().isoformat()}")
+        iniciar_observador()
         app.run(debug=True, host='0.0.0.0', port=5000)
     except Exception as e:
         print(f"Falha ao iniciar servidor: {e}")
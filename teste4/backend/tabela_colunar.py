@@ -0,0 +1,150 @@
+import io
+import sys
+from array import array
+from itertools import accumulate, islice
+
+# Colunas com até este número de valores distintos ficam codificadas por
+# dicionário (códigos de 16 bits)
+LIMITE_DICIONARIO = 65535
+
+# Acima desta proporção de valores distintos por linha o dicionário não
+# compensa e a coluna vira um buffer de texto contíguo
+PROPORCAO_MAXIMA_DISTINTOS = 0.5
+
+# Linhas observadas antes de decidir cedo pelo formato de texto
+AMOSTRA_CARDINALIDADE = 1024
+
+
+class ColunaDicionario:
+    """Coluna de baixa cardinalidade: um código de 16 bits por linha"""
+
+    def __init__(self):
+        self.valores = []
+        self.codigos = array('H')
+        self._codigo_por_valor = {}
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def estender(self, valores):
+        # setdefault com len(mapa) atribui códigos sequenciais sem laço em Python
+        mapa = self._codigo_por_valor
+        self.codigos.extend([mapa.setdefault(v, len(mapa)) for v in valores])
+        if len(mapa) > len(self.valores):
+            novos = list(mapa)[len(self.valores):]
+            self.valores.extend(sys.intern(v) if isinstance(v, str) else v for v in novos)
+
+    def __getitem__(self, i):
+        return self.valores[self.codigos[i]]
+
+    def distintos(self):
+        return len(self.valores)
+
+    def linhas_por_codigo(self):
+        """Lista invertida código -> ids das linhas, usada pelo índice de busca"""
+        listas = [array('I') for _ in self.valores]
+        for i, codigo in enumerate(self.codigos):
+            listas[codigo].append(i)
+        return listas
+
+    def finalizar(self):
+        self._codigo_por_valor = None
+        return self
+
+
+class ColunaTexto:
+    """Coluna de alta cardinalidade: todos os valores em uma única string.
+
+    `offsets[i]:offsets[i + 1]` delimita o valor da linha i; valores None
+    ficam registrados à parte, já que são raros (campos faltando no CSV).
+    """
+
+    def __init__(self):
+        self.offsets = array('I', [0])
+        self.nulos = set()
+        self.texto = ''
+        self._buffer = io.StringIO()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def estender(self, valores):
+        if None in valores:
+            inicio = len(self)
+            self.nulos.update(inicio + k for k, v in enumerate(valores) if v is None)
+            valores = ['' if v is None else v for v in valores]
+        self._buffer.write(''.join(valores))
+        self.offsets.extend(islice(accumulate(map(len, valores), initial=self.offsets[-1]), 1, None))
+
+    def __getitem__(self, i):
+        if i in self.nulos:
+            return None
+        return self.texto[self.offsets[i]:self.offsets[i + 1]]
+
+    def finalizar(self):
+        self.texto = self._buffer.getvalue()
+        self._buffer = None
+        return self
+
+
+def _para_texto(coluna):
+    """Converte uma coluna de dicionário em coluna de texto"""
+    texto = ColunaTexto()
+    valores = coluna.valores
+    texto.estender([valores[c] for c in coluna.codigos])
+    return texto
+
+
+class TabelaColunar:
+    """Armazena as linhas do CSV por coluna e materializa dicts sob demanda.
+
+    Cada coluna começa codificada por dicionário e passa a texto contíguo
+    quando a cardinalidade cresce demais, então `uf`, `modalidade` e `cidade`
+    ficam com 2 bytes por linha e os nomes não carregam um objeto por valor.
+    """
+
+    def __init__(self, nomes_colunas):
+        self.colunas = [sys.intern(nome) for nome in nomes_colunas]
+        self.dados = {nome: ColunaDicionario() for nome in self.colunas}
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def adicionar(self, valores):
+        """Adiciona uma linha (sequência na ordem de `colunas`)"""
+        self.adicionar_lote([[valor] for valor in valores])
+
+    def adicionar_lote(self, colunas_lote):
+        """Adiciona um lote já transposto: uma lista de valores por coluna"""
+        for nome, valores in zip(self.colunas, colunas_lote):
+            coluna = self.dados[nome]
+            # Converte antes de estourar os códigos de 16 bits
+            if isinstance(coluna, ColunaDicionario) and coluna.distintos() + len(valores) > LIMITE_DICIONARIO:
+                coluna = self.dados[nome] = _para_texto(coluna)
+            coluna.estender(valores)
+            # Colunas claramente de alta cardinalidade já no primeiro lote
+            # viram texto logo, sem pagar o dicionário até o fim da carga
+            if (isinstance(coluna, ColunaDicionario)
+                    and coluna.distintos() > len(coluna) * PROPORCAO_MAXIMA_DISTINTOS
+                    and len(coluna) >= AMOSTRA_CARDINALIDADE):
+                self.dados[nome] = _para_texto(coluna)
+        if colunas_lote:
+            self.total += len(colunas_lote[0])
+
+    def finalizar(self):
+        """Fecha os buffers e decide o formato final de cada coluna"""
+        for nome, coluna in self.dados.items():
+            if (isinstance(coluna, ColunaDicionario)
+                    and coluna.distintos() > max(1, self.total * PROPORCAO_MAXIMA_DISTINTOS)):
+                coluna = _para_texto(coluna)
+            self.dados[nome] = coluna.finalizar()
+        return self
+
+    def valor(self, i, coluna):
+        dados = self.dados.get(coluna)
+        return dados[i] if dados is not None else None
+
+    def __getitem__(self, i):
+        """Materializa a linha i como dict, no mesmo formato do DictReader"""
+        return {nome: self.dados[nome][i] for nome in self.colunas}
@@ -0,0 +1,107 @@
+import csv
+import os
+import sys
+
+import pytest
+
+from benchmarks.geradores import COLUNAS_OPERADORAS, gerar_operadoras
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'teste3'))
+sys.path.insert(0, os.path.join(RAIZ, 'teste4', 'backend'))
+
+# Bancos criados pelos testes no MySQL do docker-compose (apagados no fim)
+BANCO_TESTE = os.environ.get('MYSQL_DATABASE_TESTE', 'ans_dados_teste')
+
+# Linhas acrescentadas ao operadoras.csv sintético da API: nomes parecidos
+# para a busca aproximada, acentos, campos curtos e uma linha incompleta
+OPERADORAS_EXTRAS = [
+    ['399001', '11111111000111', 'BELA VISTA SAÚDE S.A.', 'Bela Vista', 'Medicina de Grupo', 'Rua A', '1',
+     '', 'Centro', 'Açaí', 'PA', '66000000', '91', '32323232', '', 'bela@vista.com.br', 'Ana', 'Diretora',
+     '1', '01/02/2003'],
+    ['399002', '22222222000122', 'CLÍNICA ODONTOLÓGICA BELA VISTA LTDA', 'Odonto Bela Vista',
+     'Odontologia de Grupo', 'Rua B', '2', 'Sala 1', 'Centro', 'Belém', 'PA', '66000001', '91', '33333333',
+     '', '', 'Bruno', 'Diretor', '2', '02/03/2004'],
+    ['399003', '33333333000133', 'BELLA VISTA ASSISTÊNCIA MÉDICA', 'Bella Vista', 'Cooperativa Médica',
+     'Rua C', '3', '', 'Sé', 'São Paulo', 'SP', '01000000', '11', '34343434', '', '', 'Carla', 'Diretora',
+     '3', '03/04/2005'],
+    ['399004', '44444444000144', 'Sá'],
+]
+
+
+@pytest.fixture(scope='session')
+def operadoras_csv(tmp_path_factory):
+    """operadoras.csv sintético da API (3000 operadoras + OPERADORAS_EXTRAS)"""
+    caminho = tmp_path_factory.mktemp('api') / 'operadoras.csv'
+    gerar_operadoras(str(caminho), 3000)
+    with open(caminho, 'a', encoding='utf-8', newline='') as arquivo:
+        csv.writer(arquivo, delimiter=';', quoting=csv.QUOTE_ALL).writerows(OPERADORAS_EXTRAS)
+    assert len(OPERADORAS_EXTRAS[0]) == len(COLUNAS_OPERADORAS)
+    return str(caminho)
+
+
+@pytest.fixture(scope='session')
+def tabela(operadoras_csv):
+    """O operadoras.csv sintético carregado como a API carrega"""
+    from server import ler_csv
+    return ler_csv(operadoras_csv)
+
+
+@pytest.fixture
+def servidor_api(operadoras_csv, monkeypatch):
+    """Módulo server da API com o snapshot carregado do CSV sintético"""
+    import server
+    monkeypatch.setattr(server, 'CAMINHO_CSV', operadoras_csv)
+    server.carregar_dados()
+    return server
+
+
+@pytest.fixture(scope='module')
+def mysql_teste():
+    """Cria bancos de teste vazios no MySQL do docker-compose; pula os testes sem o MySQL.
+
+    Retorna `criar(sufixo='')`, que cria o banco `BANCO_TESTE + sufixo` e
+    devolve `conectar(**opcoes)` para abrir conexões nele. O usuário de
+    MYSQL_USER/MYSQL_PASSWORD precisa poder criar bancos (com o compose:
+    MYSQL_USER=root MYSQL_PASSWORD=rootpassword).
+    """
+    pytest.importorskip('mysql.connector')
+    pytest.importorskip('pyarrow')
+    import teste3_bancoDeDados as teste3
+    from mysql.connector import Error
+
+    config = {chave: valor for chave, valor in teste3.DB_CONFIG.items() if chave != 'database'}
+    try:
+        servidor = teste3.mysql.connector.connect(**config)
+    except Error as e:
+        pytest.skip(f'MySQL indisponível: {e}')
+    bancos = []
+    conexoes = []
+
+    def criar(sufixo=''):
+        banco = BANCO_TESTE + sufixo
+        try:
+            cursor = servidor.cursor()
+            cursor.execute(f'DROP DATABASE IF EXISTS {banco}')
+            cursor.execute(f'CREATE DATABASE {banco}')
+            cursor.close()
+        except Error as e:
+            pytest.skip(f'Sem permissão para criar {banco}: {e}')
+        bancos.append(banco)
+
+        def conectar(**opcoes):
+            conn = teste3.mysql.connector.connect(**{**config, 'database': banco, **opcoes})
+            conexoes.append(conn)
+            return conn
+        conectar.banco = banco
+        return conectar
+
+    yield criar
+    for conn in conexoes:
+        if conn.is_connected():
+            conn.close()
+    cursor = servidor.cursor()
+    for banco in bancos:
+        cursor.execute(f'DROP DATABASE IF EXISTS {banco}')
+    servidor.close()
@@ -0,0 +1,80 @@
+"""/api/buscar pelo cliente de teste do Flask: paginação, campos, ranking e ndjson."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def cliente(servidor_api):
+    return servidor_api.app.test_client()
+
+
+def buscar(cliente, **parametros):
+    resposta = cliente.get('/api/buscar', query_string=parametros)
+    return resposta.status_code, resposta.get_json()
+
+
+def todas_as_paginas(cliente, **parametros):
+    resultados, cursor = [], None
+    while True:
+        status, corpo = buscar(cliente, cursor=cursor or '', **parametros)
+        assert status == 200
+        dados = corpo['data']
+        assert len(dados['resultados']) <= parametros['limit']
+        resultados += dados['resultados']
+        cursor = dados['proximo_cursor']
+        if cursor is None:
+            return resultados, dados['total']
+
+
+@pytest.mark.parametrize('termo', ['bela vista', 'unimed 1', 'cidade 7'])
+def test_paginas_juntas_igual_busca_completa(cliente, servidor_api, termo):
+    snap = servidor_api.snapshot
+    esperado = [snap.operadoras[i] for i in snap.indice.buscar_ranqueado(termo)]
+    resultados, total = todas_as_paginas(cliente, termo=termo, limit=37)
+    assert total == len(esperado) > 0
+    assert resultados == esperado
+
+
+def test_ranking_exato_prefixo_substring(cliente):
+    status, corpo = buscar(cliente, termo='Bela Vista', campo='nome_fantasia')
+    assert status == 200
+    nomes = [r['Nome_Fantasia'] for r in corpo['data']['resultados']]
+    assert nomes == ['Bela Vista', 'Odonto Bela Vista']
+
+    # Registro ANS pesa mais: a igualdade nele vem antes de tudo
+    _, corpo = buscar(cliente, termo='300012')
+    assert corpo['data']['resultados'][0]['Registro_ANS'] == '300012'
+
+
+def test_campos(cliente):
+    _, corpo = buscar(cliente, termo='pa', campo='UF', limit=1000)
+    assert {r['UF'] for r in corpo['data']['resultados']} == {'PA'}
+
+    # Campos em qualquer caixa e separados por vírgula
+    _, corpo = buscar(cliente, termo='belém', campo='razao_social, CIDADE')
+    assert [r['Registro_ANS'] for r in corpo['data']['resultados']] == ['399002']
+
+    status, corpo = buscar(cliente, termo='x', campo='uf,senha')
+    assert status == 400
+    assert 'senha' in corpo['message']
+
+
+@pytest.mark.parametrize('parametros', [
+    {'termo': ''}, {'termo': 'a', 'limit': 0}, {'termo': 'a', 'limit': 1001},
+    {'termo': 'a', 'cursor': -1}, {'termo': 'a', 'cursor': 'abc'}, {'termo': 'a', 'formato': 'xml'},
+])
+def test_parametros_invalidos(cliente, parametros):
+    status, corpo = buscar(cliente, **parametros)
+    assert status == 400
+    assert corpo['status'] == 'error'
+
+
+def test_ndjson(cliente):
+    _, corpo = buscar(cliente, termo='vista', limit=2)
+    resposta = cliente.get('/api/buscar', query_string={'termo': 'vista', 'limit': 2, 'formato': 'ndjson'})
+    assert resposta.mimetype == 'application/x-ndjson'
+    linhas = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+    assert linhas[:-1] == corpo['data']['resultados']
+    assert linhas[-1]['meta']['total'] == corpo['data']['total']
+    assert linhas[-1]['meta']['proximo_cursor'] == '2'
@@ -0,0 +1,92 @@
+"""CacheBusca: refinamento pelo prefixo igual à busca sem cache, despejo LRU e TTL."""
+import time
+
+import pytest
+
+from cache_busca import CacheBusca
+
+
+@pytest.fixture
+def cache(servidor_api, monkeypatch):
+    novo = CacheBusca(capacidade=8, ttl=60)
+    monkeypatch.setattr(servidor_api, 'cache', novo)
+    return novo
+
+
+@pytest.mark.parametrize('termos', [
+    ['o', 'op', 'operadora s', 'operadora sa', 'operadora saú', 'operadora saúde 1'],
+    ['bel', 'bela vista', 'bela vista s'],
+    ['3', '300', '3001'],
+])
+def test_refinamento_igual_busca_sem_cache(servidor_api, cache, termos):
+    indice = servidor_api.snapshot.indice
+    for n, termo in enumerate(termos):
+        assert list(servidor_api.buscar_operadoras(termo)) == indice.buscar_ranqueado(termo)
+        assert cache.estatisticas()['refinamentos'] == n
+    assert cache.estatisticas()['falhas'] == 1
+
+    # Com campos, o prefixo só vale dentro dos mesmos campos
+    termo = termos[-1]
+    assert list(servidor_api.buscar_operadoras(termo, ['Razao_Social'])) == \
+        indice.buscar_ranqueado(termo, ['Razao_Social'])
+    assert cache.estatisticas()['falhas'] == 2
+
+
+def test_acerto_devolve_mesmos_ids(servidor_api, cache):
+    primeira = servidor_api.buscar_operadoras('Unimed')
+    assert servidor_api.buscar_operadoras('unimed ') is primeira
+    assert cache.estatisticas()['acertos'] == 1
+
+
+def test_despejo_lru():
+    cache = CacheBusca(capacidade=2)
+    cache.guardar(1, 'a', None, [1])
+    cache.guardar(1, 'b', None, [2])
+    assert list(cache.obter(1, 'a')) == [1]
+    cache.guardar(1, 'c', None, [3])
+    assert cache.obter(1, 'b') is None
+    assert list(cache.obter(1, 'a')) == [1]
+    assert cache.estatisticas()['despejos'] == 1
+
+
+def test_limite_de_ids():
+    cache = CacheBusca(capacidade=10, max_ids=5)
+    cache.guardar(1, 'a', None, [1, 2, 3])
+    cache.guardar(1, 'b', None, [4, 5, 6])
+    assert cache.obter(1, 'a') is None
+    assert cache.estatisticas()['ids_armazenados'] == 3
+    # Resultados maiores que o limite são devolvidos, mas não guardados
+    assert list(cache.guardar(1, 'c', None, range(6))) == list(range(6))
+    assert cache.obter(1, 'c') is None
+
+
+def test_ttl():
+    cache = CacheBusca(ttl=0.05)
+    cache.guardar(1, 'unim', None, [1, 2])
+    assert cache.obter_prefixo(1, 'unimed') is not None
+    time.sleep(0.1)
+    assert cache.obter(1, 'unim') is None
+    assert cache.obter_prefixo(1, 'unimed') is None
+    estatisticas = cache.estatisticas()
+    assert estatisticas['expirados'] == 1
+    assert estatisticas['entradas'] == 0
+
+
+def test_versao_do_snapshot_na_chave():
+    cache = CacheBusca()
+    cache.guardar(1, 'unimed', None, [1])
+    assert cache.obter(2, 'unimed') is None
+    assert cache.obter_prefixo(2, 'unimeds') is None
+
+
+@pytest.mark.parametrize('modo', ['substring', 'fuzzy'])
+def test_falhas_contadas_nos_dois_modos(servidor_api, cache, modo):
+    servidor_api.buscar_operadoras('bela vista', modo=modo)
+    servidor_api.buscar_operadoras('bela vista', modo=modo)
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['falhas'], estatisticas['acertos'], estatisticas['refinamentos']) == (1, 1, 0)
+
+    # A busca aproximada não aproveita o prefixo: sempre conta falha
+    servidor_api.buscar_operadoras('bela vista s', modo=modo)
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['falhas'], estatisticas['refinamentos']) == ((1, 1) if modo == 'substring' else (2, 0))
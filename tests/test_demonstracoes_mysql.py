@@ -0,0 +1,231 @@
+"""Importação das demonstrações contra o MySQL do docker-compose.
+
+Os trimestres são CSVs sintéticos (benchmarks/geradores.py) servidos em ZIP
+pelo comum.servidor_local, como no servidor da ANS. Cada teste usa um banco
+novo (ver `mysql_teste` no conftest); sem o MySQL no ar, são pulados.
+"""
+import json
+import zipfile
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('pyarrow')
+
+import layout_particionado  # noqa: E402
+import teste3_bancoDeDados as teste3  # noqa: E402
+from benchmarks.geradores import gerar_trimestre, registro  # noqa: E402
+from comum.servidor_local import iniciar  # noqa: E402
+
+TRIMESTRES = [(2023, '1T'), (2023, '2T'), (2023, '3T')]
+# Operadoras cadastradas; os CSVs têm mais, e as outras são filtradas na carga
+OPERADORAS = 40
+OPERADORAS_CSV = 50
+CONTAS = 30
+
+
+def publicar(site, ano, trimestre, contas=CONTAS):
+    """Grava o ZIP do trimestre no diretório servido, no caminho do servidor da ANS"""
+    pasta = site / str(ano)
+    pasta.mkdir(exist_ok=True)
+    csv_path = site / f'{trimestre}{ano}.csv'
+    gerar_trimestre(str(csv_path), ano, int(trimestre[0]), OPERADORAS_CSV, contas)
+    with zipfile.ZipFile(pasta / f'{trimestre}{ano}.zip', 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.write(csv_path, f'{trimestre}{ano}.csv')
+    csv_path.unlink()
+
+
+@pytest.fixture
+def ans(tmp_path, monkeypatch):
+    site = tmp_path / 'site'
+    site.mkdir()
+    for ano, trimestre in TRIMESTRES:
+        publicar(site, ano, trimestre)
+    servidor, url = iniciar(str(site))
+    monkeypatch.setattr(teste3, 'DEMONSTRACOES_URL', url + '/')
+    monkeypatch.setattr(teste3, 'quarter_periods', lambda anos=2: list(TRIMESTRES))
+    execucao = tmp_path / 'execucao'
+    (execucao / 'dados_ans').mkdir(parents=True)
+    monkeypatch.chdir(execucao)
+    yield site
+    servidor.shutdown()
+
+
+@pytest.fixture(params=['classico', 'particionado'])
+def banco(request, mysql_teste, monkeypatch):
+    """Conexão com um banco novo no layout pedido, com as operadoras cadastradas"""
+    conectar = mysql_teste('_' + request.param)
+    # O pool dos gravadores do modo paralelo abre conexões a partir do DB_CONFIG
+    monkeypatch.setitem(teste3.DB_CONFIG, 'database', conectar.banco)
+    # setup_database_tables troca o layout global; volta ao anterior no fim do teste
+    monkeypatch.setattr(teste3, 'layout_demonstracoes', teste3.layout_demonstracoes)
+    layout_particionado.contas_cache.limpar()
+    conn = conectar()
+    assert teste3.setup_database_tables(conn, layout=request.param)
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO operadoras (registro_ans) VALUES (%s)",
+                       [(registro(i),) for i in range(OPERADORAS)])
+    conn.commit()
+    cursor.close()
+    yield conn
+    layout_particionado.contas_cache.limpar()
+
+
+def consultar(conn, sql, parametros=()):
+    cursor = conn.cursor()
+    cursor.execute(sql, parametros)
+    linhas = cursor.fetchall()
+    cursor.close()
+    return linhas
+
+
+def demonstracoes(conn):
+    return consultar(conn, """
+    SELECT periodo, registro_ans, conta, descricao, data, valor, categoria
+    FROM demonstracoes_contabeis ORDER BY periodo, registro_ans, conta, data
+    """)
+
+
+def manifesto(conn):
+    return consultar(conn, """
+    SELECT arquivo, periodo, hash_sha256, linhas, carregado_em
+    FROM cargas_arquivos WHERE periodo IS NOT NULL ORDER BY arquivo
+    """)
+
+
+def esvaziar(conn):
+    for ano, trimestre in TRIMESTRES:
+        teste3.replace_period(conn, f'{trimestre}{ano}')
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM cargas_arquivos WHERE periodo IS NOT NULL")
+    conn.commit()
+    cursor.close()
+
+
+def test_pipeline_igual_ao_sequencial(banco, ans, capsys):
+    assert teste3.import_demonstracoes(banco)
+    sequencial = demonstracoes(banco)
+    assert len(sequencial) == len(TRIMESTRES) * OPERADORAS * CONTAS
+
+    esvaziar(banco)
+    assert teste3.import_demonstracoes_pipeline(banco, paralelismo=3)
+    assert demonstracoes(banco) == sequencial
+    carga = manifesto(banco)
+    assert [(arquivo, periodo, linhas) for arquivo, periodo, _, linhas, _ in carga] == [
+        (f'{trimestre}{ano}.csv', f'{trimestre}{ano}', OPERADORAS * CONTAS) for ano, trimestre in TRIMESTRES
+    ]
+
+    # Nada mudou: a nova execução pula todos os trimestres e não toca no banco
+    capsys.readouterr()
+    assert teste3.import_demonstracoes_pipeline(banco, paralelismo=3)
+    assert capsys.readouterr().out.count('não mudou desde a última carga; pulando') == len(TRIMESTRES)
+    assert demonstracoes(banco) == sequencial
+    assert manifesto(banco) == carga
+
+
+def por_periodo(conn):
+    return dict(consultar(conn, """
+    SELECT periodo, COUNT(*) FROM demonstracoes_contabeis GROUP BY periodo
+    """))
+
+
+def test_trimestre_alterado_substitui_linhas(banco, ans, capsys):
+    assert teste3.import_demonstracoes(banco)
+    antes = manifesto(banco)
+    intactos = [linha for linha in demonstracoes(banco) if linha[0] != '2T2023']
+
+    # A ANS republica só o 2T2023, agora com menos contas
+    publicar(ans, 2023, '2T', contas=CONTAS - 10)
+    capsys.readouterr()
+    assert teste3.import_demonstracoes(banco)
+    saida = capsys.readouterr().out
+    assert 'Arquivo 1T2023.csv não mudou desde a última carga; pulando' in saida
+    assert 'Arquivo 3T2023.csv não mudou desde a última carga; pulando' in saida
+    assert '2T2023.csv não mudou' not in saida
+
+    assert por_periodo(banco) == {
+        '1T2023': OPERADORAS * CONTAS,
+        '2T2023': OPERADORAS * (CONTAS - 10),
+        '3T2023': OPERADORAS * CONTAS,
+    }
+    assert [linha for linha in demonstracoes(banco) if linha[0] != '2T2023'] == intactos
+    depois = {linha[0]: linha for linha in manifesto(banco)}
+    for linha in antes:
+        if linha[0] == '2T2023.csv':
+            assert depois[linha[0]][2] != linha[2]
+            assert depois[linha[0]][3] == OPERADORAS * (CONTAS - 10)
+        else:
+            assert depois[linha[0]] == linha
+
+
+def conferir_totais(conn):
+    """despesas_periodo e despesas_ano iguais ao GROUP BY direto sobre as demonstrações"""
+    assert consultar(conn, """
+    SELECT periodo, registro_ans, ano, categoria, data_max, linhas, total
+    FROM despesas_periodo ORDER BY periodo, registro_ans, ano, categoria
+    """) == consultar(conn, """
+    SELECT periodo, registro_ans, YEAR(data), categoria, MAX(data), COUNT(*), SUM(valor)
+    FROM demonstracoes_contabeis WHERE data IS NOT NULL
+    GROUP BY periodo, registro_ans, YEAR(data), categoria
+    ORDER BY periodo, registro_ans, YEAR(data), categoria
+    """)
+    assert consultar(conn, """
+    SELECT ano, registro_ans, categoria, linhas, total
+    FROM despesas_ano ORDER BY ano, registro_ans, categoria
+    """) == consultar(conn, """
+    SELECT YEAR(data), registro_ans, categoria, COUNT(*), SUM(valor)
+    FROM demonstracoes_contabeis WHERE data IS NOT NULL
+    GROUP BY YEAR(data), registro_ans, categoria
+    ORDER BY YEAR(data), registro_ans, categoria
+    """)
+
+
+def test_totais_pre_agregados(banco, ans):
+    assert teste3.import_demonstracoes_pipeline(banco, paralelismo=3)
+    assert consultar(banco, "SELECT COUNT(*) FROM despesas_periodo")[0][0] > 0
+    conferir_totais(banco)
+
+    # Depois de um trimestre substituído, os totais do período e do ano acompanham
+    publicar(ans, 2023, '2T', contas=CONTAS - 10)
+    assert teste3.import_demonstracoes(banco)
+    conferir_totais(banco)
+
+
+def test_regra_editada_reclassifica(banco, ans, tmp_path, monkeypatch, capsys):
+    assert teste3.import_demonstracoes(banco)
+    antes = demonstracoes(banco)
+
+    # Nova regra, antes das demais: as linhas da rede própria ganham categoria própria
+    with open(teste3.REGRAS_CATEGORIAS_PATH, encoding='utf-8') as arquivo:
+        regras = json.load(arquivo)
+    regras.insert(0, {'codigo': 4, 'nome': 'Rede própria', 'termos': ['REDE PRÓPRIA'],
+                      'contas': [], 'despesa': True, 'importar': True})
+    caminho = tmp_path / 'regras_categorias.json'
+    caminho.write_text(json.dumps(regras, ensure_ascii=False), encoding='utf-8')
+    regras = teste3.load_category_rules(str(caminho))
+    monkeypatch.setattr(teste3, 'REGRAS_CATEGORIAS', regras)
+    monkeypatch.setattr(teste3, 'CATEGORIAS_DESPESA', [r['codigo'] for r in regras if r.get('despesa')])
+    monkeypatch.setattr(teste3, 'CATEGORIAS_IMPORTADAS', [r['codigo'] for r in regras if r.get('importar')])
+    monkeypatch.setattr(teste3.classify_categorias, '__defaults__', (regras,))
+
+    capsys.readouterr()
+    teste3.sync_category_rules(banco, str(caminho))
+    assert 'reclassifica' in capsys.readouterr().out
+
+    depois = demonstracoes(banco)
+    assert len(depois) == len(antes)
+    assert [linha[:-1] for linha in depois] == [linha[:-1] for linha in antes]
+    assert [linha[-1] for linha in depois] == [
+        4 if 'REDE PRÓPRIA' in linha[3] else linha[-1] for linha in antes
+    ]
+    assert any(linha[-1] == 4 for linha in depois)
+    assert (4, 'Rede própria') in consultar(banco, "SELECT codigo, nome FROM categorias_despesa")
+    conferir_totais(banco)
+    assert any(categoria == 4 for (categoria,) in consultar(banco, "SELECT categoria FROM despesas_ano"))
+    # A categoria nova passou a ser importada: os trimestres saem do manifesto
+    assert manifesto(banco) == []
+
+    # O mesmo arquivo de regras de novo não reclassifica nada
+    teste3.sync_category_rules(banco, str(caminho))
+    assert 'reclassifica' not in capsys.readouterr().out
+    assert demonstracoes(banco) == depois
@@ -0,0 +1,117 @@
+"""MotorDownload contra o servidor local: download, 304, retomada, 416 e corpo comprimido."""
+import gzip
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from comum.download import baixar_arquivo
+from comum.servidor_local import iniciar
+
+OPCOES = {'tentativas': 3, 'backoff_base': 0.01}
+
+
+@pytest.fixture
+def site(tmp_path):
+    diretorio = tmp_path / 'site'
+    diretorio.mkdir()
+    conteudo = os.urandom(300_000)
+    (diretorio / 'anexo.pdf').write_bytes(conteudo)
+    return diretorio, conteudo
+
+
+@pytest.fixture
+def servidor(site):
+    servidores = []
+
+    def subir(cortar_apos=None):
+        servidor, url = iniciar(str(site[0]), cortar_apos=cortar_apos)
+        servidores.append(servidor)
+        return url
+
+    yield subir
+    for servidor in servidores:
+        servidor.shutdown()
+
+
+def test_baixa_e_depois_recebe_304(site, servidor, tmp_path):
+    url = servidor()
+    destino = str(tmp_path / 'anexo.pdf')
+
+    primeiro = baixar_arquivo(f'{url}/anexo.pdf', destino, **OPCOES)
+    segundo = baixar_arquivo(f'{url}/anexo.pdf', destino, **OPCOES)
+
+    assert (primeiro.status, segundo.status) == ('baixado', 'inalterado')
+    assert segundo.bytes_recebidos == 0
+    with open(destino, 'rb') as arquivo:
+        assert arquivo.read() == site[1]
+
+
+def test_retoma_corpo_interrompido(site, servidor, tmp_path):
+    url = servidor(cortar_apos=100_000)
+    destino = str(tmp_path / 'anexo.pdf')
+
+    resultado = baixar_arquivo(f'{url}/anexo.pdf', destino, **OPCOES)
+
+    assert resultado.status == 'retomado'
+    assert resultado.bytes_recebidos == len(site[1]) - 100_000
+    with open(destino, 'rb') as arquivo:
+        assert arquivo.read() == site[1]
+    assert not os.path.exists(destino + '.part')
+
+
+def test_416_descarta_parcial_e_baixa_de_novo(site, servidor, tmp_path):
+    url = servidor()
+    destino = str(tmp_path / 'anexo.pdf')
+    baixar_arquivo(f'{url}/anexo.pdf', destino, **OPCOES)
+
+    # Parcial maior que o arquivo atual, com o ETag certo: o servidor responde 416
+    with open(destino + '.part', 'wb') as arquivo:
+        arquivo.write(b'x' * (len(site[1]) + 10))
+    os.replace(destino + '.meta.json', destino + '.part.meta.json')
+    os.remove(destino)
+
+    resultado = baixar_arquivo(f'{url}/anexo.pdf', destino, **OPCOES)
+
+    assert resultado.status == 'baixado'
+    with open(destino, 'rb') as arquivo:
+        assert arquivo.read() == site[1]
+
+
+class _ManipuladorGzip(BaseHTTPRequestHandler):
+    """Servidor que comprime o corpo mesmo quando o cliente pede identity"""
+    protocol_version = 'HTTP/1.1'
+    corpo = b''
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        comprimido = gzip.compress(self.corpo)
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(comprimido)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        self.wfile.write(comprimido)
+
+
+def test_corpo_gzip_e_gravado_descomprimido(tmp_path):
+    corpo = b'linha do anexo\n' * 20_000
+    manipulador = type('Manipulador', (_ManipuladorGzip,), {'corpo': corpo})
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), manipulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    destino = str(tmp_path / 'anexo.txt')
+    try:
+        resultado = baixar_arquivo(f'http://127.0.0.1:{servidor.server_port}/anexo.txt', destino, **OPCOES)
+    finally:
+        servidor.shutdown()
+
+    assert resultado.status == 'baixado'
+    with open(destino, 'rb') as arquivo:
+        assert arquivo.read() == corpo
+    # Um parcial deste arquivo não pode ser retomado com Range
+    with open(destino + '.meta.json', encoding='utf-8') as arquivo:
+        assert json.load(arquivo)['codificado'] is True
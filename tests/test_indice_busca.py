@@ -0,0 +1,31 @@
+"""IndiceBusca: os trigramas só geram candidatos, o resultado é o da varredura linear."""
+import pytest
+
+from indice_busca import IndiceBusca
+
+TERMOS = ['unimed', 'operadora odonto 1', 'saúde', 'saude', 'bela vista', 'ltda',
+          '3000', '39900', 'rua 1', 'sp', 'sá', 'á', 'x', '1', '@operadora.com', 'inexistente']
+
+
+def varredura(tabela, termo_lower, campos=None):
+    """A busca antiga: `termo in valor.lower()` em cada campo de cada linha"""
+    campos = campos or tabela.colunas
+    return [i for i in range(len(tabela))
+            if any(isinstance(valor, str) and termo_lower in valor.lower()
+                   for valor in (tabela.valor(i, campo) for campo in campos))]
+
+
+@pytest.fixture(scope='module')
+def indice(tabela):
+    return IndiceBusca(tabela)
+
+
+@pytest.mark.parametrize('termo', TERMOS)
+def test_igual_varredura_linear(indice, tabela, termo):
+    assert indice.buscar_ids(termo) == varredura(tabela, termo)
+
+
+@pytest.mark.parametrize('campos', [['Razao_Social'], ['UF', 'Cidade'], ['Registro_ANS', 'CNPJ']])
+@pytest.mark.parametrize('termo', ['bela', 'sa', 'p', '3000', 'cidade 12'])
+def test_igual_varredura_por_campo(indice, tabela, termo, campos):
+    assert indice.buscar_ids(termo, campos) == varredura(tabela, termo, campos)
@@ -0,0 +1,79 @@
+"""IndiceFuzzy: mesmo ranking que comparar o termo com cada palavra de cada linha."""
+import pytest
+
+from indice_fuzzy import (CAMPOS_FUZZY, CUSTO_COMPLETAR, CUSTO_EDICAO, MINIMO_COMPLETAR, IndiceFuzzy,
+                          distancia_edicao, distancia_maxima, palavras)
+
+TERMOS = ['bela vista', 'bela vsta', 'bella', 'clinica odontologica', 'unimde', 'saude', 'asistencia',
+          'operadora odonto 12', 'opreadora unimed', 'ltda', 'sa', 's.a.', 'assist', '30', 'xyzw']
+
+
+def custo_palavra(termo, palavra):
+    """Custo de uma palavra do termo contra uma palavra do nome, ou None se não casa"""
+    custos = []
+    if termo == palavra:
+        custos.append(0)
+    if len(termo) >= MINIMO_COMPLETAR and palavra.startswith(termo):
+        custos.append(CUSTO_COMPLETAR)
+    limite = min(distancia_maxima(termo), distancia_maxima(palavra))
+    if limite and not termo.isdigit() and not palavra.isdigit():
+        distancia = distancia_edicao(termo, palavra, limite)
+        if distancia <= limite:
+            custos.append(CUSTO_EDICAO * distancia)
+    return min(custos, default=None)
+
+
+def forca_bruta(tabela, termo_lower):
+    campos = [campo for campo in tabela.colunas if campo.lower() in CAMPOS_FUZZY]
+    total = {}
+    for i in range(len(tabela)):
+        nome = {p for campo in campos for p in palavras(tabela.valor(i, campo) or '')}
+        soma = 0
+        for termo in dict.fromkeys(palavras(termo_lower)):
+            custos = [c for c in (custo_palavra(termo, palavra) for palavra in nome) if c is not None]
+            if not custos:
+                break
+            soma += min(custos)
+        else:
+            total[i] = soma
+    return sorted(total, key=lambda i: (total[i], i))
+
+
+@pytest.fixture(scope='module')
+def fuzzy(tabela):
+    return IndiceFuzzy(tabela)
+
+
+@pytest.mark.parametrize('termo', TERMOS)
+def test_igual_forca_bruta(fuzzy, tabela, termo):
+    assert fuzzy.buscar_ranqueado(termo) == forca_bruta(tabela, termo)
+
+
+def test_ranking(fuzzy, tabela):
+    def registros(termo):
+        return [tabela.valor(i, 'Registro_ANS') for i in fuzzy.buscar_ranqueado(termo)]
+
+    # Nomes exatos antes do erro de digitação, e no empate a ordem de carga
+    assert registros('bela vista') == ['399001', '399002', '399003']
+    assert registros('bela vsta') == ['399001', '399002', '399003']
+    # Sem acentos e com abreviação
+    assert registros('clinica odontologica') == ['399002']
+    assert registros('bela vista s.a.')[0] == '399001'
+    assert registros('') == []
+
+
+def test_campos(fuzzy, tabela):
+    ids = fuzzy.buscar_ranqueado('odonto bela', ['Nome_Fantasia'])
+    assert [tabela.valor(i, 'Registro_ANS') for i in ids] == ['399002']
+
+
+def test_api_modo_fuzzy(servidor_api):
+    cliente = servidor_api.app.test_client()
+    resposta = cliente.get('/api/buscar', query_string={'termo': 'bela vsta', 'modo': 'fuzzy'})
+    corpo = resposta.get_json()
+    assert corpo['meta']['modo'] == 'fuzzy'
+    assert [r['Registro_ANS'] for r in corpo['data']['resultados']] == ['399001', '399002', '399003']
+
+    # Só os campos de nome têm busca aproximada
+    resposta = cliente.get('/api/buscar', query_string={'termo': 'pa', 'modo': 'fuzzy', 'campo': 'uf'})
+    assert resposta.status_code == 400
@@ -0,0 +1,109 @@
+"""import_operadoras_bulk contra o MySQL do docker-compose: mesma tabela que a carga linha a linha.
+
+Roda num banco separado (ver `mysql_teste` no conftest); sem o MySQL no
+ar, os testes são pulados.
+"""
+import csv
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+pytest.importorskip('pyarrow')
+
+import teste3_bancoDeDados as teste3  # noqa: E402
+from benchmarks.geradores import COLUNAS_OPERADORAS, gerar_cadop  # noqa: E402
+
+# Casos que a limpeza vetorizada e o arquivo do LOAD DATA precisam tratar
+# igual ao ajustar_campo: repetidos (vale o último), tab, barra, quebra de
+# linha, 'nan', espaços, campos longos e datas inválidas
+CASOS = [
+    ['300001', '1', 'REPETIDA LTDA', 'Nova', 'Autogestão', 'Rua\tcom tab', '10', 'C:\\sala\\2',
+     'Bairro\nnovo', 'São Paulo', 'SP', '01000000', '11', '12345678', 'nan', 'a@b.com', 'Ré',
+     'Diretor', '1', '31/02/2020'],
+    ['399990', ' 2 ', 'X' * 300, '   ', '', 'Rua \\N', 'NaN', '', 'Bairro', 'Cidade', 'SPX',
+     '0123456789012', '123456', '9' * 60, '', '', 'Ação Ç', 'Cargo', '2', '05/06/2010'],
+    ['399991', '3', 'Última "aspas"; ponto e vírgula', 'Fantasia', 'Seguradora', '', '', '',
+     '', '', '', '', '', '', '', '', '', '', '', ''],
+]
+
+
+@pytest.fixture(scope='module')
+def conexao(mysql_teste):
+    conectar = mysql_teste()
+    assert teste3.setup_database_tables(conectar())
+    return conectar
+
+
+@pytest.fixture(scope='module')
+def cadop(tmp_path_factory):
+    caminho = str(tmp_path_factory.mktemp('cadop') / 'Relatorio_cadop.csv')
+    gerar_cadop(caminho, 6000)
+    with open(caminho, 'a', encoding='latin1', newline='') as arquivo:
+        csv.writer(arquivo, delimiter=';', quoting=csv.QUOTE_ALL).writerows(CASOS)
+    assert len(CASOS[0]) == len(COLUNAS_OPERADORAS)
+    return caminho
+
+
+def conteudo(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM operadoras ORDER BY registro_ans')
+    linhas = cursor.fetchall()
+    cursor.close()
+    return linhas
+
+
+def esvaziar(conn):
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM operadoras')
+    conn.commit()
+    cursor.close()
+
+
+@pytest.fixture(autouse=True)
+def diretorio(tmp_path, monkeypatch):
+    # A carga em lote grava o arquivo do LOAD DATA em dados_ans/staging
+    (tmp_path / 'dados_ans').mkdir()
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def esperado(conexao, cadop):
+    conn = conexao()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(teste3, 'OPERADORAS_CSV', cadop)
+        esvaziar(conn)
+        assert teste3.import_operadoras(conn)
+    return conteudo(conn)
+
+
+@pytest.mark.parametrize('load_data', [True, False], ids=['load-data', 'insert-varias-linhas'])
+def test_bulk_igual_linha_a_linha(conexao, cadop, esperado, monkeypatch, capsys, load_data):
+    # Sem as opções de staging o LOAD DATA LOCAL falha e a carga usa o INSERT de várias linhas
+    conn = conexao(**(teste3.staging_options() if load_data else {}))
+    monkeypatch.setattr(teste3, 'OPERADORAS_CSV', cadop)
+    assert len(esperado) == 6000 + len(CASOS) - 1
+
+    esvaziar(conn)
+    assert teste3.import_operadoras_bulk(conn)
+    assert ('usando INSERT de várias linhas' in capsys.readouterr().out) != load_data
+    assert conteudo(conn) == esperado
+
+    # Sobre a tabela já carregada, o ON DUPLICATE KEY UPDATE leva ao mesmo conteúdo
+    cursor = conn.cursor()
+    cursor.execute("UPDATE operadoras SET razao_social = 'ANTIGA', email = NULL, data_registro_ans = NULL")
+    conn.commit()
+    cursor.close()
+    assert teste3.import_operadoras_bulk(conn)
+    assert conteudo(conn) == esperado
+
+
+@pytest.mark.parametrize('opcoes', [False, True], ids=['sem-staging', 'staging'])
+def test_load_data_so_do_diretorio_de_staging(conexao, tmp_path, opcoes):
+    # Nem a conexão da carga em lote envia arquivos fora de dados_ans/staging
+    conn = conexao(**(teste3.staging_options() if opcoes else {}))
+    fora = tmp_path / 'segredo.txt'
+    fora.write_text('segredo\n', encoding='utf-8')
+    cursor = conn.cursor()
+    cursor.execute('CREATE TEMPORARY TABLE arquivo (linha TEXT)')
+    with pytest.raises(teste3.Error):
+        cursor.execute('LOAD DATA LOCAL INFILE %s INTO TABLE arquivo', (str(fora),))
@@ -0,0 +1,26 @@
+"""parsers_br.centavos: até duas casas decimais; mais casas contam como valor malformado."""
+import pandas as pd
+import pytest
+
+from comum import parsers_br
+
+VALIDOS = {'1.234,56': 123456, '-12,5': -1250, '300': 30000, '+0,05': 5, '-0,00': 0, '1.000.000': 100000000}
+MAIS_CASAS = ['0,125', '0,135', '0,1251', '-0,125', '2,675000', '1.234,9999', '+0,005', '0,100']
+
+
+def test_ate_duas_casas():
+    assert parsers_br.centavos(pd.Series(list(VALIDOS), dtype=object)).tolist() == list(VALIDOS.values())
+
+
+def test_mais_de_duas_casas_malformadas():
+    serie = pd.Series(['1,25'] + MAIS_CASAS, dtype=object)
+    assert parsers_br.centavos(serie).tolist() == [125] + [pd.NA] * len(MAIS_CASAS)
+    with pytest.raises(ValueError, match=f'{len(MAIS_CASAS)} valores malformados'):
+        parsers_br.centavos(serie, erros='raise')
+
+
+def test_categorica_e_malformados():
+    serie = pd.Series(['0,12', '1,', 'abc', None, '0,12'], dtype='category')
+    assert parsers_br.centavos(serie).tolist() == [12, pd.NA, pd.NA, pd.NA, 12]
+    with pytest.raises(ValueError, match='2 valores malformados'):
+        parsers_br.centavos(serie, erros='raise')
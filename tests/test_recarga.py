@@ -0,0 +1,67 @@
+"""Recarga do operadoras.csv: o snapshot só é trocado quando o conteúdo muda."""
+import os
+import shutil
+
+import pytest
+
+from benchmarks.geradores import gerar_operadoras
+from recarga import ObservadorArquivo
+
+
+@pytest.fixture
+def csv_api(servidor_api, operadoras_csv, tmp_path, monkeypatch):
+    """Cópia do CSV sintético que o teste pode alterar, já carregada no server"""
+    caminho = str(tmp_path / 'operadoras.csv')
+    shutil.copyfile(operadoras_csv, caminho)
+    monkeypatch.setattr(servidor_api, 'CAMINHO_CSV', caminho)
+    servidor_api.carregar_dados()
+    return caminho
+
+
+def observador(servidor_api, caminho):
+    return ObservadorArquivo(caminho, lambda _hash: servidor_api.carregar_dados(),
+                             hash_inicial=servidor_api.snapshot.hash_arquivo)
+
+
+def test_touch_nao_recarrega(servidor_api, csv_api):
+    antes = servidor_api.snapshot
+    vigia = observador(servidor_api, csv_api)
+    info = os.stat(csv_api)
+    os.utime(csv_api, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+    assert not vigia.verificar()
+    assert not vigia.verificar()
+    assert servidor_api.snapshot is antes
+
+
+def test_conteudo_novo_troca_snapshot(servidor_api, csv_api):
+    antes = servidor_api.snapshot
+    total = len(antes.operadoras)
+    vigia = observador(servidor_api, csv_api)
+    gerar_operadoras(csv_api, 10)
+
+    # A assinatura nova precisa se repetir antes da recarga
+    assert not vigia.verificar()
+    assert servidor_api.snapshot is antes
+    assert vigia.verificar()
+
+    depois = servidor_api.snapshot
+    assert depois.versao == antes.versao + 1
+    assert len(depois.operadoras) == 10
+    assert depois.indice.buscar_ids('operadora') == list(range(10))
+    # Quem já tinha o snapshot antigo continua vendo os dados antigos
+    assert len(antes.operadoras) == total
+    assert not vigia.verificar()
+
+
+def test_recarga_com_falha_mantem_snapshot(servidor_api, csv_api):
+    antes = servidor_api.snapshot
+    os.remove(csv_api)
+    assert servidor_api.carregar_dados() is antes
+    assert servidor_api.snapshot is antes
+
+
+def test_recarga_limpa_cache(servidor_api, csv_api):
+    servidor_api.buscar_operadoras('bela vista')
+    assert servidor_api.cache.estatisticas()['entradas'] > 0
+    servidor_api.carregar_dados()
+    assert servidor_api.cache.estatisticas()['entradas'] == 0
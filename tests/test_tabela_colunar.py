@@ -0,0 +1,45 @@
+"""TabelaColunar: as linhas voltam iguais às do csv.DictReader, em qualquer formato de coluna."""
+import csv
+
+import pytest
+
+import tabela_colunar
+from server import ler_csv
+from tabela_colunar import ColunaDicionario, ColunaTexto
+
+
+def linhas_dictreader(caminho):
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        return [{campo: valor.strip() if valor is not None else None for campo, valor in linha.items()}
+                for linha in csv.DictReader(arquivo, delimiter=';')]
+
+
+def test_ida_e_volta(tabela, operadoras_csv):
+    esperado = linhas_dictreader(operadoras_csv)
+    assert len(tabela) == len(esperado)
+    assert [tabela[i] for i in range(len(tabela))] == esperado
+    assert tabela[len(tabela) - 1]['Cidade'] is None
+
+    # Colunas repetitivas ficam no dicionário, as de nomes em texto contíguo
+    assert isinstance(tabela.dados['UF'], ColunaDicionario)
+    assert isinstance(tabela.dados['Razao_Social'], ColunaTexto)
+    assert tabela.valor(0, 'UF') == esperado[0]['UF']
+    assert tabela.valor(0, 'inexistente') is None
+
+
+@pytest.mark.parametrize('limite', [50, 1000])
+def test_dicionario_convertido_no_meio_da_carga(operadoras_csv, monkeypatch, limite):
+    # Com um limite baixo, as colunas estouram o dicionário entre um lote e outro
+    monkeypatch.setattr(tabela_colunar, 'LIMITE_DICIONARIO', limite)
+    monkeypatch.setattr('server.TAMANHO_LOTE_CSV', 100)
+    tabela = ler_csv(operadoras_csv)
+    assert isinstance(tabela.dados['Cidade'], ColunaTexto)
+    assert [tabela[i] for i in range(len(tabela))] == linhas_dictreader(operadoras_csv)
+
+
+def test_colunas_sem_nome_e_repetidas(tmp_path):
+    caminho = tmp_path / 'operadoras.csv'
+    caminho.write_text('\ufeffA;;B;A\n1;x;2;3\n 4 ;y; 5\n', encoding='utf-8')
+    tabela = ler_csv(str(caminho))
+    assert tabela.colunas == ['A', 'B']
+    assert [tabela[0], tabela[1]] == [{'A': '3', 'B': '2'}, {'A': None, 'B': '5'}]
@@ -0,0 +1,132 @@
+"""teste2Csv sobre um PDF sintético: o CSV em fluxo, o cache de páginas e a extração pela grade."""
+import zipfile
+
+import pandas as pd
+import pdfplumber
+import pytest
+
+import teste2Csv
+from benchmarks.geradores import gerar_pdf
+
+PAGINAS = 6
+CSV = 'Rol_de_Procedimentos.csv'
+
+
+@pytest.fixture(scope='module')
+def pdf(tmp_path_factory):
+    """A partir da página 3 aparece uma coluna que as anteriores não têm"""
+    caminho = str(tmp_path_factory.mktemp('pdf') / 'anexo.pdf')
+    gerar_pdf(caminho, PAGINAS, linhas_por_pagina=15, coluna_nova={3, 5})
+    return caminho
+
+
+def csv_antigo(pdf_path, diretorio):
+    """O CSV da versão com pd.concat: extract_table, dropna, rename e to_csv"""
+    with pdfplumber.open(pdf_path) as documento:
+        tabelas = [page.extract_table() for page in documento.pages]
+    df = pd.concat([pd.DataFrame(t[1:], columns=t[0]) for t in tabelas if t], ignore_index=True)
+    df = df.dropna(how='all').reset_index(drop=True)
+    df = df.rename(columns=teste2Csv.RENOMEAR_COLUNAS)
+    caminho = diretorio / CSV
+    df.to_csv(caminho, index=False, encoding='utf-8-sig')
+    return caminho.read_bytes()
+
+
+def csv_no_zip(zip_path):
+    with zipfile.ZipFile(zip_path) as zipf:
+        return zipf.read(CSV)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_csv_em_fluxo_igual_ao_concat(pdf, tmp_path, capsys, workers):
+    zip_path = str(tmp_path / 'saida.zip')
+    linhas = teste2Csv.iterar_linhas(teste2Csv.iterar_tabelas(pdf, workers=workers))
+    cabecalho, total, primeiras = teste2Csv.escrever_csv_no_zip(linhas, zip_path, CSV)
+
+    assert csv_no_zip(zip_path) == csv_antigo(pdf, tmp_path)
+    assert 'OBSERVAÇÃO' in capsys.readouterr().out
+    assert cabecalho[-1] == 'OBSERVAÇÃO' and 'Odontológico' in cabecalho
+    assert total == PAGINAS * 15
+    assert len(primeiras) == 5 and all(len(linha) == len(cabecalho) for linha in primeiras)
+
+
+def test_sem_coluna_nova_nao_reescreve(tmp_path, capsys):
+    pdf_path = str(tmp_path / 'anexo.pdf')
+    gerar_pdf(pdf_path, 3, linhas_por_pagina=10)
+    zip_path = str(tmp_path / 'saida.zip')
+    teste2Csv.escrever_csv_no_zip(teste2Csv.iterar_linhas(teste2Csv.iterar_tabelas(pdf_path)), zip_path, CSV)
+    assert csv_no_zip(zip_path) == csv_antigo(pdf_path, tmp_path)
+    assert 'reescrevendo' not in capsys.readouterr().out
+
+
+@pytest.fixture(scope='module')
+def sem_cache(pdf):
+    return list(teste2Csv.iterar_tabelas(pdf))
+
+
+def test_cache_devolve_as_mesmas_tabelas(pdf, sem_cache, tmp_path):
+    cache = teste2Csv.CachePaginas(str(tmp_path / 'paginas.sqlite'))
+    assert list(teste2Csv.iterar_tabelas(pdf, cache=cache)) == sem_cache
+    assert (cache.acertos, cache.faltas) == (0, PAGINAS)
+    assert list(teste2Csv.iterar_tabelas(pdf, cache=cache)) == sem_cache
+    assert (cache.acertos, cache.faltas) == (PAGINAS, PAGINAS)
+
+    # Numa nova revisão do PDF, só a página alterada é extraída de novo
+    revisao = str(tmp_path / 'revisao.pdf')
+    gerar_pdf(revisao, PAGINAS, linhas_por_pagina=15, coluna_nova={3, 5}, alteradas={2})
+    assert list(teste2Csv.iterar_tabelas(revisao, cache=cache)) == list(teste2Csv.iterar_tabelas(revisao))
+    assert (cache.acertos, cache.faltas) == (2 * PAGINAS - 1, PAGINAS + 1)
+    cache.fechar()
+
+
+def test_cache_separado_por_modo_de_extracao(pdf, sem_cache, tmp_path):
+    cache = teste2Csv.CachePaginas(str(tmp_path / 'paginas.sqlite'))
+    assert list(teste2Csv.iterar_tabelas(pdf, cache=cache, grade=True)) == sem_cache
+    assert cache.faltas == PAGINAS
+    grade = len(cache.assinaturas())
+    assert grade == 1
+
+    # A detecção completa não reaproveita as páginas extraídas pela grade;
+    # a primeira (que ensinou a grade) e as que mudam de colunas já são da detecção completa
+    assert list(teste2Csv.iterar_tabelas(pdf, cache=cache)) == sem_cache
+    completas = cache.acertos
+    assert 0 < completas < PAGINAS
+    assert cache.faltas == PAGINAS + (PAGINAS - completas)
+
+    # O modo grade aproveita as duas
+    acertos, faltas = cache.acertos, cache.faltas
+    assert list(teste2Csv.iterar_tabelas(pdf, cache=cache, grade=True)) == sem_cache
+    assert (cache.acertos, cache.faltas) == (acertos + PAGINAS, faltas)
+    cache.fechar()
+
+
+def test_poda_remove_as_menos_usadas(pdf, tmp_path):
+    cache = teste2Csv.CachePaginas(str(tmp_path / 'paginas.sqlite'))
+    list(teste2Csv.iterar_tabelas(pdf, cache=cache))
+    cache.limite_bytes = cache.tamanho() // 2
+    assert cache.podar() <= cache.limite_bytes
+    assert 0 < cache.removidas < PAGINAS
+    cache.fechar()
+
+
+def test_grade_igual_extract_table(tmp_path):
+    # Páginas com as colunas deslocadas e com uma coluna a mais caem na detecção completa
+    pdf_path = str(tmp_path / 'anexo.pdf')
+    gerar_pdf(pdf_path, 8, linhas_por_pagina=20, outro_layout={2}, coluna_nova={5})
+    geometria = teste2Csv.GeometriaTabela(teste2Csv.CONFIG_TABELA)
+    modos = []
+    with pdfplumber.open(pdf_path) as documento:
+        for page in documento.pages:
+            tabela, assinatura = teste2Csv._extrair_pagina(page, geometria)
+            assert tabela == page.extract_table()
+            modos.append('completa' if assinatura is None else 'grade')
+    # Cada detecção completa ensina a grade da página, e a seguinte volta ao layout original
+    assert modos == ['completa', 'grade', 'completa', 'completa', 'grade', 'completa', 'completa', 'grade']
+
+    assert list(teste2Csv.iterar_tabelas(pdf_path, grade=True)) == list(teste2Csv.iterar_tabelas(pdf_path))
+    assert list(teste2Csv.iterar_tabelas(pdf_path, workers=2, grade=True)) == list(teste2Csv.iterar_tabelas(pdf_path))
+
+
+def test_grade_desligada_sem_estrategia_de_linhas():
+    geometria = teste2Csv.GeometriaTabela({'vertical_strategy': 'text'})
+    assert not geometria.ativa